@@ -6,6 +6,7 @@ Validates all production settings and configurations before deployment
 
 import os
 import sys
+import time
 from pathlib import Path
 
 # Add project to path
@@ -45,6 +46,58 @@ def check_setting(setting_name, expected_value=None, in_production=True):
         print(f"  ✗ {setting_name}: NOT CONFIGURED")
         return False
 
+def check_scheduler_metrics():
+    """Query a running scheduler's metrics endpoint (warnings only: it may run elsewhere)"""
+    from urllib.request import urlopen
+    from scheduler.metrics import histogram_quantile, parse
+    
+    if not settings.SCHEDULER_METRICS_PORT:
+        print("  ℹ SCHEDULER_METRICS_PORT is 0 (metrics disabled)")
+        return
+    url = f"http://{settings.SCHEDULER_METRICS_HOST}:{settings.SCHEDULER_METRICS_PORT}/metrics"
+    try:
+        with urlopen(url, timeout=5) as response:
+            samples = parse(response.read().decode())
+    except OSError as e:
+        print(f"  ⚠ No scheduler answering at {url} ({e})")
+        print("    Start it with: python manage.py run_scheduler")
+        return
+    
+    def total(name, **labels):
+        return sum(value for sample_labels, value in samples.get(name, [])
+                   if all(sample_labels.get(k) == v for k, v in labels.items()))
+    
+    print(f"  ✓ Scheduler metrics: {url}")
+    due = total('scheduler_due_posts')
+    oldest = total('scheduler_oldest_due_seconds')
+    print(f"  {'✓' if oldest < 60 else '⚠'} Due posts waiting: {due:.0f} (oldest {oldest:.0f}s)")
+    
+    p95 = histogram_quantile(samples, 'scheduler_dispatch_lateness_seconds', 0.95)
+    if p95 is None:
+        print("  ℹ No posts dispatched since the scheduler started")
+    else:
+        print(f"  {'✓' if p95 <= 60 else '⚠'} Dispatch lateness p95: <= {p95:g}s")
+        if p95 > 60:
+            print("    Posts are going out late: add scheduler workers or raise SCHEDULER_DISPATCH_WORKERS")
+    
+    platforms = sorted({labels['platform'] for labels, _ in samples.get('scheduler_platform_calls_total', [])})
+    for platform in platforms:
+        success = total('scheduler_platform_calls_total', platform=platform, outcome='success')
+        failure = total('scheduler_platform_calls_total', platform=platform, outcome='failure')
+        latency = histogram_quantile(samples, 'scheduler_platform_call_duration_seconds', 0.95, platform=platform)
+        print(f"  ✓ {platform}: {success:.0f} sent, {failure:.0f} failed, p95 <= {latency:g}s")
+    
+    ticks = total('scheduler_tick_duration_seconds_count')
+    if ticks:
+        print(f"  ✓ Ticks: {ticks:.0f}, avg {total('scheduler_tick_duration_seconds_sum') / ticks:.2f}s")
+    slots = total('scheduler_dispatch_slots')
+    uptime = time.time() - total('process_start_time_seconds')
+    if slots and uptime > 0:
+        # Share of the dispatch slots busy with platform calls since the scheduler started
+        utilization = total('scheduler_dispatch_busy_seconds_total') / (slots * uptime)
+        print(f"  ✓ Worker pool: {total('scheduler_dispatch_in_flight'):.0f}/{slots:.0f} in flight, "
+              f"{utilization:.1%} utilized since start")
+
 def main():
     print_header("🚀 POST SCHEDULER - PRODUCTION READINESS CHECK")
     
@@ -156,7 +209,11 @@ def main():
     else:
         print(f"  ℹ .env file not found (using defaults or system vars)")
     
-    # 10. Final summary
+    # 10. Scheduler metrics
+    print("\n🔟 SCHEDULER METRICS")
+    check_scheduler_metrics()
+    
+    # 11. Final summary
     print_header("📋 SUMMARY")
     
     if all_passed:
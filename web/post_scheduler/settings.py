@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -49,8 +50,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'scheduler.middleware.RequestMetricsMiddleware',  # Per-request timings and query counts
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Serve static files efficiently
+    'scheduler.middleware.StaticFilesMiddleware',  # WhiteNoise static files, WSGI or ASGI
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -63,7 +65,8 @@ ROOT_URLCONF = 'post_scheduler.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that also times renders for the request metrics
+        'BACKEND': 'scheduler.instrumentation.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -94,7 +97,8 @@ if DATABASE_ENGINE == 'django.db.backends.postgresql':
             'PASSWORD': os.getenv('DATABASE_PASSWORD', ''),
             'HOST': os.getenv('DATABASE_HOST', 'localhost'),
             'PORT': os.getenv('DATABASE_PORT', '5432'),
-            'CONN_MAX_AGE': 600,
+            # Set DATABASE_CONN_MAX_AGE=0 under uvicorn: ASGI requests don't reuse a thread's connection
+            'CONN_MAX_AGE': int(os.getenv('DATABASE_CONN_MAX_AGE', '600')),
         }
     }
 else:
@@ -159,10 +163,176 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache
+# Must be shared by the web workers and the scheduler process, which
+# invalidates dashboard stats when it posts. Use Redis in production:
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# CACHE_LOCATION=redis://127.0.0.1:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'post_scheduler_cache')),
+    }
+}
+
+# Seconds a user's dashboard stats may be served from cache
+STATS_CACHE_TTL = int(os.getenv('STATS_CACHE_TTL', '60'))
+
 # Auth settings
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 
+# ============================================================================
+# SCHEDULER SETTINGS
+# ============================================================================
+
+# Max platform API calls in flight per scheduler process (1 = serial dispatch)
+SCHEDULER_DISPATCH_WORKERS = int(os.getenv('SCHEDULER_DISPATCH_WORKERS', '16'))
+
+# Due posts leased to a worker per claim, and how long the lease lasts.
+# Every write-back renews the lease of the batch's posts still being sent, so it
+# only has to outlive the slowest platform call, not the whole batch.
+SCHEDULER_CLAIM_BATCH_SIZE = int(os.getenv('SCHEDULER_CLAIM_BATCH_SIZE', '500'))
+SCHEDULER_LEASE_SECONDS = int(os.getenv('SCHEDULER_LEASE_SECONDS', '300'))
+
+# Dispatch results are written back in batches of this many posts,
+# or after this many seconds, whichever comes first
+SCHEDULER_FLUSH_SIZE = int(os.getenv('SCHEDULER_FLUSH_SIZE', '100'))
+SCHEDULER_FLUSH_INTERVAL = float(os.getenv('SCHEDULER_FLUSH_INTERVAL', '1.0'))
+
+# The scheduler sleeps until the next due post; views wake it early through
+# NOTIFY (PostgreSQL) or a UDP datagram on this local port (SQLite).
+# It never sleeps longer than SCHEDULER_MAX_SLEEP seconds without re-reading the queue.
+# A second scheduler on the same host can't bind the port and just re-reads
+# the queue every SCHEDULER_MAX_SLEEP seconds.
+SCHEDULER_MAX_SLEEP = float(os.getenv('SCHEDULER_MAX_SLEEP', '60'))
+SCHEDULER_HEAP_SIZE = int(os.getenv('SCHEDULER_HEAP_SIZE', '1000'))
+SCHEDULER_WAKEUP_HOST = os.getenv('SCHEDULER_WAKEUP_HOST', '127.0.0.1')
+SCHEDULER_WAKEUP_PORT = int(os.getenv('SCHEDULER_WAKEUP_PORT', '8765'))
+
+# Max concurrent API calls per platform within one dispatch run
+SCHEDULER_PLATFORM_CONCURRENCY = {
+    'instagram': int(os.getenv('SCHEDULER_CONCURRENCY_INSTAGRAM', '4')),
+    'facebook': int(os.getenv('SCHEDULER_CONCURRENCY_FACEBOOK', '4')),
+    'twitter': int(os.getenv('SCHEDULER_CONCURRENCY_TWITTER', '4')),
+    'linkedin': int(os.getenv('SCHEDULER_CONCURRENCY_LINKEDIN', '4')),
+}
+
+# Token-bucket rate limit per connected account: (burst, posts per hour).
+# Shared by all scheduler processes through the database; posts over budget
+# are deferred until a token is available instead of being sent to fail.
+SCHEDULER_RATE_LIMITS = {
+    'instagram': (int(os.getenv('RATE_LIMIT_INSTAGRAM_BURST', '25')), float(os.getenv('RATE_LIMIT_INSTAGRAM_PER_HOUR', '200'))),
+    'facebook': (int(os.getenv('RATE_LIMIT_FACEBOOK_BURST', '25')), float(os.getenv('RATE_LIMIT_FACEBOOK_PER_HOUR', '200'))),
+    'twitter': (int(os.getenv('RATE_LIMIT_TWITTER_BURST', '50')), float(os.getenv('RATE_LIMIT_TWITTER_PER_HOUR', '300'))),
+    'linkedin': (int(os.getenv('RATE_LIMIT_LINKEDIN_BURST', '10')), float(os.getenv('RATE_LIMIT_LINKEDIN_PER_HOUR', '100'))),
+    'default': (int(os.getenv('RATE_LIMIT_DEFAULT_BURST', '10')), float(os.getenv('RATE_LIMIT_DEFAULT_PER_HOUR', '100'))),
+}
+
+# Failed posts are retried by the scheduler with jittered exponential backoff:
+# (base seconds, max seconds) per error class; None means never retry.
+# After SCHEDULER_MAX_ATTEMPTS attempts a post is given up on ('dead').
+SCHEDULER_MAX_ATTEMPTS = int(os.getenv('SCHEDULER_MAX_ATTEMPTS', '5'))
+SCHEDULER_RETRY_POLICIES = {
+    'rate_limit': (int(os.getenv('SCHEDULER_RETRY_RATE_LIMIT_BASE', '300')), int(os.getenv('SCHEDULER_RETRY_RATE_LIMIT_MAX', '3600'))),
+    'transient': (int(os.getenv('SCHEDULER_RETRY_TRANSIENT_BASE', '30')), int(os.getenv('SCHEDULER_RETRY_TRANSIENT_MAX', '1800'))),
+    'permanent': None,
+}
+
+# ============================================================================
+# PLATFORM API SETTINGS
+# ============================================================================
+
+# 'simulate' fakes every call locally (80% success); 'http' calls the platform APIs
+PLATFORM_API_MODE = os.getenv('PLATFORM_API_MODE', 'simulate')
+
+# Send every platform's calls here instead of the real API hosts,
+# e.g. the mock server from `python manage.py run_mock_platforms`
+PLATFORM_API_BASE_URL = os.getenv('PLATFORM_API_BASE_URL', '')
+
+# Public site URL, used to hand image links to APIs that fetch media themselves
+PUBLIC_BASE_URL = os.getenv('PUBLIC_BASE_URL', 'http://localhost:8000')
+
+# Shared keep-alive connection pool for all platform calls
+PLATFORM_HTTP_TIMEOUT = float(os.getenv('PLATFORM_HTTP_TIMEOUT', '15'))
+PLATFORM_HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv('PLATFORM_HTTP_MAX_CONNECTIONS_PER_HOST', '20'))
+PLATFORM_HTTP_MAX_KEEPALIVE = int(os.getenv('PLATFORM_HTTP_MAX_KEEPALIVE', '100'))
+PLATFORM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv('PLATFORM_HTTP_KEEPALIVE_EXPIRY', '60'))
+
+# ============================================================================
+# BULK IMPORT SETTINGS
+# ============================================================================
+
+# Rows accepted per CSV/NDJSON import (posts/import/ and `manage.py import_posts`)
+BULK_IMPORT_MAX_ROWS = int(os.getenv('BULK_IMPORT_MAX_ROWS', '50000'))
+
+# ============================================================================
+# RECURRING POST SETTINGS
+# ============================================================================
+
+# Posts for recurring templates are created this far ahead, in batches of
+# RECURRING_BATCH_SIZE templates, by run_scheduler every RECURRING_POLL_SECONDS
+RECURRING_WINDOW_HOURS = float(os.getenv('RECURRING_WINDOW_HOURS', '48'))
+RECURRING_BATCH_SIZE = int(os.getenv('RECURRING_BATCH_SIZE', '200'))
+RECURRING_POLL_SECONDS = float(os.getenv('RECURRING_POLL_SECONDS', '300'))
+
+# ============================================================================
+# ARCHIVE SETTINGS
+# ============================================================================
+
+# `manage.py archive_posts` moves finished posts scheduled more than
+# ARCHIVE_AFTER_DAYS ago to the archive table, ARCHIVE_BATCH_SIZE per transaction.
+# Dashboards only read the archive when paging back past that many days.
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '90'))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '500'))
+
+# ============================================================================
+# ATTEMPT LOG SETTINGS
+# ============================================================================
+
+# The scheduler logs every delivery attempt. `manage.py prune_attempts` drops the
+# platform responses from attempts older than ATTEMPT_COMPACT_AFTER_DAYS (outcome
+# and latency stay) and deletes attempts older than ATTEMPT_RETENTION_DAYS.
+ATTEMPT_COMPACT_AFTER_DAYS = int(os.getenv('ATTEMPT_COMPACT_AFTER_DAYS', '30'))
+ATTEMPT_RETENTION_DAYS = int(os.getenv('ATTEMPT_RETENTION_DAYS', '180'))
+ATTEMPT_PRUNE_BATCH_SIZE = int(os.getenv('ATTEMPT_PRUNE_BATCH_SIZE', '5000'))
+
+# ============================================================================
+# IMAGE PROCESSING SETTINGS
+# ============================================================================
+
+# Uploads are resized into a dashboard thumbnail and one copy per platform by a
+# process pool inside run_scheduler (0 workers: only `manage.py process_images` does it)
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', '2'))
+IMAGE_POLL_SECONDS = float(os.getenv('IMAGE_POLL_SECONDS', '5'))
+IMAGE_BATCH_SIZE = int(os.getenv('IMAGE_BATCH_SIZE', '20'))
+
+# ============================================================================
+# LIVE UPDATE SETTINGS
+# ============================================================================
+
+# Dashboards get stats and post changes pushed over server-sent events (ASGI only;
+# under WSGI they keep polling). Changes fan out through NOTIFY on PostgreSQL, or
+# through a local broker that run_scheduler starts on this port (UDP in, TCP out).
+LIVE_UPDATES = os.getenv('LIVE_UPDATES', 'True') == 'True'
+LIVE_BROKER_HOST = os.getenv('LIVE_BROKER_HOST', '127.0.0.1')
+LIVE_BROKER_PORT = int(os.getenv('LIVE_BROKER_PORT', '8767'))
+# Comment lines sent on idle streams so proxies don't time them out
+LIVE_KEEPALIVE_SECONDS = float(os.getenv('LIVE_KEEPALIVE_SECONDS', '25'))
+
+# ============================================================================
+# METRICS SETTINGS
+# ============================================================================
+
+# /metrics/ serves Prometheus text to localhost (or anyone when DEBUG).
+# Set METRICS_TOKEN to let a remote scraper in with "Authorization: Bearer <token>".
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# run_scheduler serves its own metrics (queue depth, lateness, platform calls)
+# at http://SCHEDULER_METRICS_HOST:SCHEDULER_METRICS_PORT/metrics; port 0 turns it off
+SCHEDULER_METRICS_HOST = os.getenv('SCHEDULER_METRICS_HOST', '127.0.0.1')
+SCHEDULER_METRICS_PORT = int(os.getenv('SCHEDULER_METRICS_PORT', '8766'))
+
 # ============================================================================
 # PRODUCTION SECURITY SETTINGS
 # ============================================================================
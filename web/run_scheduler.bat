@@ -11,7 +11,7 @@ call venv\Scripts\activate
 
 echo.
 echo ✅ Starting background scheduler...
-echo    Checking posts every 30 seconds
+echo    Posting each post as soon as it is due
 echo.
 echo Press Ctrl+C to stop the scheduler.
 echo.
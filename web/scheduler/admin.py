@@ -1,5 +1,9 @@
-from django.contrib import admin
-from .models import SocialAccount, ScheduledPost
+from django.contrib import admin, messages
+from django.db import transaction
+from .models import SocialAccount, RecurringPost, ScheduledPost, ArchivedPost, PostAttempt, PostStatusCounter, RateLimitBucket
+from .bulk import apply_bulk_action
+from .live import publish_post_changes, publish_posts
+from .stats import apply_counter_deltas, status_change
 
 
 @admin.register(SocialAccount)
@@ -21,10 +25,125 @@ class ScheduledPostAdmin(admin.ModelAdmin):
     list_display = ('user', 'social_account', 'status', 'scheduled_at', 'created_at')
     list_filter = ('status', 'scheduled_at', 'created_at')
     search_fields = ('user__username', 'content')
-    readonly_fields = ('created_at', 'updated_at', 'last_attempt_at')
+    actions = ['cancel_posts', 'retry_posts']
+    readonly_fields = ('created_at', 'updated_at', 'last_attempt_at', 'next_attempt_at', 'attempt_count', 'lease_owner', 'lease_expires_at', 'image_state', 'image_variants')
     fieldsets = (
-        ('Post Info', {'fields': ('user', 'social_account', 'content', 'image')}),
+        ('Post Info', {'fields': ('user', 'social_account', 'content', 'image', 'image_state', 'image_variants')}),
         ('Scheduling', {'fields': ('scheduled_at', 'status')}),
-        ('Results', {'fields': ('last_attempt_at', 'result_message')}),
+        ('Results', {'fields': ('last_attempt_at', 'next_attempt_at', 'attempt_count', 'result_message')}),
+        ('Lease', {'fields': ('lease_owner', 'lease_expires_at')}),
+        ('Timestamps', {'fields': ('created_at', 'updated_at')}),
+    )
+
+    def save_model(self, request, obj, form, change):
+        # Keep the status counters in step with edits made here
+        with transaction.atomic():
+            old = None
+            if change:
+                old = ScheduledPost.objects.select_related('social_account').get(pk=obj.pk)
+            if 'image' in form.changed_data:
+                obj.queue_image()
+            if change and {'scheduled_at', 'status'} & set(form.changed_data):
+                # next_attempt_at isn't editable here: drop a pending retry time so
+                # the post goes out at the new scheduled_at
+                obj.next_attempt_at = None
+                if obj.status == 'scheduled' and old.status != 'scheduled':
+                    obj.attempt_count = 0
+            super().save_model(request, obj, form, change)
+            changes = [status_change(obj.user_id, obj.social_account.platform, None, obj.status)]
+            if old:
+                changes.append(status_change(old.user_id, old.social_account.platform, old.status, None))
+            apply_counter_deltas(*changes)
+            publish_posts([obj] + ([old] if old and old.user_id != obj.user_id else []))
+
+    def delete_model(self, request, obj):
+        post_id = obj.id
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            apply_counter_deltas(status_change(obj.user_id, obj.social_account.platform, obj.status, None))
+            publish_post_changes(obj.user_id, [post_id])
+
+    def delete_queryset(self, request, queryset):
+        # Set-based, and skips posts the scheduler is sending right now
+        selected = queryset.count()
+        deleted = apply_bulk_action(queryset, 'delete')
+        if deleted < selected:
+            self.message_user(
+                request, f"Deleted {deleted} of {selected} selected posts; the rest are being sent right now",
+                messages.WARNING,
+            )
+
+    @admin.action(description='Cancel selected scheduled posts')
+    def cancel_posts(self, request, queryset):
+        changed = apply_bulk_action(queryset, 'cancel')
+        self.message_user(request, f"Cancelled {changed} of {queryset.count()} selected posts")
+
+    @admin.action(description='Retry selected failed posts')
+    def retry_posts(self, request, queryset):
+        changed = apply_bulk_action(queryset, 'retry')
+        self.message_user(request, f"Rescheduled {changed} of {queryset.count()} selected posts")
+
+
+@admin.register(RecurringPost)
+class RecurringPostAdmin(admin.ModelAdmin):
+    list_display = ('user', 'social_account', 'frequency', 'starts_at', 'is_active', 'materialized_until')
+    list_filter = ('frequency', 'is_active', 'created_at')
+    search_fields = ('user__username', 'content')
+    readonly_fields = ('materialized_until', 'created_at', 'updated_at')
+    fieldsets = (
+        ('Post Info', {'fields': ('user', 'social_account', 'content', 'image')}),
+        ('Schedule', {'fields': ('frequency', 'interval', 'weekdays', 'cron', 'timezone', 'starts_at', 'ends_at', 'is_active')}),
+        ('Materialization', {'fields': ('materialized_until',)}),
         ('Timestamps', {'fields': ('created_at', 'updated_at')}),
     )
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.materialized_until = obj.starts_at
+        super().save_model(request, obj, form, change)
+
+
+@admin.register(ArchivedPost)
+class ArchivedPostAdmin(admin.ModelAdmin):
+    list_display = ('user', 'social_account', 'status', 'scheduled_at', 'archived_at')
+    list_filter = ('status', 'scheduled_at')
+    search_fields = ('user__username', 'content')
+    # Rows are moved here by archive_posts; deleting them would leave the status counters off
+    readonly_fields = [field.name for field in ArchivedPost._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PostAttempt)
+class PostAttemptAdmin(admin.ModelAdmin):
+    # post_id, not post: archived posts' attempts have no ScheduledPost to show
+    list_display = ('post_id', 'attempt', 'outcome', 'started_at', 'latency_ms')
+    list_filter = ('outcome', 'started_at')
+    search_fields = ('=post__id',)
+    readonly_fields = [field.attname for field in PostAttempt._meta.fields]
+    exclude = ('post',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PostStatusCounter)
+class PostStatusCounterAdmin(admin.ModelAdmin):
+    list_display = ('user', 'platform', 'status', 'count')
+    list_filter = ('platform', 'status')
+    search_fields = ('user__username',)
+    readonly_fields = ('user', 'platform', 'status', 'count')
+
+
+@admin.register(RateLimitBucket)
+class RateLimitBucketAdmin(admin.ModelAdmin):
+    list_display = ('social_account', 'platform', 'tokens', 'updated_at')
+    list_filter = ('platform',)
+    search_fields = ('social_account__user__username', 'social_account__username')
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class SchedulerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'scheduler'
+
+    def ready(self):
+        from .instrumentation import install_query_counter
+        from .search import ensure_search_index
+        post_migrate.connect(ensure_search_index, sender=self)
+        connection_created.connect(install_query_counter)
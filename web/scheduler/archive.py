@@ -0,0 +1,114 @@
+"""Archive: finished posts move out of ScheduledPost once they're old
+
+Posts that succeeded, failed, gave up or were cancelled more than
+ARCHIVE_AFTER_DAYS ago are moved to ArchivedPost in batches (`manage.py
+archive_posts`), so the scheduler, search and first dashboard pages only
+work on recent rows. The dashboard reads the archive only once a user pages
+back to their newest archived post; search only covers posts not yet
+archived. Status counters keep counting archived posts, so the dashboard
+totals don't change.
+
+PostgreSQL: the archive is range-partitioned by month of scheduled_at, and
+each month's partition is created before the first batch that needs it; an
+old month can be dropped as one table. ScheduledPost itself stays a plain
+table since foreign keys point at it. Other databases: an ordinary table.
+"""
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from .constants import ARCHIVED_STATUSES
+from .models import ArchivedPost, ScheduledPost
+
+logger = logging.getLogger(__name__)
+
+# Copied as they are; the lease, retry and image-queue columns don't apply any more
+MOVED_FIELDS = (
+    'id', 'user_id', 'social_account_id', 'content', 'image', 'image_variants', 'scheduled_at',
+    'status', 'last_attempt_at', 'result_message', 'attempt_count', 'created_at', 'updated_at',
+)
+
+# Partitions known to exist, per process
+_partitions = set()
+
+
+def _month_start(moment):
+    moment = moment.astimezone(dt_timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+
+
+def _next_month(month):
+    return month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+
+
+def ensure_partitions(first, last):
+    """PostgreSQL: create the monthly partitions (UTC months) covering first..last"""
+    if connection.vendor != 'postgresql':
+        return
+    table = ArchivedPost._meta.db_table
+    month = _month_start(first)
+    with connection.cursor() as cursor:
+        while month <= last:
+            name = f'{table}_p{month:%Y_%m}'
+            if name not in _partitions:
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+                )
+                _partitions.add(name)
+            month = _next_month(month)
+
+
+def archive_cutoff(now=None):
+    """Finished posts scheduled before this are archived by default"""
+    return (now or timezone.now()) - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+
+
+def archivable_posts(before):
+    return ScheduledPost.objects.filter(status__in=ARCHIVED_STATUSES, scheduled_at__lt=before)
+
+
+def archive_batch(before, batch_size=None):
+    """
+    Move up to batch_size of the oldest finished posts scheduled before `before`
+    Returns: number of posts moved
+    """
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    candidates = archivable_posts(before).order_by('scheduled_at')
+    # Partitions are created outside the move's transaction: creating one
+    # locks the whole archive table, which dashboards may be reading
+    times = list(candidates.values_list('scheduled_at', flat=True)[:batch_size])
+    if not times:
+        return 0
+    ensure_partitions(times[0], times[-1])
+
+    now = timezone.now()
+    with transaction.atomic():
+        rows = candidates.filter(scheduled_at__gte=times[0], scheduled_at__lte=times[-1])
+        if connection.features.has_select_for_update_skip_locked:
+            # Skip a post someone is retrying or deleting right now; a later run gets it
+            rows = rows.select_for_update(skip_locked=True)
+        rows = list(rows.values(*MOVED_FIELDS)[:batch_size])
+        ArchivedPost.objects.bulk_create([ArchivedPost(archived_at=now, **row) for row in rows])
+        ScheduledPost.objects.filter(id__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+def archive_old_posts(before=None, batch_size=None):
+    """
+    Archive every finished post scheduled before `before` (default: archive_cutoff()),
+    one transaction per batch
+    Returns: number of posts moved
+    """
+    before = before or archive_cutoff()
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    moved = 0
+    while True:
+        count = archive_batch(before, batch_size)
+        moved += count
+        if count < batch_size:
+            break
+    if moved:
+        logger.info("Archived %d posts scheduled before %s", moved, before.isoformat())
+    return moved
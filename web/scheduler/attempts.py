@@ -0,0 +1,82 @@
+"""Delivery attempt log: one narrow, insert-only row per try at sending a post
+
+The scheduler's StatusWriteBuffer inserts a batch of PostAttempts in the same
+transaction as the status updates, so a post's timeline (every attempt, its
+latency and the platform's answer) survives retries that overwrite
+result_message. Pruning runs in batches: responses are dropped after
+ATTEMPT_COMPACT_AFTER_DAYS, leaving outcome and latency, and rows are deleted
+after ATTEMPT_RETENTION_DAYS.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+from .models import ArchivedPost, PostAttempt, ScheduledPost
+from .retries import classify_error
+
+
+def record_attempt(post, success, message, started_at, seconds):
+    """An unsaved PostAttempt for one platform call; number_attempts() numbers it before saving"""
+    return PostAttempt(
+        post_id=post.id,
+        started_at=started_at,
+        finished_at=started_at + timedelta(seconds=seconds),
+        latency_ms=round(seconds * 1000),
+        outcome='success' if success else classify_error(message),
+        response=message or '',
+    )
+
+
+def number_attempts(attempts):
+    """
+    Number attempts on from each post's highest logged attempt, in one query
+    Not from attempt_count: retrying a dead post resets that.
+    """
+    latest = dict(
+        PostAttempt.objects.filter(post_id__in={attempt.post_id for attempt in attempts})
+        .values('post_id').annotate(latest=Max('attempt')).values_list('post_id', 'latest')
+    )
+    for attempt in attempts:
+        latest[attempt.post_id] = attempt.attempt = latest.get(attempt.post_id, 0) + 1
+    return attempts
+
+
+def post_timeline(user, post_id):
+    """
+    A user's post, live or archived, and its attempts oldest first
+    Returns: (post, attempts), or (None, []) if the user has no such post
+    """
+    post = (ScheduledPost.objects.filter(user=user, id=post_id).select_related('social_account').first()
+            or ArchivedPost.objects.filter(user=user, id=post_id).select_related('social_account').first())
+    if post is None:
+        return None, []
+    return post, list(PostAttempt.objects.filter(post_id=post_id).order_by('started_at', 'id'))
+
+
+def _in_batches(attempts, batch_size, change):
+    """Apply change() to attempts batch_size ids at a time. Returns: rows changed"""
+    changed = 0
+    while True:
+        ids = list(attempts.order_by('started_at').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return changed
+        changed += change(PostAttempt.objects.filter(id__in=ids))
+        if len(ids) < batch_size:
+            return changed
+
+
+def prune_attempts(now=None, compact_after_days=None, retention_days=None, batch_size=None):
+    """
+    Delete attempts past retention, then compact the remaining old ones
+    Returns: {'deleted': n, 'compacted': n}
+    """
+    now = now or timezone.now()
+    compact_after_days = settings.ATTEMPT_COMPACT_AFTER_DAYS if compact_after_days is None else compact_after_days
+    retention_days = settings.ATTEMPT_RETENTION_DAYS if retention_days is None else retention_days
+    batch_size = batch_size or settings.ATTEMPT_PRUNE_BATCH_SIZE
+
+    old = PostAttempt.objects.filter(started_at__lt=now - timedelta(days=retention_days))
+    deleted = _in_batches(old, batch_size, lambda batch: batch.delete()[0])
+    aged = PostAttempt.objects.filter(started_at__lt=now - timedelta(days=compact_after_days)).exclude(response='')
+    compacted = _in_batches(aged, batch_size, lambda batch: batch.update(response=''))
+    return {'deleted': deleted, 'compacted': compacted}
@@ -0,0 +1,303 @@
+"""Bulk scheduling: import posts from CSV or NDJSON, and act on many posts at once
+
+Imports: the file is read as a stream and validated a chunk of rows at a time, with
+the same rules as SchedulePostForm. Each chunk's valid rows are inserted with
+one bulk_create, in the same transaction as their status counter deltas.
+The user's accounts are loaded once per import, not once per row. Invalid
+rows are reported by line number and the rest are still scheduled.
+
+Columns (CSV header or NDJSON keys):
+    platform or social_account   'instagram', ... or the account id
+    content
+    scheduled_at                 ISO 8601; times without an offset are in `timezone`
+    timezone                     optional, e.g. 'Asia/Kolkata' (default: the import's)
+
+Actions: apply_bulk_action() cancels, retries or deletes a queryset of posts
+with set-based UPDATE/DELETE statements, guarded by status like the
+single-post views, and keeps the status counters and live updates in step.
+"""
+import codecs
+import csv
+import json
+from collections import Counter, defaultdict
+from datetime import timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .constants import STATUS_CHOICES
+from .forms import check_post
+from .live import publish_post_changes
+from .models import ScheduledPost, SocialAccount
+from .stats import apply_counter_deltas, status_change
+from .wakeup import notify_scheduler
+
+FORMATS = ('csv', 'ndjson')
+CHUNK_SIZE = 1000
+# Beyond this the report only counts errors
+MAX_REPORTED_ERRORS = 100
+
+# action: (statuses it applies to, new status or None to delete)
+BULK_ACTIONS = {
+    'cancel': (('scheduled',), 'cancelled'),
+    'retry': (('failed', 'dead'), 'scheduled'),
+    # Not posts in flight: the scheduler is sending them right now
+    'delete': (tuple(status for status, _ in STATUS_CHOICES if status != 'processing'), None),
+}
+# Ids per UPDATE/DELETE statement (SQLite caps query parameters)
+ACTION_BATCH_SIZE = 500
+
+
+def guess_format(filename):
+    """Returns: 'csv' or 'ndjson' from the file extension, or None"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension in ('csv', 'txt'):
+        return 'csv'
+    if extension in ('ndjson', 'jsonl', 'json'):
+        return 'ndjson'
+    return None
+
+
+def _lines(stream):
+    """Decode a binary stream line by line (drops a UTF-8 byte order mark)"""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    for line in stream:
+        yield decoder.decode(line)
+
+
+def iter_rows(stream, format):
+    """
+    Parse rows from a binary stream without reading it all into memory
+    Yields: (line number, dict or None if the line isn't a JSON object)
+    Raises: ValidationError if a CSV header lacks required columns
+    """
+    if format == 'csv':
+        reader = csv.DictReader(_lines(stream))
+        columns = set(reader.fieldnames or ())
+        missing = {'content', 'scheduled_at'} - columns
+        if missing or not columns & {'platform', 'social_account'}:
+            raise ValidationError(
+                "CSV header needs content, scheduled_at and platform (or social_account) columns"
+            )
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(_lines(stream), 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+class ImportReport:
+    """What an import did; errors hold the first MAX_REPORTED_ERRORS bad rows"""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line, messages):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': messages})
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'dry_run': self.dry_run,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
+
+
+class PostImporter:
+    """Validate and insert one user's rows; accounts are resolved from a map loaded up front"""
+
+    def __init__(self, user, default_timezone=None, dry_run=False):
+        self.user = user
+        self.default_timezone = default_timezone or timezone.get_current_timezone()
+        self.report = ImportReport(dry_run)
+        # Same accounts the schedule form offers
+        accounts = list(SocialAccount.objects.filter(user=user, is_connected=True))
+        self.accounts = {account.platform: account for account in accounts}
+        self.accounts.update({str(account.id): account for account in accounts})
+        self._timezones = {}
+
+    def run(self, rows, max_rows=None):
+        """rows: iter_rows() output. Returns: ImportReport"""
+        max_rows = settings.BULK_IMPORT_MAX_ROWS if max_rows is None else max_rows
+        chunk = []
+        for line, row in rows:
+            if max_rows and self.report.rows >= max_rows:
+                self.report.add_error(line, [f"Stopped: imports are limited to {max_rows} rows"])
+                break
+            self.report.rows += 1
+            chunk.append((line, row))
+            if len(chunk) >= CHUNK_SIZE:
+                self.import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self.import_chunk(chunk)
+        return self.report
+
+    def import_chunk(self, chunk):
+        now = timezone.now()
+        posts = []
+        for line, row in chunk:
+            post, errors = self.build(row, now)
+            if errors:
+                self.report.add_error(line, errors)
+            else:
+                posts.append(post)
+        if self.report.dry_run:
+            # Counts what would have been created
+            self.report.created += len(posts)
+            return
+        if not posts:
+            return
+
+        per_platform = Counter(post.social_account.platform for post in posts)
+        with transaction.atomic():
+            ScheduledPost.objects.bulk_create(posts)
+            apply_counter_deltas(*(
+                status_change(self.user.id, platform, None, 'scheduled', n)
+                for platform, n in per_platform.items()
+            ))
+            publish_post_changes(self.user.id, [post.id for post in posts])
+            notify_scheduler(min(post.scheduled_at for post in posts))
+        self.report.created += len(posts)
+
+    def build(self, row, now):
+        """Returns: (unsaved ScheduledPost, []) or (None, error messages)"""
+        if row is None:
+            return None, ["Not a JSON object"]
+
+        errors = []
+        key = str(row.get('social_account') or row.get('platform') or '').strip().lower()
+        account = self.accounts.get(key)
+        if account is None:
+            errors.append(f"No connected account for '{key}'" if key else "Missing platform")
+
+        content = row.get('content')
+        content = content if isinstance(content, str) else ''
+        scheduled_at = self.parse_time(row.get('scheduled_at'), row.get('timezone'), errors)
+
+        try:
+            check_post(content, scheduled_at, now)
+        except ValidationError as e:
+            errors.extend(e.messages)
+        if errors:
+            return None, errors
+        return ScheduledPost(
+            user=self.user, social_account=account, content=content, scheduled_at=scheduled_at,
+        ), []
+
+    def parse_time(self, value, zone, errors):
+        if not value or not isinstance(value, str):
+            errors.append("Missing scheduled_at")
+            return None
+        try:
+            scheduled_at = parse_datetime(value.strip())
+        except ValueError:
+            scheduled_at = None
+        if scheduled_at is None:
+            errors.append(f"Invalid scheduled_at '{value}' (use ISO 8601, e.g. 2026-01-31T09:30)")
+            return None
+        if timezone.is_aware(scheduled_at):
+            return scheduled_at
+
+        tz = self.default_timezone
+        if zone:
+            tz = self.zone(str(zone))
+            if tz is None:
+                errors.append(f"Unknown timezone '{zone}'")
+                return None
+        return timezone.make_aware(scheduled_at, tz)
+
+    def zone(self, name):
+        """ZoneInfo by name, cached per import; None if unknown"""
+        if name not in self._timezones:
+            try:
+                self._timezones[name] = ZoneInfo(name)
+            except (ZoneInfoNotFoundError, ValueError):
+                self._timezones[name] = None
+        return self._timezones[name]
+
+
+def import_posts(user, stream, format, timezone_name=None, dry_run=False):
+    """
+    Schedule every valid row of a CSV or NDJSON stream for user
+    timezone_name: zone for times without an offset (default: the current timezone)
+    Returns: ImportReport
+    Raises: ValidationError for an unreadable file (bad format or CSV header) or an unknown zone
+    """
+    if format not in FORMATS:
+        raise ValidationError(
+            f"Unknown format '{format}' (use {' or '.join(FORMATS)})" if format
+            else f"Could not tell the file format; give format ({' or '.join(FORMATS)})"
+        )
+    importer = PostImporter(user, dry_run=dry_run)
+    if timezone_name:
+        importer.default_timezone = importer.zone(timezone_name)
+        if importer.default_timezone is None:
+            raise ValidationError(f"Unknown timezone '{timezone_name}'")
+    return importer.run(iter_rows(stream, format))
+
+
+def apply_bulk_action(posts, action):
+    """
+    Cancel, retry or delete every post in a queryset that the action applies to
+    The matching rows are locked and read once, then changed ACTION_BATCH_SIZE
+    at a time with `UPDATE/DELETE ... WHERE id IN (...) AND status = ...`, one
+    (user, platform, status) group at a time. Counters follow the row counts
+    those statements report, so posts that moved on meanwhile are not counted.
+    Returns: number of posts changed
+    """
+    from_statuses, new_status = BULK_ACTIONS[action]
+    retry_at = timezone.now() + timedelta(minutes=1)
+    changed = 0
+    with transaction.atomic():
+        groups = defaultdict(list)
+        for post_id, user_id, platform, status in (
+            posts.filter(status__in=from_statuses)
+            .select_for_update(of=('self',))
+            .values_list('id', 'user_id', 'social_account__platform', 'status')
+        ):
+            groups[user_id, platform, status].append(post_id)
+
+        deltas = []
+        by_user = defaultdict(list)
+        for (user_id, platform, status), post_ids in groups.items():
+            moved = 0
+            for start in range(0, len(post_ids), ACTION_BATCH_SIZE):
+                batch = ScheduledPost.objects.filter(id__in=post_ids[start:start + ACTION_BATCH_SIZE], status=status)
+                if action == 'delete':
+                    moved += batch.delete()[1].get(ScheduledPost._meta.label, 0)
+                elif action == 'retry':
+                    # As retry_post_view: due in a minute, with a fresh set of automatic retries
+                    moved += batch.update(
+                        status=new_status, scheduled_at=retry_at, next_attempt_at=None, attempt_count=0,
+                    )
+                else:
+                    moved += batch.update(status=new_status)
+            if moved:
+                deltas.append(status_change(user_id, platform, status, new_status, moved))
+                by_user[user_id].extend(post_ids)
+                changed += moved
+
+        apply_counter_deltas(*deltas)
+        for user_id, post_ids in by_user.items():
+            publish_post_changes(user_id, post_ids)
+        if changed and action != 'delete':
+            notify_scheduler(retry_at if action == 'retry' else None)
+    return changed
@@ -9,11 +9,42 @@ PLATFORM_CHOICES = (
 
 STATUS_CHOICES = (
     ('scheduled', 'Scheduled'),
+    ('processing', 'In flight'),
     ('success', 'Success'),
     ('failed', 'Failed'),
+    ('dead', 'Gave up'),
     ('cancelled', 'Cancelled'),
 )
 
+# Finished posts: old ones move to the archive table
+ARCHIVED_STATUSES = ('success', 'failed', 'dead', 'cancelled')
+
+# Recurring posts
+FREQUENCY_CHOICES = (
+    ('daily', 'Daily'),
+    ('weekly', 'Weekly'),
+    ('cron', 'Cron expression'),
+)
+
+WEEKDAY_CHOICES = (
+    (0, 'Mon'), (1, 'Tue'), (2, 'Wed'), (3, 'Thu'), (4, 'Fri'), (5, 'Sat'), (6, 'Sun'),
+)
+
+# Upload processing (blank: the post has no image)
+IMAGE_STATE_CHOICES = (
+    ('pending', 'Processing'),
+    ('ready', 'Ready'),
+    ('failed', 'Could not process'),
+)
+
+# Delivery attempts: success, or the error class from scheduler/retries.py
+ATTEMPT_OUTCOME_CHOICES = (
+    ('success', 'Posted'),
+    ('rate_limit', 'Rate limited'),
+    ('transient', 'Temporary error'),
+    ('permanent', 'Rejected'),
+)
+
 TIMEZONE_CHOICES = (
     ('Asia/Kolkata', 'India (IST)'),
     ('Asia/Bangkok', 'Thailand (ICT)'),
@@ -28,7 +59,9 @@ TIMEZONE_CHOICES = (
 # Status badge colors for UI
 STATUS_COLORS = {
     'scheduled': 'bg-blue-100 text-blue-800',
+    'processing': 'bg-yellow-100 text-yellow-800',
     'success': 'bg-green-100 text-green-800',
     'failed': 'bg-red-100 text-red-800',
+    'dead': 'bg-red-200 text-red-900',
     'cancelled': 'bg-gray-100 text-gray-800',
 }
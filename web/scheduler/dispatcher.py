@@ -0,0 +1,120 @@
+"""Due-time-aware scheduler loop
+
+Instead of polling the database on a fixed interval, the loop keeps a min-heap
+of upcoming due times and sleeps until the earliest one, or until a view wakes
+it with notify_scheduler().
+"""
+import heapq
+import logging
+import threading
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import Count, Min
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from .instrumentation import DUE_POSTS, OLDEST_DUE_SECONDS, measure, record_tick
+from .models import ScheduledPost
+from .services import PostingService
+from .wakeup import WakeupListener, notify_scheduler, parse_payload
+
+logger = logging.getLogger(__name__)
+
+
+def collect_queue_depth():
+    """Set the due-post gauges from the database (called on each metrics scrape)"""
+    try:
+        now = timezone.now()
+        backlog = PostingService.due_posts(now).aggregate(
+            due=Count('id'), oldest=Min(Coalesce('next_attempt_at', 'scheduled_at')),
+        )
+    finally:
+        # Each scrape is served on a new thread, with a connection of its own
+        connection.close()
+    DUE_POSTS.set(backlog['due'])
+    OLDEST_DUE_SECONDS.set((now - backlog['oldest']).total_seconds() if backlog['oldest'] else 0)
+
+
+class DueTimeScheduler:
+    """Dispatch posts as they come due"""
+
+    def __init__(self, worker_id=None, max_sleep=None, heap_size=None):
+        self.worker_id = worker_id or PostingService.default_worker_id()
+        self.max_sleep = max_sleep or settings.SCHEDULER_MAX_SLEEP
+        self.heap_size = heap_size or settings.SCHEDULER_HEAP_SIZE
+        self._heap = []
+        self._stop = threading.Event()
+        self._listener = None
+
+    def refresh(self):
+        """Reload the next due times from the database"""
+        scheduled = ScheduledPost.objects.filter(status='scheduled')
+        self._heap = list(
+            scheduled.filter(next_attempt_at__isnull=True)
+            .order_by('scheduled_at')
+            .values_list('scheduled_at', flat=True)[:self.heap_size]
+        )
+        # Deferred or retrying posts come due at next_attempt_at, but never
+        # before scheduled_at: due_posts() checks both
+        self._heap.extend(
+            scheduled.filter(next_attempt_at__isnull=False)
+            .annotate(due_at=Greatest('scheduled_at', 'next_attempt_at'))
+            .order_by('due_at')
+            .values_list('due_at', flat=True)[:self.heap_size]
+        )
+        # Leases held by a crashed worker come due again when they expire
+        lease_expiry = ScheduledPost.objects.filter(status='processing').aggregate(
+            next_expiry=Min('lease_expires_at')
+        )['next_expiry']
+        if lease_expiry:
+            self._heap.append(lease_expiry)
+        heapq.heapify(self._heap)
+
+    def seconds_until_next(self):
+        """Returns: seconds to sleep before the next due post (capped at max_sleep)"""
+        if not self._heap:
+            return self.max_sleep
+        delta = (self._heap[0] - timezone.now()).total_seconds()
+        return min(max(delta, 0), self.max_sleep)
+
+    def run(self):
+        """Loop until stop() is called; a failing tick or refresh is logged and retried with backoff"""
+        listener = self._listener = WakeupListener()
+        stale, delay = True, 1
+        try:
+            while not self._stop.is_set():
+                close_old_connections()
+                try:
+                    if stale:
+                        self.refresh()
+                        stale = False
+                    if self._heap and self._heap[0] <= timezone.now():
+                        with measure() as measurement:
+                            results = PostingService.execute_scheduled_posts(self.worker_id)
+                        record_tick(self.worker_id, results, measurement)
+                        stale, delay = True, 1
+                        continue
+                except Exception:
+                    logger.exception("Scheduler tick failed, retrying in %ss", delay)
+                    stale = True
+                    self._stop.wait(delay)
+                    delay = min(delay * 2, self.max_sleep)
+                    continue
+                delay = 1
+
+                payloads = listener.wait(self.seconds_until_next())
+                due_times = [parse_payload(payload) for payload in payloads]
+                if not payloads or None in due_times:
+                    # Timed out, or a post was cancelled: re-read the queue
+                    stale = True
+                else:
+                    for due_at in due_times:
+                        heapq.heappush(self._heap, due_at)
+        finally:
+            listener.close()
+
+    def stop(self):
+        self._stop.set()
+        # Interrupt the current sleep
+        notify_scheduler()
+        if self._listener:
+            self._listener.interrupt()
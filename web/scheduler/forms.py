@@ -1,10 +1,21 @@
 from django import forms
 from django.contrib.auth.models import User
-from .models import ScheduledPost, SocialAccount
-from .constants import PLATFORM_CHOICES, TIMEZONE_CHOICES
+from zoneinfo import ZoneInfo
+from .models import RecurringPost, ScheduledPost, SocialAccount
+from .constants import PLATFORM_CHOICES, STATUS_CHOICES, TIMEZONE_CHOICES, WEEKDAY_CHOICES
+from .recurrence import CronSchedule
 from django.utils import timezone
 
 
+def check_post(content, scheduled_at, now=None):
+    """Rules every new post must pass (form and bulk import). Raises: ValidationError"""
+    if not content or len(content.strip()) == 0:
+        raise forms.ValidationError("Content cannot be empty!")
+    
+    if scheduled_at and scheduled_at <= (now or timezone.now()):
+        raise forms.ValidationError("Scheduled time must be in the future!")
+
+
 class SignUpForm(forms.ModelForm):
     password = forms.CharField(widget=forms.PasswordInput, label="Password")
     password_confirm = forms.CharField(widget=forms.PasswordInput, label="Confirm Password")
@@ -98,13 +109,122 @@ class SchedulePostForm(forms.ModelForm):
     
     def clean(self):
         cleaned_data = super().clean()
-        scheduled_at = cleaned_data.get('scheduled_at')
-        content = cleaned_data.get('content')
-        
-        if not content or len(content.strip()) == 0:
-            raise forms.ValidationError("Content cannot be empty!")
+        check_post(cleaned_data.get('content'), cleaned_data.get('scheduled_at'))
+        return cleaned_data
+
+    def save(self, commit=True):
+        if 'image' in self.changed_data:
+            self.instance.queue_image()
+        return super().save(commit)
+
+
+class RecurringPostForm(forms.ModelForm):
+    weekdays = forms.TypedMultipleChoiceField(
+        choices=WEEKDAY_CHOICES,
+        coerce=int,
+        required=False,
+        widget=forms.CheckboxSelectMultiple,
+        help_text="Weekly: days to post on (default: the start day)"
+    )
+    
+    class Meta:
+        model = RecurringPost
+        fields = ['social_account', 'content', 'image', 'frequency', 'interval', 'weekdays', 'cron',
+                  'timezone', 'starts_at', 'ends_at']
+        widgets = {
+            'social_account': forms.Select(attrs={'class': 'form-control'}),
+            'content': forms.Textarea(attrs={
+                'class': 'form-control',
+                'rows': 4,
+                'placeholder': 'What\'s on your mind? (max 280 chars)',
+                'maxlength': '280'
+            }),
+            'image': forms.FileInput(attrs={'class': 'form-control', 'accept': 'image/*'}),
+            'frequency': forms.Select(attrs={'class': 'form-control'}),
+            'interval': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
+            'cron': forms.TextInput(attrs={'class': 'form-control', 'placeholder': '0 9 * * 1-5'}),
+            'timezone': forms.Select(attrs={'class': 'form-control'}),
+            'starts_at': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'},
+                                             format='%Y-%m-%dT%H:%M'),
+            'ends_at': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'},
+                                           format='%Y-%m-%dT%H:%M'),
+        }
+    
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if user:
+            self.fields['social_account'].queryset = SocialAccount.objects.filter(
+                user=user,
+                is_connected=True
+            )
+        if self.instance.pk:
+            # Show times as wall-clock times in the recurrence's own zone
+            tz = ZoneInfo(self.instance.timezone)
+            for name in ('starts_at', 'ends_at'):
+                value = getattr(self.instance, name)
+                if value:
+                    self.initial[name] = value.astimezone(tz).replace(tzinfo=None)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        check_post(cleaned_data.get('content'), None)
         
-        if scheduled_at and scheduled_at <= timezone.now():
-            raise forms.ValidationError("Scheduled time must be in the future!")
+        # Entered times are wall-clock times in the chosen zone
+        tz = ZoneInfo(cleaned_data.get('timezone') or 'UTC')
+        for name in ('starts_at', 'ends_at'):
+            value = cleaned_data.get(name)
+            if value:
+                cleaned_data[name] = timezone.make_aware(timezone.make_naive(value), tz)
+        starts_at, ends_at = cleaned_data.get('starts_at'), cleaned_data.get('ends_at')
+        if starts_at and ends_at and ends_at <= starts_at:
+            raise forms.ValidationError("End time must be after the start!")
         
+        if cleaned_data.get('frequency') == 'cron':
+            try:
+                CronSchedule(cleaned_data.get('cron') or '')
+            except ValueError as e:
+                self.add_error('cron', str(e))
         return cleaned_data
+    
+    def save(self, commit=True):
+        if self.instance.pk is None:
+            self.instance.materialized_until = self.instance.starts_at
+        return super().save(commit)
+
+
+class BulkActionForm(forms.Form):
+    """Which of a user's posts a bulk cancel/retry/delete applies to: an id list or filters"""
+    action = forms.ChoiceField(choices=[('cancel', 'Cancel'), ('retry', 'Retry'), ('delete', 'Delete')])
+    ids = forms.CharField(required=False, help_text="Comma-separated post ids")
+    platform = forms.ChoiceField(choices=PLATFORM_CHOICES, required=False)
+    status = forms.ChoiceField(choices=STATUS_CHOICES, required=False)
+    scheduled_from = forms.DateTimeField(required=False)
+    scheduled_to = forms.DateTimeField(required=False)
+    
+    def clean_ids(self):
+        ids = [part.strip() for part in self.cleaned_data['ids'].split(',') if part.strip()]
+        if not all(part.isdigit() for part in ids):
+            raise forms.ValidationError("ids must be comma-separated numbers")
+        return [int(part) for part in ids]
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        filters = ('ids', 'platform', 'status', 'scheduled_from', 'scheduled_to')
+        if not self.errors and not any(cleaned_data.get(name) for name in filters):
+            raise forms.ValidationError("Give post ids or at least one filter")
+        return cleaned_data
+    
+    def filter(self, posts):
+        """Narrow a queryset to the selected posts"""
+        data = self.cleaned_data
+        if data['ids']:
+            posts = posts.filter(id__in=data['ids'])
+        if data['platform']:
+            posts = posts.filter(social_account__platform=data['platform'])
+        if data['status']:
+            posts = posts.filter(status=data['status'])
+        if data['scheduled_from']:
+            posts = posts.filter(scheduled_at__gte=data['scheduled_from'])
+        if data['scheduled_to']:
+            posts = posts.filter(scheduled_at__lt=data['scheduled_to'])
+        return posts
@@ -0,0 +1,178 @@
+"""Upload processing: EXIF-free thumbnails and per-platform image variants
+
+Uploads are stored as sent. Worker processes then render a dashboard
+thumbnail and one copy per platform within that platform's size and format
+limits, with EXIF (camera, GPS) dropped and the orientation applied.
+Variants are named after the hash of their bytes, so identical uploads share
+files and re-processing writes nothing new. Dispatch hands each platform its
+own copy and never resizes while a post is going out.
+"""
+import hashlib
+import io
+import logging
+import multiprocessing
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# max_bytes: the platform's upload limit (None: no limit)
+Variant = namedtuple('Variant', 'size format quality max_bytes')
+
+VARIANTS = {
+    'thumb': Variant((320, 320), 'WEBP', 75, None),
+    'instagram': Variant((1080, 1350), 'JPEG', 88, 8 * 1024 * 1024),
+    'facebook': Variant((2048, 2048), 'JPEG', 85, 4 * 1024 * 1024),
+    'twitter': Variant((4096, 4096), 'WEBP', 85, 5 * 1024 * 1024),
+    'linkedin': Variant((1200, 1200), 'JPEG', 85, 5 * 1024 * 1024),
+}
+
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+MIN_QUALITY = 50
+
+
+def _flatten(image, format):
+    """Modes the encoder takes: JPEG has no alpha, so transparency goes onto white"""
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    if not has_alpha:
+        return image.convert('RGB') if image.mode != 'RGB' else image
+    image = image.convert('RGBA')
+    if format != 'JPEG':
+        return image
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def encode(image, variant):
+    """
+    Resize within the variant's box and encode, lowering quality (then size)
+    until it fits max_bytes
+    Returns: encoded bytes
+    """
+    image = _flatten(image, variant.format)
+    box = variant.size
+    while True:
+        resized = image.copy()
+        resized.thumbnail(box, Image.Resampling.LANCZOS)
+        for quality in range(variant.quality, MIN_QUALITY - 1, -10):
+            buffer = io.BytesIO()
+            # No exif= argument, so nothing from the upload's metadata is written
+            resized.save(buffer, variant.format, quality=quality, optimize=variant.format == 'JPEG',
+                         icc_profile=image.info.get('icc_profile'))
+            data = buffer.getvalue()
+            if variant.max_bytes is None or len(data) <= variant.max_bytes:
+                return data
+        box = (int(box[0] * 0.8), int(box[1] * 0.8))
+
+
+def store(data, format):
+    """Save under the content hash, once. Returns: storage name"""
+    digest = hashlib.sha256(data).hexdigest()
+    name = f'variants/{digest[:2]}/{digest}.{EXTENSIONS[format]}'
+    if default_storage.exists(name):
+        return name
+    return default_storage.save(name, ContentFile(data))
+
+
+def render_variants(name):
+    """
+    Runs in a worker process: read one upload and store all its variants
+    Returns: {variant key: storage name}
+    """
+    with default_storage.open(name, 'rb') as f:
+        image = Image.open(f)
+        # JPEGs can decode straight at a reduced scale when every variant is much smaller
+        largest = max(max(variant.size) for variant in VARIANTS.values())
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+    return {key: store(encode(image, variant), variant.format) for key, variant in VARIANTS.items()}
+
+
+def process_pending_images(executor, limit=None, retry_failed=False):
+    """
+    Render variants for uploads waiting on processing, soonest-due posts first
+    Returns: {'ready': n, 'failed': n}
+    """
+    from .live import publish_post_changes
+    from .models import ScheduledPost
+
+    states = ['pending', 'failed'] if retry_failed else ['pending']
+    posts = ScheduledPost.objects.filter(image_state__in=states).exclude(image='').order_by('scheduled_at')
+    posts = list(posts.values_list('id', 'user_id', 'image')[:limit])
+    futures = {executor.submit(render_variants, image): (post_id, user_id, image)
+               for post_id, user_id, image in posts}
+
+    results = {'ready': 0, 'failed': 0}
+    for future in as_completed(futures):
+        post_id, user_id, image = futures[future]
+        try:
+            variants, state = future.result(), 'ready'
+        except BrokenProcessPool:
+            raise
+        except Exception as e:
+            logger.warning("Could not process image %s of post %s: %s", image, post_id, e)
+            variants, state = {}, 'failed'
+        # Guarded: skip posts whose image was replaced or removed meanwhile
+        updated = ScheduledPost.objects.filter(id=post_id, image=image, image_state__in=states).update(
+            image_state=state, image_variants=variants,
+        )
+        if updated:
+            results[state] += 1
+            publish_post_changes(user_id, [post_id])
+    return results
+
+
+def image_pool(workers):
+    """Worker processes are spawned, not forked: the parent runs threads and an event loop"""
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup)
+
+
+class ImageProcessor:
+    """Background thread that feeds pending uploads to a process pool (started by run_scheduler)"""
+
+    def __init__(self, workers=None, poll_seconds=None, batch_size=None):
+        self.workers = workers or settings.IMAGE_WORKERS
+        self.poll_seconds = poll_seconds or settings.IMAGE_POLL_SECONDS
+        self.batch_size = batch_size or settings.IMAGE_BATCH_SIZE
+        self.executor = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.executor = image_pool(self.workers)
+        self._thread = threading.Thread(target=self.run, name='image-processor', daemon=True)
+        self._thread.start()
+        return self
+
+    def run(self):
+        while not self._stop.is_set():
+            close_old_connections()
+            processed = 0
+            try:
+                results = process_pending_images(self.executor, self.batch_size)
+                processed = sum(results.values())
+            except BrokenProcessPool:
+                # A worker died (out of memory on a huge upload, say): start a fresh pool
+                logger.warning("Image worker pool broke, restarting it")
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = image_pool(self.workers)
+            except Exception:
+                logger.exception("Image processing failed")
+            if not processed:
+                self._stop.wait(self.poll_seconds)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        if self.executor:
+            self.executor.shutdown(cancel_futures=True)
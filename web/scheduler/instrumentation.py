@@ -0,0 +1,189 @@
+"""Per-request and per-tick cost accounting
+
+measure() collects what one unit of work cost: wall time, DB queries and
+their time, rows touched and template render time. Each measurement is
+written as one JSON log line and fed into the metrics registry.
+
+Queries are counted by one execute wrapper installed on every connection,
+which charges them to the measurement in the current context. Async requests
+share worker threads and connections, so a wrapper per measurement would
+count other requests' queries too.
+"""
+import json
+import logging
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template.exceptions import TemplateDoesNotExist
+from .metrics import COUNT_BUCKETS, LATENESS_BUCKETS, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('measurement', default=None)
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Request wall time', ['view', 'method', 'status'])
+REQUEST_DB_QUERIES = REGISTRY.histogram(
+    'http_request_db_queries', 'DB queries per request', ['view'], buckets=COUNT_BUCKETS)
+REQUEST_DB_SECONDS = REGISTRY.histogram(
+    'http_request_db_seconds', 'Time spent in DB queries per request', ['view'])
+REQUEST_TEMPLATE_SECONDS = REGISTRY.histogram(
+    'http_request_template_seconds', 'Template render time per request', ['view'])
+REQUEST_ROWS = REGISTRY.histogram(
+    'http_request_db_rows', 'Rows written (and, on PostgreSQL, read) per request', ['view'], buckets=COUNT_BUCKETS)
+
+LIVE_STREAMS = REGISTRY.gauge('live_update_streams', 'Open live update (SSE) connections')
+
+TICK_SECONDS = REGISTRY.histogram('scheduler_tick_duration_seconds', 'Scheduler dispatch tick wall time')
+TICK_DB_QUERIES = REGISTRY.histogram(
+    'scheduler_tick_db_queries', 'DB queries per scheduler tick', buckets=COUNT_BUCKETS)
+TICK_DB_SECONDS = REGISTRY.histogram('scheduler_tick_db_seconds', 'Time spent in DB queries per scheduler tick')
+TICK_POSTS = REGISTRY.counter('scheduler_tick_posts_total', 'Posts handled by scheduler ticks', ['outcome'])
+
+DUE_POSTS = REGISTRY.gauge('scheduler_due_posts', 'Posts past their due time and not yet sent')
+OLDEST_DUE_SECONDS = REGISTRY.gauge('scheduler_oldest_due_seconds', 'How long the longest-waiting due post has waited')
+LATENESS = REGISTRY.histogram(
+    'scheduler_dispatch_lateness_seconds', 'Delay from a post coming due to its platform call finishing',
+    ['platform'], buckets=LATENESS_BUCKETS)
+PLATFORM_CALLS = REGISTRY.counter('scheduler_platform_calls_total', 'Platform API calls', ['platform', 'outcome'])
+PLATFORM_CALL_SECONDS = REGISTRY.histogram(
+    'scheduler_platform_call_duration_seconds', 'Platform API call latency', ['platform'])
+PROCESS_START = REGISTRY.gauge('process_start_time_seconds', 'Unix time the process started serving metrics')
+DISPATCH_SLOTS = REGISTRY.gauge('scheduler_dispatch_slots', 'Platform calls allowed in flight at once')
+DISPATCH_IN_FLIGHT = REGISTRY.gauge('scheduler_dispatch_in_flight', 'Platform calls in flight')
+DISPATCH_BUSY_SECONDS = REGISTRY.counter(
+    'scheduler_dispatch_busy_seconds_total', 'Summed platform call time; its rate over the slots is pool utilization')
+
+
+class Measurement:
+    """Costs of one request or tick; callable as an execute wrapper that counts queries"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.template_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += time.perf_counter() - start
+            # Rows written; psycopg also reports rows read, sqlite3 gives -1 for reads
+            rowcount = getattr(context['cursor'].cursor, 'rowcount', -1)
+            if rowcount and rowcount > 0:
+                self.rows += rowcount
+
+    def as_dict(self):
+        return {
+            'ms': round(self.seconds * 1000, 1),
+            'db_queries': self.queries,
+            'db_ms': round(self.db_seconds * 1000, 1),
+            'rows': self.rows,
+            'template_ms': round(self.template_seconds * 1000, 1),
+        }
+
+
+def count_queries(execute, sql, params, many, context):
+    """Execute wrapper on every connection: adds the query to the current measurement, if any"""
+    measurement = _current.get()
+    if measurement is None:
+        return execute(sql, params, many, context)
+    return measurement(execute, sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """connection_created receiver (connected in SchedulerConfig.ready)"""
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+@contextmanager
+def measure():
+    """Measure the enclosed block: queries it runs, including on sync_to_async threads, count towards it"""
+    measurement = Measurement()
+    token = _current.set(measurement)
+    started = time.perf_counter()
+    try:
+        yield measurement
+    finally:
+        measurement.seconds = time.perf_counter() - started
+        _current.reset(token)
+
+
+@asynccontextmanager
+async def ameasure():
+    """measure() for async code; sync_to_async copies the context, so the ORM's worker thread sees it"""
+    measurement = Measurement()
+    token = _current.set(measurement)
+    started = time.perf_counter()
+    try:
+        yield measurement
+    finally:
+        measurement.seconds = time.perf_counter() - started
+        _current.reset(token)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        measurement = _current.get()
+        if measurement is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            measurement.template_seconds += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Django template backend that adds render time to the current measurement"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+def record_request(view, method, status, measurement):
+    REQUEST_SECONDS.observe(measurement.seconds, view=view, method=method, status=status)
+    REQUEST_DB_QUERIES.observe(measurement.queries, view=view)
+    REQUEST_DB_SECONDS.observe(measurement.db_seconds, view=view)
+    REQUEST_TEMPLATE_SECONDS.observe(measurement.template_seconds, view=view)
+    REQUEST_ROWS.observe(measurement.rows, view=view)
+    logger.info(json.dumps({
+        'event': 'request', 'view': view, 'method': method, 'status': status, **measurement.as_dict(),
+    }))
+
+
+def record_tick(worker_id, results, measurement):
+    TICK_SECONDS.observe(measurement.seconds)
+    TICK_DB_QUERIES.observe(measurement.queries)
+    TICK_DB_SECONDS.observe(measurement.db_seconds)
+    for outcome, count in results.items():
+        if outcome != 'processed' and count:
+            TICK_POSTS.inc(count, outcome=outcome)
+    if results['processed']:
+        logger.info(json.dumps({
+            'event': 'tick', 'worker': worker_id, **results, **measurement.as_dict(),
+        }))
+
+
+def record_call(platform, success, seconds):
+    PLATFORM_CALLS.inc(platform=platform, outcome='success' if success else 'failure')
+    PLATFORM_CALL_SECONDS.observe(seconds, platform=platform)
+    DISPATCH_BUSY_SECONDS.inc(seconds)
+
+
+def record_lateness(post, attempted_at):
+    """How late a post went out; retried and deferred posts were due at next_attempt_at"""
+    due_at = post.next_attempt_at or post.scheduled_at
+    LATENESS.observe(max((attempted_at - due_at).total_seconds(), 0), platform=post.social_account.platform)
@@ -0,0 +1,249 @@
+"""Live dashboard updates
+
+publish_post_changes() tells a user's open dashboards which of their posts
+changed, once the transaction commits. Messages fan out through NOTIFY on
+PostgreSQL. Elsewhere they go through LiveBroker, a small local relay that
+run_scheduler starts: publishers send it UDP datagrams, and web processes
+keep a TCP subscription that receives every message. Each web process runs
+one LiveHub thread that hands messages to its open event streams.
+"""
+import asyncio
+import json
+import logging
+import select
+import socket
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'scheduler_live'
+
+# Beyond this many ids a message just says "reload" (NOTIFY payloads max out at 8000 bytes)
+MAX_IDS = 100
+
+
+def publish_post_changes(user_id, post_ids=()):
+    """Push changed posts (and fresh stats) to the user's dashboards once the transaction commits"""
+    if not settings.LIVE_UPDATES:
+        return
+    post_ids = sorted(set(post_ids))
+    payload = json.dumps({'user': user_id, 'posts': post_ids if len(post_ids) <= MAX_IDS else None})
+    transaction.on_commit(lambda: _send(payload))
+
+
+def publish_posts(posts):
+    """publish_post_changes() for posts of any number of users"""
+    by_user = defaultdict(list)
+    for post in posts:
+        by_user[post.user_id].append(post.id)
+    for user_id, post_ids in by_user.items():
+        publish_post_changes(user_id, post_ids)
+
+
+def _send(payload):
+    try:
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, payload])
+        else:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                sock.sendto(payload.encode(), (settings.LIVE_BROKER_HOST, settings.LIVE_BROKER_PORT))
+    except Exception as e:
+        # Dashboards still catch up on their next reconnect or page load
+        logger.warning("Could not publish live update: %s", e)
+
+
+def parse_message(payload):
+    """Returns: (user_id, post ids or None for "reload"), or None if malformed"""
+    try:
+        message = json.loads(payload)
+        return int(message['user']), message['posts']
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def sse_event(event, data, event_id=None):
+    """One server-sent event; multi-line data is split over data: lines"""
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines.append(f'event: {event}')
+    lines.extend(f'data: {line}' for line in data.splitlines() or [''])
+    return '\n'.join(lines) + '\n\n'
+
+
+class LiveBroker:
+    """Local relay for SQLite setups: UDP datagrams in, every TCP subscriber gets each one"""
+
+    def __init__(self, host=None, port=None):
+        host = host or settings.LIVE_BROKER_HOST
+        port = settings.LIVE_BROKER_PORT if port is None else port
+        self._udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._udp.bind((host, port))
+        self._tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._tcp.bind((host, self._udp.getsockname()[1]))
+        self._tcp.listen()
+        self._subscribers = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._udp.getsockname()[:2]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name='live-broker', daemon=True)
+        self._thread.start()
+        return self
+
+    def run(self):
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self._udp, self._tcp] + self._subscribers, [], [], 1)
+            for sock in ready:
+                if sock is self._tcp:
+                    subscriber, _ = self._tcp.accept()
+                    # A subscriber that stops reading is dropped rather than stalling the rest
+                    subscriber.settimeout(1)
+                    self._subscribers.append(subscriber)
+                elif sock is self._udp:
+                    data, _ = self._udp.recvfrom(65535)
+                    for subscriber in list(self._subscribers):
+                        try:
+                            subscriber.sendall(data + b'\n')
+                        except OSError:
+                            self._drop(subscriber)
+                else:
+                    # Subscribers never send, so readable means closed
+                    try:
+                        closed = not sock.recv(1024)
+                    except OSError:
+                        closed = True
+                    if closed:
+                        self._drop(sock)
+
+    def _drop(self, subscriber):
+        if subscriber in self._subscribers:
+            self._subscribers.remove(subscriber)
+        subscriber.close()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        for sock in [self._udp, self._tcp] + self._subscribers:
+            sock.close()
+
+
+class Subscription:
+    """One open event stream's queue of changes"""
+
+    def __init__(self, hub, user_id, loop):
+        self.hub = hub
+        self.user_id = user_id
+        self.loop = loop
+        self._queue = asyncio.Queue()
+
+    def push(self, post_ids):
+        """Called from the hub thread"""
+        try:
+            self.loop.call_soon_threadsafe(self._queue.put_nowait, post_ids)
+        except RuntimeError:
+            # The event loop has shut down
+            self.close()
+
+    async def get(self, timeout):
+        """
+        Wait up to timeout seconds for changes, merging everything queued
+        Returns: set of changed post ids, or None when the list should be reloaded
+        Raises: TimeoutError if nothing changed
+        """
+        post_ids = await asyncio.wait_for(self._queue.get(), timeout)
+        changed = None if post_ids is None else set(post_ids)
+        while not self._queue.empty():
+            post_ids = self._queue.get_nowait()
+            changed = None if changed is None or post_ids is None else changed | set(post_ids)
+        return changed
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class LiveHub:
+    """Per-process fan-out from the broker (or NOTIFY) to open event streams"""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, user_id):
+        """Call from the event loop the stream runs on"""
+        subscription = Subscription(self, user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='live-hub', daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.user_id, None)
+
+    def dispatch(self, payload):
+        message = parse_message(payload)
+        if message is None:
+            return
+        user_id, post_ids = message
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.push(post_ids)
+
+    def _run(self):
+        delay = 1
+        while True:
+            try:
+                self._listen()
+                delay = 1
+            except Exception as e:
+                logger.warning("Live updates unavailable, retrying in %ss: %s", delay, e)
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    def _listen(self):
+        if connection.vendor == 'postgresql':
+            # Dedicated connection: notifications are only delivered outside transactions
+            conn = connection.get_new_connection(connection.get_connection_params())
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                while True:
+                    select.select([conn], [], [], 60)
+                    conn.poll()
+                    for notify in conn.notifies:
+                        self.dispatch(notify.payload)
+                    conn.notifies.clear()
+            finally:
+                conn.close()
+
+        with socket.create_connection((settings.LIVE_BROKER_HOST, settings.LIVE_BROKER_PORT)) as sock:
+            buffer = b''
+            while True:
+                data = sock.recv(65536)
+                if not data:
+                    raise ConnectionError('broker closed the connection')
+                buffer += data
+                *lines, buffer = buffer.split(b'\n')
+                for line in lines:
+                    self.dispatch(line.decode(errors='ignore'))
+
+
+hub = LiveHub()
@@ -0,0 +1,37 @@
+"""
+Django management command to move old finished posts to the archive table
+Run: python manage.py archive_posts [--days 90] [--batch 500] [--dry-run]
+
+Schedule it daily (cron, a systemd timer). See scheduler/archive.py.
+"""
+
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from scheduler.archive import archivable_posts, archive_old_posts
+
+
+class Command(BaseCommand):
+    help = 'Move finished posts older than ARCHIVE_AFTER_DAYS to the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+                            help='Archive posts scheduled more than this many days ago')
+        parser.add_argument('--batch', type=int, default=settings.ARCHIVE_BATCH_SIZE, help='Posts moved per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the posts that would move')
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        if options['dry_run']:
+            count = archivable_posts(before).count()
+            self.stdout.write(f"📦 {count} posts scheduled before {before:%Y-%m-%d %H:%M} would be archived")
+            return
+
+        started = time.perf_counter()
+        moved = archive_old_posts(before, options['batch'])
+        seconds = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Archived {moved} posts scheduled before {before:%Y-%m-%d %H:%M} in {seconds:.1f}s"
+        ))
@@ -0,0 +1,239 @@
+"""
+Django management command to benchmark the scheduler
+Run: python manage.py benchmark_scheduler --users 100 --accounts 4 --posts 25 --json results.json
+
+Creates bench_* users with bulk inserts, schedules their posts to come due over
+--window seconds, runs the real scheduler loop until every post has been
+attempted, then reports throughput, lateness against scheduled_at, DB queries
+per post and peak RSS. Stop any other scheduler first: it would take a share
+of the posts and the wake-up port.
+"""
+
+import json
+import random
+import sys
+import threading
+import time
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F
+from django.test.utils import override_settings
+from django.utils import timezone
+from scheduler.constants import PLATFORM_CHOICES
+from scheduler.dispatcher import DueTimeScheduler
+from scheduler.instrumentation import Measurement
+from scheduler.models import ScheduledPost, SocialAccount
+from scheduler.stats import apply_counter_deltas, status_change
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+USER_PREFIX = 'bench_'
+PLATFORMS = [platform for platform, _ in PLATFORM_CHOICES]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark scheduler throughput and lateness on generated posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--accounts', type=int, default=4, help=f'Accounts per user (max {len(PLATFORMS)})')
+        parser.add_argument('--posts', type=int, default=25, help='Posts per account')
+        parser.add_argument('--distribution', choices=['steady', 'top-of-hour'], default='steady',
+                            help='steady: due times spread evenly; top-of-hour: all due at a few spike instants')
+        parser.add_argument('--window', type=float, default=20, help='Seconds over which posts come due')
+        parser.add_argument('--spikes', type=int, default=2, help='Spike instants for top-of-hour')
+        parser.add_argument('--lead', type=float, default=2, help='Seconds between setup and the first due post')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--timeout', type=float, default=600, help='Give up after this many seconds')
+        parser.add_argument('--rate-limits', action='store_true',
+                            help='Apply the per-account rate limits (off: measure the scheduler, not the budget)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true', help='Keep the generated data afterwards')
+        parser.add_argument('--json', help='Write the report as JSON to this file ("-" for stdout)')
+
+    def handle(self, *args, **options):
+        if not 1 <= options['accounts'] <= len(PLATFORMS):
+            raise CommandError(f'--accounts must be between 1 and {len(PLATFORMS)}')
+        random.seed(options['seed'])
+
+        self.cleanup(leftover=True)
+        try:
+            total = self.generate(options)
+            report = self.run(options, total)
+        finally:
+            if not options['keep']:
+                self.cleanup()
+
+        self.print_report(report)
+        if options['json'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+        elif options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✅ Report written to {options['json']}"))
+
+    def cleanup(self, leftover=False):
+        """Delete the benchmark users and everything they own (leftover: from an earlier, interrupted run)"""
+        deleted, _ = User.objects.filter(username__startswith=USER_PREFIX).delete()
+        if deleted:
+            self.stdout.write(f'🧹 Removed {deleted} rows from a previous run' if leftover else f'🧹 Removed {deleted} benchmark rows')
+
+    def due_offsets(self, options, count):
+        """Seconds after the start at which each post comes due"""
+        window = options['window']
+        if options['distribution'] == 'steady':
+            return [window * i / max(count - 1, 1) for i in range(count)]
+        # Like posts everyone schedules for 9:00 sharp: all land on a few instants
+        spikes = [window * (n + 1) / options['spikes'] for n in range(options['spikes'])]
+        return [random.choice(spikes) for _ in range(count)]
+
+    def generate(self, options):
+        """Bulk insert the users, accounts and posts; returns the post count"""
+        started = time.perf_counter()
+        batch_size = options['batch_size']
+
+        User.objects.bulk_create([
+            User(username=f'{USER_PREFIX}{n}', password='!') for n in range(options['users'])
+        ], batch_size=batch_size)
+        users = list(User.objects.filter(username__startswith=USER_PREFIX).values_list('id', flat=True))
+
+        SocialAccount.objects.bulk_create([
+            SocialAccount(user_id=user_id, platform=platform, username=f'bench-{platform}',
+                          access_token='bench_token')
+            for user_id in users for platform in PLATFORMS[:options['accounts']]
+        ], batch_size=batch_size)
+        accounts = list(
+            SocialAccount.objects.filter(user_id__in=users).values_list('id', 'user_id', 'platform')
+        )
+
+        # Scheduled a day out while loading, then shifted so the window starts
+        # right after setup, however long the inserts took
+        total = len(accounts) * options['posts']
+        placeholder = timezone.now() + timedelta(days=1)
+        offsets = self.due_offsets(options, total)
+        random.shuffle(offsets)
+        batch = []
+        for n in range(total):
+            account_id, user_id, _ = accounts[n % len(accounts)]
+            batch.append(ScheduledPost(
+                user_id=user_id, social_account_id=account_id, content=f'Benchmark post {n}',
+                scheduled_at=placeholder + timedelta(seconds=offsets[n]),
+            ))
+            if len(batch) == batch_size:
+                ScheduledPost.objects.bulk_create(batch)
+                batch = []
+        ScheduledPost.objects.bulk_create(batch)
+
+        apply_counter_deltas(*(
+            status_change(user_id, platform, None, 'scheduled', n=options['posts'])
+            for _, user_id, platform in accounts
+        ))
+
+        start = timezone.now() + timedelta(seconds=options['lead'])
+        ScheduledPost.objects.filter(user_id__in=users).update(
+            scheduled_at=F('scheduled_at') - (placeholder - start)
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Generated {len(users)} users, {len(accounts)} accounts, {total} posts '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
+        return total
+
+    def run(self, options, total):
+        bench_posts = ScheduledPost.objects.filter(user__username__startswith=USER_PREFIX)
+        scheduler = DueTimeScheduler('benchmark')
+        finished = threading.Event()
+
+        def watch():
+            # Own DB connection, so its polling isn't counted against the scheduler
+            try:
+                deadline = time.monotonic() + options['timeout']
+                while time.monotonic() < deadline:
+                    if not bench_posts.filter(last_attempt_at__isnull=True).exists():
+                        finished.set()
+                        break
+                    time.sleep(0.2)
+            finally:
+                scheduler.stop()
+                connection.close()
+
+        unlimited = {platform: (10 ** 9, 10 ** 12) for platform in PLATFORMS + ['default']}
+        counter = Measurement()
+        self.stdout.write(f"⏱️  Running the scheduler over {total} posts ({options['distribution']})...")
+        started = time.perf_counter()
+        with override_settings(**({} if options['rate_limits'] else {'SCHEDULER_RATE_LIMITS': unlimited})):
+            watcher = threading.Thread(target=watch, name='benchmark-watch', daemon=True)
+            watcher.start()
+            with connection.execute_wrapper(counter):
+                scheduler.run()
+            watcher.join()
+        elapsed = time.perf_counter() - started
+
+        rows = list(bench_posts.exclude(last_attempt_at__isnull=True).values_list(
+            'scheduled_at', 'last_attempt_at', 'status'
+        ))
+        lateness = sorted((attempted - due).total_seconds() * 1000 for due, attempted, _ in rows)
+        outcomes = {}
+        for _, _, status in rows:
+            outcomes[status] = outcomes.get(status, 0) + 1
+        first_due = min((due for due, _, _ in rows), default=None)
+        last_done = max((attempted for _, attempted, _ in rows), default=None)
+        active = (last_done - first_due).total_seconds() if rows else 0
+
+        return {
+            'timestamp': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'config': {key: options[key] for key in (
+                'users', 'accounts', 'posts', 'distribution', 'window', 'spikes', 'rate_limits', 'seed',
+            )},
+            'completed': finished.is_set(),
+            'posts': total,
+            'attempted': len(rows),
+            'outcomes': outcomes,
+            'wall_seconds': round(elapsed, 3),
+            # Posts over the time from the first due post to the last attempt
+            'posts_per_second': round(len(rows) / active, 1) if active > 0 else None,
+            'lateness_ms': {
+                'p50': percentile(lateness, 50),
+                'p95': percentile(lateness, 95),
+                'p99': percentile(lateness, 99),
+                'max': lateness[-1] if lateness else None,
+            },
+            'db_queries': counter.queries,
+            'db_queries_per_post': round(counter.queries / len(rows), 3) if rows else None,
+            'db_seconds': round(counter.db_seconds, 3),
+            'peak_rss_mb': peak_rss_mb(),
+        }
+
+    def print_report(self, report):
+        style = self.style.SUCCESS if report['completed'] else self.style.WARNING
+        self.stdout.write(style(f"{'✅' if report['completed'] else '⚠️ '} Attempted {report['attempted']}/{report['posts']} posts"))
+        self.stdout.write(f"   Throughput: {report['posts_per_second']} posts/sec")
+        lateness = {k: None if v is None else round(v, 1) for k, v in report['lateness_ms'].items()}
+        self.stdout.write(f"   Lateness:   p50 {lateness['p50']} ms, p95 {lateness['p95']} ms, "
+                          f"p99 {lateness['p99']} ms, max {lateness['max']} ms")
+        self.stdout.write(f"   DB:         {report['db_queries']} queries ({report['db_queries_per_post']}/post), "
+                          f"{report['db_seconds']}s")
+        self.stdout.write(f"   Peak RSS:   {report['peak_rss_mb']} MB")
+        self.stdout.write(f"   Outcomes:   {report['outcomes']}")
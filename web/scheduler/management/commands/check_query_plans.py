@@ -0,0 +1,68 @@
+"""
+Django management command to verify the hot queries use their indexes
+Run: python manage.py check_query_plans
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from scheduler.models import ScheduledPost
+from scheduler.pagination import PAGE_SIZE, after_cursor, encode_cursor
+from scheduler.services import PostingService
+
+
+def hot_queries(user_id, now):
+    """(label, queryset, expected index names) for each hot query shape"""
+    user_posts = ScheduledPost.objects.filter(user_id=user_id)
+    return [
+        ('Scheduler: claim due posts',
+         PostingService.due_posts(now).values('id'),
+         ['post_due_idx', 'post_lease_expiry_idx']),
+        ('Scheduler: next due times',
+         ScheduledPost.objects.filter(status='scheduled').order_by('scheduled_at').values('scheduled_at'),
+         ['post_due_idx']),
+        ('Scheduler: next deferred posts',
+         ScheduledPost.objects.filter(status='scheduled', next_attempt_at__isnull=False)
+         .order_by('next_attempt_at').values('next_attempt_at'),
+         ['post_deferred_idx']),
+        ('Dashboard: count by status',
+         user_posts.filter(status='success').values('id'),
+         ['post_user_status_due_idx']),
+        ('Dashboard: upcoming posts',
+         user_posts.filter(status='scheduled', scheduled_at__gt=now).order_by('scheduled_at'),
+         ['post_user_status_due_idx']),
+        ('Dashboard: post history page',
+         after_cursor(user_posts, encode_cursor(now, 1))[:PAGE_SIZE + 1],
+         ['post_user_history_idx']),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the scheduler and dashboard queries and check they use an index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, default=1, help='User to plan dashboard queries for')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print the full plans')
+
+    def handle(self, *args, **options):
+        failed = []
+
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Small dev tables make a seq scan cheapest; we only ask whether the index is usable
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+
+            for label, queryset, index_names in hot_queries(options['user_id'], timezone.now()):
+                plan = queryset.explain()
+                if any(name in plan for name in index_names):
+                    self.stdout.write(self.style.SUCCESS(f'✓ {label}'))
+                else:
+                    self.stdout.write(self.style.ERROR(f'✗ {label} (expected {" or ".join(index_names)})'))
+                    failed.append(label)
+                if options['verbose_plans'] or label in failed:
+                    self.stdout.write(f'   {plan}'.replace('\n', '\n   '))
+
+        if failed:
+            raise CommandError(f'{len(failed)} queries are not using their index')
+        self.stdout.write(self.style.SUCCESS('✅ All hot queries use an index'))
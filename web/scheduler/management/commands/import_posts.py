@@ -0,0 +1,58 @@
+"""
+Django management command to schedule posts in bulk from a CSV or NDJSON file
+Run: python manage.py import_posts campaign.csv --user USERNAME [--timezone Asia/Kolkata] [--dry-run]
+
+Columns: platform (or social_account id), content, scheduled_at, optional timezone.
+See scheduler/bulk.py. Use "-" to read from stdin (give --format).
+"""
+
+import sys
+import time
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from scheduler.bulk import FORMATS, guess_format, import_posts
+
+
+class Command(BaseCommand):
+    help = 'Schedule posts in bulk from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON file ("-" for stdin)')
+        parser.add_argument('--user', required=True, help='Username that owns the posts')
+        parser.add_argument('--format', choices=FORMATS, help='Default: from the file extension')
+        parser.add_argument('--timezone', help='Zone for times without an offset (default: TIME_ZONE)')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only, create nothing')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist")
+        path = options['path']
+        format = options['format'] or guess_format(path)
+        if not format:
+            raise CommandError('Could not tell the format from the file name; pass --format')
+
+        started = time.perf_counter()
+        stream = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        try:
+            report = import_posts(user, stream, format, options['timezone'], options['dry_run'])
+        except ValidationError as e:
+            raise CommandError(' '.join(e.messages))
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+        seconds = time.perf_counter() - started
+
+        for error in report.errors:
+            self.stdout.write(f"  line {error['line']}: {'; '.join(error['errors'])}")
+        if report.error_count > len(report.errors):
+            self.stdout.write(f'  ... and {report.error_count - len(report.errors)} more')
+
+        action = 'would be scheduled' if report.dry_run else 'scheduled'
+        style = self.style.SUCCESS if not report.error_count else self.style.WARNING
+        self.stdout.write(style(
+            f"{'✅' if not report.error_count else '⚠️ '} {report.created} of {report.rows} posts {action} "
+            f"in {seconds:.1f}s ({report.error_count} rows with errors)"
+        ))
@@ -0,0 +1,275 @@
+"""
+Django management command to load test the dashboard, stats and search views
+Run: python manage.py loadtest_web --users 20 --duration 60 [--url http://127.0.0.1:8000] [--json report.json]
+
+Each simulated user logs in and behaves like the dashboard page in a browser:
+loads dashboard/ and stats-update/, polls stats-update/ every 10 s (base.html),
+types into the search box at HTMX debounce cadence (keyup changed delay:300ms)
+and re-filters the post history by status and platform.
+
+Without --url the site is served in-process by a threaded WSGI server, which
+also reports DB queries per request. Client and server then share one
+interpreter, so use --url against gunicorn/uvicorn for absolute numbers.
+Users come from `populate_demo --users N` (loaduser0, loaduser1, ...).
+"""
+
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from http.cookiejar import CookieJar
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from scheduler.constants import PLATFORM_CHOICES, STATUS_CHOICES
+from scheduler.instrumentation import Measurement
+from scheduler.management.commands.benchmark_scheduler import percentile
+
+STATS_POLL_SECONDS = 10
+DEBOUNCE_SECONDS = 0.3
+SEARCH_WORDS = ['coffee', 'launch', 'feature', 'community', 'schedule', 'motivation', 'session', 'followers']
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def counting_app(app):
+    """Wrap a WSGI app to report each request's DB queries in X-DB-Queries"""
+    def wrapped(environ, start_response):
+        counter = Measurement()
+
+        def counted_start_response(status, headers, exc_info=None):
+            # Django calls this once the view and middleware have run
+            headers.append(('X-DB-Queries', str(counter.queries)))
+            return start_response(status, headers, exc_info)
+
+        with connection.execute_wrapper(counter):
+            return app(environ, counted_start_response)
+    return wrapped
+
+
+class Recorder:
+    """Latency, status and DB queries per endpoint, shared by all user threads"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def add(self, endpoint, seconds, status, queries):
+        with self._lock:
+            self.samples[endpoint].append((seconds, status, queries))
+
+    def report(self, duration):
+        endpoints = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            latencies = sorted(seconds * 1000 for seconds, _, _ in samples)
+            queries = [q for _, _, q in samples if q is not None]
+            endpoints[endpoint] = {
+                'requests': len(samples),
+                'rps': round(len(samples) / duration, 2),
+                'errors': sum(1 for _, status, _ in samples if not status or status >= 400),
+                'latency_ms': {
+                    'p50': round(percentile(latencies, 50), 1),
+                    'p95': round(percentile(latencies, 95), 1),
+                    'p99': round(percentile(latencies, 99), 1),
+                    'max': round(latencies[-1], 1),
+                },
+                'db_queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+            }
+        return endpoints
+
+
+class SimulatedUser:
+    """One logged-in browser session"""
+
+    def __init__(self, base_url, username, password, recorder, rng):
+        self.base_url = base_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.recorder = recorder
+        self.rng = rng
+        self.cookies = CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+
+    def request(self, endpoint, path, data=None, htmx=False):
+        headers = {'HX-Request': 'true'} if htmx else {}
+        if data is not None:
+            data = urllib.parse.urlencode(data).encode()
+            headers['Referer'] = self.base_url + path
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers)
+        started = time.perf_counter()
+        status, queries, body = None, None, b''
+        try:
+            with self.opener.open(req, timeout=30) as response:
+                body = response.read()
+                status = response.status
+                queries = response.headers.get('X-DB-Queries')
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except OSError:
+            pass
+        self.recorder.add(endpoint, time.perf_counter() - started, status, int(queries) if queries else None)
+        return body
+
+    def login(self):
+        page = self.request('login (GET)', '/login/').decode(errors='replace')
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page)
+        if not token:
+            return False
+        # Follows the redirect to the dashboard, as a browser would
+        self.request('login (POST)', '/login/', data={
+            'csrfmiddlewaretoken': token.group(1),
+            'username': self.username,
+            'password': self.password,
+        })
+        return any(cookie.name == 'sessionid' for cookie in self.cookies)
+
+    def search(self):
+        """Type a word; HTMX only fires once typing pauses for DEBOUNCE_SECONDS"""
+        word = self.rng.choice(SEARCH_WORDS)
+        for n in range(1, len(word) + 1):
+            pause = self.rng.uniform(0.08, 0.5)
+            if pause >= DEBOUNCE_SECONDS or n == len(word):
+                time.sleep(DEBOUNCE_SECONDS)
+                self.request('search', '/search/?' + urllib.parse.urlencode({'q': word[:n]}), htmx=True)
+            else:
+                time.sleep(pause)
+
+    def filter_dashboard(self):
+        params = {
+            'status': self.rng.choice(['all'] + [status for status, _ in STATUS_CHOICES]),
+            'platform': self.rng.choice(['all'] + [platform for platform, _ in PLATFORM_CHOICES]),
+        }
+        self.request('dashboard (filter)', '/dashboard/?' + urllib.parse.urlencode(params), htmx=True)
+
+    def run(self, stop_at, think_seconds):
+        self.request('dashboard', '/dashboard/')
+        self.request('stats-update', '/stats-update/', htmx=True)
+
+        next_poll = time.monotonic() + STATS_POLL_SECONDS
+        next_action = time.monotonic() + self.rng.expovariate(1 / think_seconds)
+        while True:
+            now = time.monotonic()
+            if now >= stop_at:
+                break
+            if now >= next_poll:
+                self.request('stats-update', '/stats-update/', htmx=True)
+                next_poll += STATS_POLL_SECONDS
+            elif now >= next_action:
+                if self.rng.random() < 0.5:
+                    self.search()
+                else:
+                    self.filter_dashboard()
+                next_action = time.monotonic() + self.rng.expovariate(1 / think_seconds)
+            else:
+                time.sleep(min(next_poll, next_action, stop_at) - now)
+
+
+class Command(BaseCommand):
+    help = 'Load test the dashboard, stats and search endpoints with simulated users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Concurrent simulated users')
+        parser.add_argument('--duration', type=float, default=60, help='Seconds to run after logging in')
+        parser.add_argument('--think', type=float, default=15, help='Mean seconds between searches/filter changes')
+        parser.add_argument('--url', help='Test a running server instead of an in-process one')
+        parser.add_argument('--prefix', default='loaduser', help='Username prefix from populate_demo --users')
+        parser.add_argument('--password', default='demo123456')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', help='Write the report as JSON to this file ("-" for stdout)')
+
+    def handle(self, *args, **options):
+        usernames = [f"{options['prefix']}{n}" for n in range(options['users'])]
+        server = None
+        base_url = options['url']
+        if not base_url:
+            found = User.objects.filter(username__in=usernames).count()
+            if found < len(usernames):
+                raise CommandError(
+                    f"Only {found} of {len(usernames)} users exist; "
+                    f"run: python manage.py populate_demo --users {options['users']}"
+                )
+            server = make_server('127.0.0.1', 0, counting_app(get_wsgi_application()),
+                                 server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+            threading.Thread(target=server.serve_forever, name='loadtest-server', daemon=True).start()
+            base_url = f'http://127.0.0.1:{server.server_port}'
+            self.stdout.write(f'🌐 Serving in-process at {base_url}')
+
+        login_recorder, recorder = Recorder(), Recorder()
+        users = [
+            SimulatedUser(base_url, username, options['password'], login_recorder,
+                          random.Random(f"{options['seed']}:{username}"))
+            for username in usernames
+        ]
+
+        # Log everyone in first: password hashing would otherwise swamp the first seconds
+        self.stdout.write(f"🔑 Logging in {len(users)} users...")
+        logged_in = []
+        def login(user):
+            if user.login():
+                user.recorder = recorder
+                logged_in.append(user)
+        login_started = time.perf_counter()
+        self.run_threads([(login, (user,)) for user in users])
+        login_seconds = time.perf_counter() - login_started
+        if len(logged_in) < len(users):
+            self.stdout.write(self.style.WARNING(f'⚠️  {len(users) - len(logged_in)} users could not log in'))
+
+        self.stdout.write(f"👥 {len(logged_in)} users for {options['duration']:.0f}s against {base_url}...")
+        stop_at = time.monotonic() + options['duration']
+        self.run_threads([(user.run, (stop_at, options['think'])) for user in logged_in])
+        if server:
+            server.shutdown()
+            server.server_close()
+
+        report = {
+            'url': options['url'] or 'in-process',
+            'users': options['users'],
+            'duration_seconds': options['duration'],
+            'login': login_recorder.report(login_seconds),
+            'endpoints': recorder.report(options['duration']),
+        }
+        self.print_report(report)
+        if options['json'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+        elif options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✅ Report written to {options['json']}"))
+
+    def run_threads(self, calls):
+        threads = [threading.Thread(target=target, args=args, daemon=True) for target, args in calls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def print_report(self, report):
+        self.stdout.write('')
+        self.stdout.write(f"{'Endpoint':<20} {'Reqs':>6} {'RPS':>7} {'Errors':>6} "
+                          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'Queries':>8}")
+        rows = list(report['login'].items()) + list(report['endpoints'].items())
+        for endpoint, stats in rows:
+            latency = stats['latency_ms']
+            queries = stats['db_queries_per_request']
+            self.stdout.write(
+                f"{endpoint:<20} {stats['requests']:>6} {stats['rps']:>7} {stats['errors']:>6} "
+                f"{latency['p50']:>8} {latency['p95']:>8} {latency['p99']:>8} "
+                f"{'-' if queries is None else queries:>8}"
+            )
+        errors = sum(stats['errors'] for _, stats in rows)
+        style = self.style.SUCCESS if not errors else self.style.WARNING
+        self.stdout.write(style(f"{'✅' if not errors else '⚠️ '} {errors} errors"))
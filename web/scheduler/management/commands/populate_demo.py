@@ -1,20 +1,142 @@
 """
 Django management command to populate demo data
 Run: python manage.py populate_demo
+Bulk mode (load testing): python manage.py populate_demo --users 100000 --posts-per-user 100 --workers 4
 """
 
-from django.core.management.base import BaseCommand
+from collections import Counter
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
+from django.db import connection, connections, transaction
 from django.utils import timezone
 from datetime import timedelta
-from scheduler.models import SocialAccount, ScheduledPost
+from scheduler.constants import PLATFORM_CHOICES
+from scheduler.models import SocialAccount, ScheduledPost, PostStatusCounter
+import multiprocessing
 import random
+import time
+
+SAMPLE_CONTENT = [
+    "Just launched our new feature! 🚀 Check it out and let us know what you think!",
+    "Coffee and coding - the perfect combination ☕ What's your go-to productivity drink?",
+    "Excited to announce that we've hit 1000 followers! Thank you all! 🙏",
+    "Monday motivation: Always keep learning and growing! 💪",
+    "Live session tonight at 8pm! Join us for Q&A and product demo.",
+    "New blog post: The future of social media marketing. Read it now!",
+    "Team building day! 🎉 Nothing beats brainstorming with the squad.",
+    "Hot take: Consistency wins over perfection every time ✨",
+    "Grateful for this amazing community. You make what we do worthwhile 💖",
+    "Pro tip: Schedule your content in advance to save time! 📅",
+]
+
+DEMO_PASSWORD = 'demo123456'
+
+
+def generate_users(first, last, options, password_hash, now):
+    """
+    Bulk-create users first..last-1 with their accounts, posts and counters
+    Each user draws from its own seeded RNG, so the data is the same however
+    the range is split across workers.
+    Returns: (users, posts) created
+    """
+    prefix = options['prefix']
+    batch_size = options['batch_size']
+    platforms = [platform for platform, _ in PLATFORM_CHOICES]
+    users_per_chunk = max(1, batch_size // max(options['posts_per_user'], 1))
+    created_users = created_posts = 0
+
+    for start in range(first, last, users_per_chunk):
+        numbers = range(start, min(start + users_per_chunk, last))
+        usernames = [f'{prefix}{n}' for n in numbers]
+        with transaction.atomic():
+            existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+            User.objects.bulk_create([
+                User(username=username, email=f'{username}@scheduler.local', password=password_hash)
+                for username in usernames if username not in existing
+            ], batch_size=batch_size)
+            users = dict(
+                User.objects.filter(username__in=usernames).exclude(username__in=existing)
+                .values_list('username', 'id')
+            )
+            SocialAccount.objects.bulk_create([
+                SocialAccount(user_id=user_id, platform=platform, username=f'{username}-{platform}',
+                              access_token='demo_token_' + platform)
+                for username, user_id in users.items() for platform in platforms
+            ], batch_size=batch_size)
+            accounts = {
+                (user_id, platform): account_id
+                for account_id, user_id, platform in SocialAccount.objects.filter(
+                    user_id__in=users.values()
+                ).values_list('id', 'user_id', 'platform')
+            }
+
+            posts = []
+            counts = Counter()
+            for n, username in zip(numbers, usernames):
+                if username not in users:
+                    continue
+                user_id = users[username]
+                rng = random.Random(f"{options['seed']}:{n}")
+                for _ in range(options['posts_per_user']):
+                    platform = rng.choice(platforms)
+                    status = rng.choice(['scheduled', 'scheduled', 'scheduled', 'success', 'failed'])
+                    if status == 'scheduled':
+                        scheduled_at = now + timedelta(minutes=rng.randint(1, 60 * 24 * 30))
+                    else:
+                        scheduled_at = now - timedelta(minutes=rng.randint(1, 60 * 24 * 365))
+                    posts.append(ScheduledPost(
+                        user_id=user_id,
+                        social_account_id=accounts[(user_id, platform)],
+                        content=rng.choice(SAMPLE_CONTENT),
+                        scheduled_at=scheduled_at,
+                        status=status,
+                        result_message='✅ Posted successfully' if status == 'success' else
+                                       '❌ API error (rate limit)' if status == 'failed' else None,
+                        last_attempt_at=scheduled_at if status != 'scheduled' else None,
+                        attempt_count=0 if status == 'scheduled' else 1,
+                    ))
+                    counts[(user_id, platform, status)] += 1
+                    if len(posts) == batch_size:
+                        ScheduledPost.objects.bulk_create(posts)
+                        created_posts += len(posts)
+                        posts = []
+            ScheduledPost.objects.bulk_create(posts)
+            created_posts += len(posts)
+
+            # New users only, so counters are written outright instead of recounted
+            PostStatusCounter.objects.bulk_create([
+                PostStatusCounter(user_id=user_id, platform=platform, status=status, count=count)
+                for (user_id, platform, status), count in counts.items()
+            ], batch_size=batch_size)
+        created_users += len(users)
+
+    return created_users, created_posts
+
+
+def _worker(args):
+    # Forked workers must not share the parent's database connection
+    connections.close_all()
+    return generate_users(*args)
 
 
 class Command(BaseCommand):
     help = 'Populate database with demo data'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, help='Bulk mode: generate this many users')
+        parser.add_argument('--posts-per-user', type=int, default=100)
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--workers', type=int, default=1, help='Processes to split the users across')
+        parser.add_argument('--seed', type=int, default=0, help='Same seed, same data')
+        parser.add_argument('--prefix', default='loaduser', help='Bulk mode username prefix')
+        parser.add_argument('--start', type=int, default=0, help='First user number (to grow an existing set)')
+
     def handle(self, *args, **options):
+        if options['users']:
+            return self.generate_bulk(options)
+
         # Check if demo user already exists
         if User.objects.filter(username='demo').exists():
             self.stdout.write(self.style.WARNING('Demo user already exists!'))
@@ -55,24 +177,11 @@ class Command(BaseCommand):
         self.stdout.write('')
 
         # Create demo scheduled posts
-        sample_content = [
-            "Just launched our new feature! 🚀 Check it out and let us know what you think!",
-            "Coffee and coding - the perfect combination ☕ What's your go-to productivity drink?",
-            "Excited to announce that we've hit 1000 followers! Thank you all! 🙏",
-            "Monday motivation: Always keep learning and growing! 💪",
-            "Live session tonight at 8pm! Join us for Q&A and product demo.",
-            "New blog post: The future of social media marketing. Read it now!",
-            "Team building day! 🎉 Nothing beats brainstorming with the squad.",
-            "Hot take: Consistency wins over perfection every time ✨",
-            "Grateful for this amazing community. You make what we do worthwhile 💖",
-            "Pro tip: Schedule your content in advance to save time! 📅",
-        ]
-
         self.stdout.write("📝 Creating demo posts...\n")
 
         now = timezone.now()
         for i in range(15):
-            content = random.choice(sample_content)
+            content = random.choice(SAMPLE_CONTENT)
             scheduled_at = now + timedelta(hours=random.randint(1, 48))
             status = random.choice(['scheduled', 'scheduled', 'scheduled', 'success', 'failed'])
             
@@ -90,6 +199,9 @@ class Command(BaseCommand):
             badge = '✅' if status == 'success' else '❌' if status == 'failed' else '📅'
             self.stdout.write(f'{badge} Post {i+1}: {status.upper()} - {post.social_account.get_platform_display()}')
 
+        # Posts were created directly, so bring the status counters up to date
+        call_command('rebuild_counters', user='demo', stdout=self.stdout)
+
         self.stdout.write('')
         self.stdout.write(self.style.SUCCESS('✅ Demo data created successfully!'))
         self.stdout.write('')
@@ -101,3 +213,51 @@ class Command(BaseCommand):
         self.stdout.write('   Username: demo')
         self.stdout.write('   Password: demo123456')
         self.stdout.write('')
+
+    def generate_bulk(self, options):
+        """Generate users prefix<start>..prefix<start+users-1> with bulk inserts"""
+        first, last = options['start'], options['start'] + options['users']
+        workers = max(1, options['workers'])
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('⚠️  SQLite allows one writer at a time; using 1 worker'))
+            workers = 1
+        if workers > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError('--workers needs a platform that can fork (use --workers 1)')
+
+        self.stdout.write(
+            f"🚀 Generating {options['users']} users × {options['posts_per_user']} posts "
+            f"with {workers} worker(s), seed {options['seed']}...\n"
+        )
+        started = time.perf_counter()
+        # Hash once: PBKDF2 per user would dominate the run
+        password_hash = make_password(DEMO_PASSWORD)
+        now = timezone.now()
+
+        # Slices of users, several per worker so progress can be reported as they finish
+        step = max(1, min(10000, -(-options['users'] // (workers * 4))))
+        slices = [(n, min(n + step, last), options, password_hash, now) for n in range(first, last, step)]
+
+        total_users = total_posts = 0
+        def report(result):
+            nonlocal total_users, total_posts
+            total_users += result[0]
+            total_posts += result[1]
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'   {total_users} users, {total_posts} posts ({total_posts / elapsed:,.0f} posts/sec)'
+            )
+
+        if workers == 1:
+            for args in slices:
+                report(generate_users(*args))
+        else:
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(workers) as pool:
+                for result in pool.imap_unordered(_worker, slices):
+                    report(result)
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Created {total_users} users and {total_posts} posts in {time.perf_counter() - started:.1f}s'
+        ))
+        self.stdout.write(f"   Log in as {options['prefix']}{first} / {DEMO_PASSWORD}")
@@ -0,0 +1,53 @@
+"""
+Django management command to render thumbnails and platform variants of uploads
+Run: python manage.py process_images [--workers 4] [--watch] [--retry-failed] [--all]
+
+run_scheduler already does this in the background (IMAGE_WORKERS); use this
+for a backlog, after changing scheduler.images.VARIANTS (--all), or on hosts
+that run the scheduler with IMAGE_WORKERS=0.
+"""
+
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from scheduler.images import image_pool, process_pending_images
+from scheduler.models import ScheduledPost
+
+
+class Command(BaseCommand):
+    help = 'Process pending image uploads into EXIF-free thumbnails and per-platform variants'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=max(settings.IMAGE_WORKERS, 1), help='Worker processes')
+        parser.add_argument('--batch', type=int, default=100, help='Posts fetched per round')
+        parser.add_argument('--watch', action='store_true', help='Keep polling for new uploads')
+        parser.add_argument('--retry-failed', action='store_true', help='Also retry images that failed before')
+        parser.add_argument('--all', action='store_true', help='Re-render every image (after changing VARIANTS)')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            queued = ScheduledPost.objects.exclude(image='').exclude(image__isnull=True).update(image_state='pending')
+            self.stdout.write(f'🔁 Queued {queued} images')
+
+        totals = {'ready': 0, 'failed': 0}
+        started = time.perf_counter()
+        with image_pool(options['workers']) as executor:
+            try:
+                while True:
+                    results = process_pending_images(executor, options['batch'], options['retry_failed'])
+                    for state, count in results.items():
+                        totals[state] += count
+                    if sum(results.values()):
+                        self.stdout.write(f"🖼️  {results['ready']} ready, {results['failed']} failed")
+                        continue
+                    if not options['watch']:
+                        break
+                    time.sleep(settings.IMAGE_POLL_SECONDS)
+            except KeyboardInterrupt:
+                pass
+
+        style = self.style.SUCCESS if not totals['failed'] else self.style.WARNING
+        self.stdout.write(style(
+            f"{'✅' if not totals['failed'] else '⚠️ '} {totals['ready']} images processed, "
+            f"{totals['failed']} failed in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,34 @@
+"""
+Django management command to compact and expire the delivery attempt log
+Run: python manage.py prune_attempts [--compact-after 30] [--retention 180]
+
+Schedule it daily, like archive_posts. See scheduler/attempts.py.
+"""
+
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from scheduler.attempts import prune_attempts
+
+
+class Command(BaseCommand):
+    help = 'Drop old platform responses from the attempt log and delete expired attempts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compact-after', type=int, default=settings.ATTEMPT_COMPACT_AFTER_DAYS,
+                            help='Clear responses of attempts older than this many days')
+        parser.add_argument('--retention', type=int, default=settings.ATTEMPT_RETENTION_DAYS,
+                            help='Delete attempts older than this many days')
+        parser.add_argument('--batch', type=int, default=settings.ATTEMPT_PRUNE_BATCH_SIZE, help='Rows per statement')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        results = prune_attempts(
+            compact_after_days=options['compact_after'],
+            retention_days=options['retention'],
+            batch_size=options['batch'],
+        )
+        seconds = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Deleted {results['deleted']} attempts and compacted {results['compacted']} in {seconds:.1f}s"
+        ))
@@ -0,0 +1,71 @@
+"""
+Django management command to rebuild the post status counters
+Run: python manage.py rebuild_counters [--check] [--user USERNAME]
+"""
+
+from collections import Counter
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from scheduler.models import ArchivedPost, PostStatusCounter, ScheduledPost
+from scheduler.stats import count_posts_by_status, invalidate_user_stats
+
+
+class Command(BaseCommand):
+    help = 'Recount PostStatusCounter from ScheduledPost and ArchivedPost and fix any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Report drift without fixing it')
+        parser.add_argument('--user', help='Only reconcile this username')
+
+    def handle(self, *args, **options):
+        posts = ScheduledPost.objects.all()
+        archived = ArchivedPost.objects.all()
+        counters = PostStatusCounter.objects.all()
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+            posts = posts.filter(user=user)
+            archived = archived.filter(user=user)
+            counters = counters.filter(user=user)
+
+        with transaction.atomic():
+            # Archived posts still count towards the dashboard totals
+            actual = Counter(count_posts_by_status(posts))
+            actual.update(count_posts_by_status(archived))
+            stored = {
+                (c.user_id, c.platform, c.status): c
+                for c in counters.select_for_update()
+            }
+
+            stored_counts = {key: counter.count for key, counter in stored.items()}
+            drift = {
+                key: (stored_counts.get(key, 0), actual.get(key, 0))
+                for key in set(actual) | set(stored)
+                if stored_counts.get(key, 0) != actual.get(key, 0)
+            }
+            for (user_id, platform, status), (was, now) in sorted(drift.items()):
+                self.stdout.write(f'  user {user_id} {platform}/{status}: {was} → {now}')
+
+            if not drift:
+                self.stdout.write(self.style.SUCCESS('✅ Counters match the posts'))
+                return
+            if options['check']:
+                raise CommandError(f'{len(drift)} counters have drifted')
+
+            to_update = []
+            to_create = []
+            for key, (_, count) in drift.items():
+                if key in stored:
+                    stored[key].count = count
+                    to_update.append(stored[key])
+                else:
+                    user_id, platform, status = key
+                    to_create.append(PostStatusCounter(user_id=user_id, platform=platform, status=status, count=count))
+            PostStatusCounter.objects.bulk_update(to_update, ['count'], batch_size=1000)
+            PostStatusCounter.objects.bulk_create(to_create, batch_size=1000)
+            invalidate_user_stats(*(user_id for user_id, _, _ in drift))
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Fixed {len(drift)} counters'))
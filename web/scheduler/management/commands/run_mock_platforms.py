@@ -0,0 +1,37 @@
+"""
+Django management command to run a local mock of the platform APIs
+Run: python manage.py run_mock_platforms [--port 8900] [--rate-limit-rate 0.1]
+"""
+
+from django.core.management.base import BaseCommand
+from scheduler.platforms.mock_server import MockPlatformServer
+
+
+class Command(BaseCommand):
+    help = 'Serve a local stand-in for the social platform APIs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8900)
+        parser.add_argument('--latency-ms', type=float, default=50, help='Delay before each response')
+        parser.add_argument('--rate-limit-rate', type=float, default=0.1, help='Share of requests answered 429')
+        parser.add_argument('--error-rate', type=float, default=0.05, help='Share of requests answered 503')
+
+    def handle(self, *args, **options):
+        server = MockPlatformServer(
+            options['host'], options['port'],
+            latency=options['latency_ms'] / 1000,
+            rate_limit_rate=options['rate_limit_rate'],
+            error_rate=options['error_rate'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'✅ Mock platform APIs on {server.url}'))
+        self.stdout.write(f'   Set PLATFORM_API_MODE=http and PLATFORM_API_BASE_URL={server.url} for the scheduler.')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(self.style.WARNING(
+                f"Stopped after {server.stats['requests']} requests on {server.stats['connections']} connections."
+            ))
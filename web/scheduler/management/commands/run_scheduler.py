@@ -1,54 +1,146 @@
-"""Background Scheduler using APScheduler"""
-from apscheduler.schedulers.background import BackgroundScheduler
-from django.core.management.base import BaseCommand
+"""Background Scheduler - sleeps until the next post is due"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
 import logging
-from scheduler.services import PostingService
+import threading
+import time
+from scheduler.dispatcher import DueTimeScheduler, collect_queue_depth
+from scheduler.images import ImageProcessor
+from scheduler.instrumentation import PROCESS_START
+from scheduler.live import LiveBroker
+from scheduler.metrics import REGISTRY, MetricsServer
+from scheduler.platforms import client
+from scheduler.recurrence import RecurrenceMaterializer
 
 logger = logging.getLogger(__name__)
-scheduler = BackgroundScheduler()
+scheduler = None
+scheduler_thread = None
+metrics_server = None
+live_broker = None
+image_processor = None
+materializer = None
 
 
-def start_scheduler():
+def start_scheduler(worker_id=None):
     """Start the background scheduler"""
-    if scheduler.running:
+    global scheduler, scheduler_thread
+    if scheduler_thread and scheduler_thread.is_alive():
         logger.info("Scheduler already running")
         return
     
-    # Add job to check pending posts every 30 seconds
-    scheduler.add_job(
-        PostingService.execute_scheduled_posts,
-        'interval',
-        seconds=30,
-        id='check_pending_posts',
-        name='Check and post scheduled posts',
-        replace_existing=True,
-        max_instances=1,
-    )
-    
-    scheduler.start()
-    logger.info("✅ Posting scheduler started (interval: 30s)")
+    # Each process claims posts under its own lease owner name
+    scheduler = DueTimeScheduler(worker_id)
+    scheduler_thread = threading.Thread(target=scheduler.run, name='post-scheduler', daemon=True)
+    scheduler_thread.start()
+    logger.info("✅ Posting scheduler started as %s (wakes when posts are due)", scheduler.worker_id)
+
+
+def start_metrics_server(host, port):
+    """Serve this process's scheduler metrics in Prometheus format"""
+    global metrics_server
+    REGISTRY.add_collector(collect_queue_depth)
+    PROCESS_START.set(time.time())
+    metrics_server = MetricsServer(host, port).start()
+    logger.info("📈 Scheduler metrics at %s", metrics_server.url)
+    return metrics_server
+
+
+def start_live_broker():
+    """Relay live dashboard updates between processes (PostgreSQL uses NOTIFY instead)"""
+    global live_broker
+    live_broker = LiveBroker().start()
+    logger.info("📡 Live update broker on %s:%s", *live_broker.address)
+    return live_broker
+
+
+def start_image_processor(workers):
+    """Render thumbnails and platform variants of new uploads in worker processes"""
+    global image_processor
+    image_processor = ImageProcessor(workers).start()
+    logger.info("🖼️ Image processing with %s workers", workers)
+    return image_processor
+
+
+def start_materializer():
+    """Create recurring posts' upcoming occurrences a rolling window ahead"""
+    global materializer
+    materializer = RecurrenceMaterializer().start()
+    logger.info("🔁 Recurring posts materialized %sh ahead", settings.RECURRING_WINDOW_HOURS)
+    return materializer
 
 
 def stop_scheduler():
     """Stop the background scheduler"""
-    if scheduler.running:
-        scheduler.shutdown()
+    global metrics_server, live_broker, image_processor, materializer
+    if scheduler_thread and scheduler_thread.is_alive():
+        scheduler.stop()
+        scheduler_thread.join()
+        client.close()
         logger.info("Scheduler stopped")
+    if metrics_server:
+        metrics_server.stop()
+        metrics_server = None
+    if live_broker:
+        live_broker.stop()
+        live_broker = None
+    if image_processor:
+        image_processor.stop()
+        image_processor = None
+    if materializer:
+        materializer.stop()
+        materializer = None
 
 
 class Command(BaseCommand):
     help = 'Start the background scheduler for posts'
     
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--worker-id',
+            help='Lease owner name for this process (default: hostname:pid). '
+                 'Run several schedulers with distinct ids to share the load.',
+        )
+        parser.add_argument(
+            '--metrics-port', type=int, default=settings.SCHEDULER_METRICS_PORT,
+            help='Local port for Prometheus metrics (0 to disable; '
+                 'give each scheduler on one host its own port)',
+        )
+        parser.add_argument(
+            '--image-workers', type=int, default=settings.IMAGE_WORKERS,
+            help='Processes rendering uploaded images (0 to leave it to process_images)',
+        )
+    
     def handle(self, *args, **options):
-        start_scheduler()
+        start_scheduler(options['worker_id'])
+        start_materializer()
+        if options['metrics_port']:
+            try:
+                server = start_metrics_server(settings.SCHEDULER_METRICS_HOST, options['metrics_port'])
+                self.stdout.write(f'📈 Metrics at {server.url}')
+            except OSError as e:
+                self.stdout.write(self.style.WARNING(f"⚠️  Metrics not served on port {options['metrics_port']}: {e}"))
+        if settings.LIVE_UPDATES and connection.vendor != 'postgresql':
+            try:
+                start_live_broker()
+            except OSError as e:
+                # Another scheduler on this host already runs it
+                self.stdout.write(self.style.WARNING(f'⚠️  Live update broker not started: {e}'))
+        if options['image_workers']:
+            start_image_processor(options['image_workers'])
+            self.stdout.write(f"🖼️  Processing images with {options['image_workers']} workers")
         try:
             self.stdout.write(
                 self.style.SUCCESS('✅ Scheduler running. Press Ctrl+C to stop.')
             )
-            # Keep the process alive
+            # Keep the process alive while the scheduler thread is
             import time
-            while True:
+            while scheduler_thread.is_alive():
                 time.sleep(1)
         except KeyboardInterrupt:
             stop_scheduler()
             self.stdout.write(self.style.WARNING('Scheduler stopped.'))
+            return
+        # Exit non-zero so a supervisor restarts us instead of leaving an idle process
+        stop_scheduler()
+        raise CommandError('Scheduler thread died unexpectedly; see the log above')
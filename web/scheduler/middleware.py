@@ -0,0 +1,63 @@
+"""Request instrumentation and ASGI-capable static files middleware
+
+Both run natively under ASGI as well as WSGI: a sync-only middleware would
+push every async view back onto a worker thread.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+from .instrumentation import ameasure, measure, record_request
+
+
+class RequestMetricsMiddleware:
+    """Measure each request; goes first in MIDDLEWARE so it sees the whole stack"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with measure() as measurement:
+            response = self.get_response(request)
+        self.record(request, response, measurement)
+        return response
+
+    async def __acall__(self, request):
+        async with ameasure() as measurement:
+            response = await self.get_response(request)
+        self.record(request, response, measurement)
+        return response
+
+    def record(self, request, response, measurement):
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        record_request(view, request.method, response.status_code, measurement)
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise, plus an async path for uvicorn"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.10 on 2026-10-17 03:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduledpost',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='scheduledpost',
+            name='lease_owner',
+            field=models.CharField(blank=True, default='', help_text='Scheduler worker currently posting this', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='scheduledpost',
+            name='status',
+            field=models.CharField(choices=[('scheduled', 'Scheduled'), ('processing', 'In flight'), ('success', 'Success'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='scheduled', max_length=20),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.10 on 2026-10-17 03:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0002_scheduledpost_lease'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='scheduledpost',
+            index=models.Index(condition=models.Q(('status', 'scheduled')), fields=['scheduled_at'], name='post_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduledpost',
+            index=models.Index(condition=models.Q(('status', 'processing')), fields=['lease_expires_at'], name='post_lease_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduledpost',
+            index=models.Index(fields=['user', 'status', 'scheduled_at'], name='post_user_status_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduledpost',
+            index=models.Index(fields=['user', 'scheduled_at'], name='post_user_due_idx'),
+        ),
+    ]
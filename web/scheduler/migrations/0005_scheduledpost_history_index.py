@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-17 04:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0004_poststatuscounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='scheduledpost',
+            name='post_user_due_idx',
+        ),
+        migrations.AddIndex(
+            model_name='scheduledpost',
+            index=models.Index(fields=['user', 'scheduled_at', 'id'], name='post_user_history_idx'),
+        ),
+    ]
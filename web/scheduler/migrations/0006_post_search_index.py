@@ -0,0 +1,107 @@
+# Full-text search index for ScheduledPost: tsvector + GIN on PostgreSQL,
+# an FTS5 table on SQLite. Both are kept in sync by database triggers.
+# The SQL is a frozen copy: scheduler.search has its own for re-creating the
+# SQLite triggers after later migrations, and that copy may change.
+
+from django.db import DatabaseError, migrations
+
+FTS_TABLE = 'scheduler_post_fts'
+
+POSTGRES_SQL = [
+    "ALTER TABLE scheduler_scheduledpost ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    """
+    CREATE OR REPLACE FUNCTION scheduler_post_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.content, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(
+                (SELECT platform FROM scheduler_socialaccount WHERE id = NEW.social_account_id), ''
+            )), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS scheduler_post_search_vector ON scheduler_scheduledpost",
+    """
+    CREATE TRIGGER scheduler_post_search_vector
+    BEFORE INSERT OR UPDATE OF content, social_account_id ON scheduler_scheduledpost
+    FOR EACH ROW EXECUTE FUNCTION scheduler_post_search_vector()
+    """,
+    # Backfill existing rows through the trigger
+    "UPDATE scheduler_scheduledpost SET content = content",
+    "CREATE INDEX IF NOT EXISTS post_search_idx ON scheduler_scheduledpost USING GIN (search_vector)",
+]
+
+POSTGRES_REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS scheduler_post_search_vector ON scheduler_scheduledpost",
+    "DROP FUNCTION IF EXISTS scheduler_post_search_vector()",
+    "ALTER TABLE scheduler_scheduledpost DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "owner, platform, content, content='', tokenize='unicode61 remove_diacritics 2')"
+)
+SQLITE_PLATFORM = "(SELECT platform FROM scheduler_socialaccount WHERE id = {row}.social_account_id)"
+SQLITE_INSERT = (
+    f"INSERT INTO {FTS_TABLE}(rowid, owner, platform, content) "
+    f"VALUES (new.id, 'u' || new.user_id, {SQLITE_PLATFORM.format(row='new')}, new.content);"
+)
+SQLITE_DELETE = (
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, owner, platform, content) "
+    f"VALUES ('delete', old.id, 'u' || old.user_id, {SQLITE_PLATFORM.format(row='old')}, old.content);"
+)
+SQLITE_TRIGGERS = {
+    'scheduler_post_fts_insert': f"AFTER INSERT ON scheduler_scheduledpost BEGIN {SQLITE_INSERT} END",
+    'scheduler_post_fts_delete': f"AFTER DELETE ON scheduler_scheduledpost BEGIN {SQLITE_DELETE} END",
+    'scheduler_post_fts_update': (
+        "AFTER UPDATE OF content, social_account_id, user_id ON scheduler_scheduledpost "
+        f"BEGIN {SQLITE_DELETE} {SQLITE_INSERT} END"
+    ),
+}
+SQLITE_BACKFILL = (
+    f"INSERT INTO {FTS_TABLE}(rowid, owner, platform, content) "
+    "SELECT p.id, 'u' || p.user_id, a.platform, p.content "
+    "FROM scheduler_scheduledpost p JOIN scheduler_socialaccount a ON a.id = p.social_account_id"
+)
+
+
+def install(apps, schema_editor):
+    conn = schema_editor.connection
+    with conn.cursor() as cursor:
+        if conn.vendor == 'postgresql':
+            for statement in POSTGRES_SQL:
+                cursor.execute(statement)
+        elif conn.vendor == 'sqlite':
+            try:
+                cursor.execute(SQLITE_TABLE)
+            except DatabaseError:
+                # No FTS5 in this SQLite build: search falls back to LIKE
+                return
+            for name, body in SQLITE_TRIGGERS.items():
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+                cursor.execute(f"CREATE TRIGGER {name} {body}")
+            cursor.execute(SQLITE_BACKFILL)
+
+
+def uninstall(apps, schema_editor):
+    conn = schema_editor.connection
+    with conn.cursor() as cursor:
+        if conn.vendor == 'postgresql':
+            for statement in POSTGRES_REVERSE_SQL:
+                cursor.execute(statement)
+        elif conn.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0005_scheduledpost_history_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
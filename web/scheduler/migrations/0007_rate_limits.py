@@ -0,0 +1,43 @@
+# Generated by Django 5.2.10 on 2026-10-17 04:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0006_post_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform', models.CharField(choices=[('instagram', 'Instagram'), ('facebook', 'Facebook'), ('twitter', 'Twitter/X'), ('linkedin', 'LinkedIn')], max_length=20)),
+                ('tokens', models.FloatField()),
+                ('updated_at', models.DateTimeField(help_text='When tokens was last refilled')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='scheduledpost',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, help_text='Deferred until then, e.g. by a rate limit', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='scheduledpost',
+            index=models.Index(condition=models.Q(('status', 'scheduled')), fields=['next_attempt_at'], name='post_deferred_idx'),
+        ),
+        migrations.AddField(
+            model_name='ratelimitbucket',
+            name='social_account',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rate_limit_buckets', to='scheduler.socialaccount'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='ratelimitbucket',
+            unique_together={('platform', 'social_account')},
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.10 on 2026-10-17 04:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0007_rate_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduledpost',
+            name='attempt_count',
+            field=models.PositiveIntegerField(default=0, help_text='Times the scheduler has tried to post this'),
+        ),
+        migrations.AlterField(
+            model_name='poststatuscounter',
+            name='status',
+            field=models.CharField(choices=[('scheduled', 'Scheduled'), ('processing', 'In flight'), ('success', 'Success'), ('failed', 'Failed'), ('dead', 'Gave up'), ('cancelled', 'Cancelled')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='scheduledpost',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, help_text='Deferred until then, by a rate limit or a retry backoff', null=True),
+        ),
+        migrations.AlterField(
+            model_name='scheduledpost',
+            name='status',
+            field=models.CharField(choices=[('scheduled', 'Scheduled'), ('processing', 'In flight'), ('success', 'Success'), ('failed', 'Failed'), ('dead', 'Gave up'), ('cancelled', 'Cancelled')], default='scheduled', max_length=20),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.10 on 2026-10-17 04:29
+
+from django.db import migrations, models
+
+
+def queue_existing_images(apps, schema_editor):
+    ScheduledPost = apps.get_model('scheduler', 'ScheduledPost')
+    ScheduledPost.objects.exclude(image='').exclude(image__isnull=True).update(image_state='pending')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0008_retries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduledpost',
+            name='image_state',
+            field=models.CharField(blank=True, choices=[('pending', 'Processing'), ('ready', 'Ready'), ('failed', 'Could not process')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='scheduledpost',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, help_text="Processed image file names: 'thumb' and one per platform"),
+        ),
+        migrations.RunPython(queue_existing_images, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='scheduledpost',
+            index=models.Index(condition=models.Q(('image_state', 'pending')), fields=['scheduled_at'], name='post_image_pending_idx'),
+        ),
+    ]
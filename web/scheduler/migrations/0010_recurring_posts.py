@@ -0,0 +1,53 @@
+# Generated by Django 5.2.10 on 2026-10-17 04:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0009_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.TextField()),
+                ('image', models.ImageField(blank=True, null=True, upload_to='posts/')),
+                ('frequency', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly'), ('cron', 'Cron expression')], default='daily', max_length=10)),
+                ('interval', models.PositiveSmallIntegerField(default=1, help_text='Every N days (daily) or weeks (weekly)')),
+                ('weekdays', models.JSONField(blank=True, default=list, help_text='Weekly: days to post on, 0=Monday (default: the start day)')),
+                ('cron', models.CharField(blank=True, help_text='Cron: minute hour day-of-month month day-of-week', max_length=100)),
+                ('timezone', models.CharField(choices=[('Asia/Kolkata', 'India (IST)'), ('Asia/Bangkok', 'Thailand (ICT)'), ('Asia/Singapore', 'Singapore (SGT)'), ('UTC', 'UTC'), ('America/New_York', 'Eastern Time (EST)'), ('America/Los_Angeles', 'Pacific Time (PST)'), ('Europe/London', 'London (GMT)'), ('Europe/Paris', 'Paris (CET)')], default='UTC', help_text='Zone the times of day are in', max_length=64)),
+                ('starts_at', models.DateTimeField(help_text='First occurrence; daily and weekly posts go out at its time of day')),
+                ('ends_at', models.DateTimeField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('materialized_until', models.DateTimeField(help_text='Posts exist for every occurrence before this')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('social_account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_posts', to='scheduler.socialaccount')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_posts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='scheduledpost',
+            name='recurrence',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='posts', to='scheduler.recurringpost'),
+        ),
+        migrations.AddConstraint(
+            model_name='scheduledpost',
+            constraint=models.UniqueConstraint(condition=models.Q(('recurrence__isnull', False)), fields=('recurrence', 'scheduled_at'), name='post_recurrence_occurrence_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringpost',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['materialized_until'], name='recurring_due_idx'),
+        ),
+    ]
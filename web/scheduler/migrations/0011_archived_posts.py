@@ -0,0 +1,99 @@
+# Archive table for finished posts. On PostgreSQL it is range-partitioned by
+# month of scheduled_at, which Django can't express, so the table is created
+# here with SQL; on other databases it's an ordinary table.
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+POSTGRES_TABLE = """
+CREATE TABLE IF NOT EXISTS {table} (
+    id bigint NOT NULL,
+    user_id integer NOT NULL REFERENCES {users} (id) DEFERRABLE INITIALLY DEFERRED,
+    social_account_id bigint NOT NULL REFERENCES {accounts} (id) DEFERRABLE INITIALLY DEFERRED,
+    content text NOT NULL,
+    image varchar(100) NULL,
+    image_variants jsonb NOT NULL,
+    scheduled_at timestamp with time zone NOT NULL,
+    status varchar(20) NOT NULL,
+    last_attempt_at timestamp with time zone NULL,
+    result_message text NULL,
+    attempt_count integer NOT NULL CHECK (attempt_count >= 0),
+    created_at timestamp with time zone NOT NULL,
+    updated_at timestamp with time zone NOT NULL,
+    archived_at timestamp with time zone NOT NULL,
+    -- A partitioned table's keys must include the partition column
+    PRIMARY KEY (id, scheduled_at)
+) PARTITION BY RANGE (scheduled_at)
+"""
+
+
+def install(apps, schema_editor):
+    model = apps.get_model('scheduler', 'ArchivedPost')
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.create_model(model)
+        return
+    table = model._meta.db_table
+    schema_editor.execute(POSTGRES_TABLE.format(
+        table=table,
+        users=model._meta.get_field('user').related_model._meta.db_table,
+        accounts=model._meta.get_field('social_account').related_model._meta.db_table,
+    ))
+    # Created on the parent, so every partition gets them too
+    schema_editor.execute(f"CREATE INDEX IF NOT EXISTS archive_user_history_idx ON {table} (user_id, scheduled_at, id)")
+    schema_editor.execute(f"CREATE INDEX IF NOT EXISTS archive_account_idx ON {table} (social_account_id)")
+
+
+def uninstall(apps, schema_editor):
+    model = apps.get_model('scheduler', 'ArchivedPost')
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.delete_model(model)
+        return
+    # Drops the partitions with it
+    schema_editor.execute(f"DROP TABLE IF EXISTS {model._meta.db_table} CASCADE")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0010_recurring_posts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='scheduledpost',
+            index=models.Index(condition=models.Q(('status__in', ('success', 'failed', 'dead', 'cancelled'))), fields=['scheduled_at'], name='post_archivable_idx'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ArchivedPost',
+                    fields=[
+                        ('id', models.BigIntegerField(help_text="The post's id in ScheduledPost", primary_key=True, serialize=False)),
+                        ('content', models.TextField()),
+                        ('image', models.ImageField(blank=True, null=True, upload_to='posts/')),
+                        ('image_variants', models.JSONField(blank=True, default=dict)),
+                        ('scheduled_at', models.DateTimeField()),
+                        ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('processing', 'In flight'), ('success', 'Success'), ('failed', 'Failed'), ('dead', 'Gave up'), ('cancelled', 'Cancelled')], max_length=20)),
+                        ('last_attempt_at', models.DateTimeField(blank=True, null=True)),
+                        ('result_message', models.TextField(blank=True, null=True)),
+                        ('attempt_count', models.PositiveIntegerField(default=0)),
+                        ('created_at', models.DateTimeField()),
+                        ('updated_at', models.DateTimeField()),
+                        ('archived_at', models.DateTimeField()),
+                        ('social_account', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_posts', to='scheduler.socialaccount')),
+                        ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_posts', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'ordering': ['-scheduled_at'],
+                        'indexes': [
+                            models.Index(fields=['user', 'scheduled_at', 'id'], name='archive_user_history_idx'),
+                            models.Index(fields=['social_account'], name='archive_account_idx'),
+                        ],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.10 on 2026-10-17 04:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0011_archived_posts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempt', models.PositiveSmallIntegerField(help_text='1 for the first try')),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField()),
+                ('latency_ms', models.PositiveIntegerField(help_text='Time the platform call took')),
+                ('outcome', models.CharField(choices=[('success', 'Posted'), ('rate_limit', 'Rate limited'), ('transient', 'Temporary error'), ('permanent', 'Rejected')], max_length=12)),
+                ('response', models.TextField(blank=True, default='', help_text="The platform's answer (cleared by compaction)")),
+                ('post', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='attempts', to='scheduler.scheduledpost')),
+            ],
+            options={
+                'ordering': ['started_at'],
+                'indexes': [models.Index(fields=['post', 'started_at'], name='attempt_post_timeline_idx'), models.Index(fields=['started_at'], name='attempt_started_idx')],
+            },
+        ),
+    ]
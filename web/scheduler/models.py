@@ -1,7 +1,8 @@
+from django.core.files.storage import default_storage
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-from .constants import PLATFORM_CHOICES, STATUS_CHOICES
+from .constants import ARCHIVED_STATUSES, ATTEMPT_OUTCOME_CHOICES, FREQUENCY_CHOICES, IMAGE_STATE_CHOICES, PLATFORM_CHOICES, STATUS_CHOICES, TIMEZONE_CHOICES
 
 
 class SocialAccount(models.Model):
@@ -22,21 +23,80 @@ class SocialAccount(models.Model):
         return f"{self.user.username} - {self.get_platform_display()}"
 
 
+class RecurringPost(models.Model):
+    """A post that repeats; its ScheduledPosts are only created a rolling window ahead"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_posts')
+    social_account = models.ForeignKey(SocialAccount, on_delete=models.CASCADE, related_name='recurring_posts')
+    content = models.TextField()
+    image = models.ImageField(upload_to='posts/', null=True, blank=True)
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default='daily')
+    interval = models.PositiveSmallIntegerField(default=1, help_text="Every N days (daily) or weeks (weekly)")
+    weekdays = models.JSONField(default=list, blank=True, help_text="Weekly: days to post on, 0=Monday (default: the start day)")
+    cron = models.CharField(max_length=100, blank=True, help_text="Cron: minute hour day-of-month month day-of-week")
+    timezone = models.CharField(max_length=64, choices=TIMEZONE_CHOICES, default='UTC', help_text="Zone the times of day are in")
+    starts_at = models.DateTimeField(help_text="First occurrence; daily and weekly posts go out at its time of day")
+    ends_at = models.DateTimeField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    materialized_until = models.DateTimeField(help_text="Posts exist for every occurrence before this")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Materializer: active templates whose window needs extending
+            models.Index(fields=['materialized_until'], condition=models.Q(is_active=True), name='recurring_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.social_account.get_platform_display()} - {self.describe()}"
+
+    def describe(self):
+        """Human-readable schedule, e.g. 'Every 2 weeks on Mon, Thu'"""
+        from .recurrence import describe
+        return describe(self)
+
+
 class ScheduledPost(models.Model):
     """Store scheduled social media posts"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='scheduled_posts')
     social_account = models.ForeignKey(SocialAccount, on_delete=models.CASCADE, related_name='posts')
     content = models.TextField()
     image = models.ImageField(upload_to='posts/', null=True, blank=True)
+    image_state = models.CharField(max_length=10, choices=IMAGE_STATE_CHOICES, blank=True, default='')
+    image_variants = models.JSONField(default=dict, blank=True, help_text="Processed image file names: 'thumb' and one per platform")
     scheduled_at = models.DateTimeField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='scheduled')
     last_attempt_at = models.DateTimeField(null=True, blank=True)
     result_message = models.TextField(null=True, blank=True)
+    lease_owner = models.CharField(max_length=255, blank=True, default='', help_text="Scheduler worker currently posting this")
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    next_attempt_at = models.DateTimeField(null=True, blank=True, help_text="Deferred until then, by a rate limit or a retry backoff")
+    attempt_count = models.PositiveIntegerField(default=0, help_text="Times the scheduler has tried to post this")
+    recurrence = models.ForeignKey(RecurringPost, on_delete=models.SET_NULL, null=True, blank=True, related_name='posts')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-scheduled_at']
+        indexes = [
+            # Scheduler: due posts, and leases to recover
+            models.Index(fields=['scheduled_at'], condition=models.Q(status='scheduled'), name='post_due_idx'),
+            models.Index(fields=['lease_expires_at'], condition=models.Q(status='processing'), name='post_lease_expiry_idx'),
+            models.Index(fields=['next_attempt_at'], condition=models.Q(status='scheduled'), name='post_deferred_idx'),
+            # Image pipeline: uploads waiting to be processed
+            models.Index(fields=['scheduled_at'], condition=models.Q(image_state='pending'), name='post_image_pending_idx'),
+            # Dashboard: per-user counts, upcoming posts and history pages (keyset on scheduled_at, id)
+            models.Index(fields=['user', 'status', 'scheduled_at'], name='post_user_status_due_idx'),
+            models.Index(fields=['user', 'scheduled_at', 'id'], name='post_user_history_idx'),
+            # Archiving: finished posts, oldest first
+            models.Index(fields=['scheduled_at'], condition=models.Q(status__in=ARCHIVED_STATUSES), name='post_archivable_idx'),
+        ]
+        constraints = [
+            # One post per occurrence of a recurring post
+            models.UniqueConstraint(fields=['recurrence', 'scheduled_at'], condition=models.Q(recurrence__isnull=False),
+                                    name='post_recurrence_occurrence_uniq'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.social_account.get_platform_display()} - {self.scheduled_at}"
@@ -49,6 +109,22 @@ class ScheduledPost(models.Model):
     def is_pending(self):
         return self.status == 'scheduled' and self.scheduled_at <= timezone.now()
 
+    def queue_image(self):
+        """Call when the upload is set or replaced: variants are rendered in the background"""
+        self.image_state = 'pending' if self.image else ''
+        self.image_variants = {}
+
+    @property
+    def thumbnail_url(self):
+        """Small EXIF-free preview, once the upload has been processed"""
+        thumb = self.image_variants.get('thumb')
+        return default_storage.url(thumb) if thumb else None
+
+    def image_url_for(self, platform):
+        """The image sized for platform, or the original upload until it's processed"""
+        variant = self.image_variants.get(platform)
+        return default_storage.url(variant) if variant else self.image.url
+
     @property
     def time_until_scheduled(self):
         """Return time difference string"""
@@ -61,3 +137,96 @@ class ScheduledPost(models.Model):
         if hours > 0:
             return f"{int(hours)}h {int(minutes)}m"
         return f"{int(minutes)}m"
+
+
+class ArchivedPost(models.Model):
+    """
+    A finished post moved out of ScheduledPost once it's ARCHIVE_AFTER_DAYS old (read-only)
+    On PostgreSQL the table is range-partitioned by month of scheduled_at; see scheduler/archive.py.
+    """
+    id = models.BigIntegerField(primary_key=True, help_text="The post's id in ScheduledPost")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_posts', db_index=False)
+    social_account = models.ForeignKey(SocialAccount, on_delete=models.CASCADE, related_name='archived_posts', db_index=False)
+    content = models.TextField()
+    image = models.ImageField(upload_to='posts/', null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True)
+    scheduled_at = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    last_attempt_at = models.DateTimeField(null=True, blank=True)
+    result_message = models.TextField(null=True, blank=True)
+    attempt_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+
+    # Dashboard rows show no actions for these
+    is_archived = True
+
+    class Meta:
+        ordering = ['-scheduled_at']
+        indexes = [
+            # Dashboard history pages that reach back into the archive
+            models.Index(fields=['user', 'scheduled_at', 'id'], name='archive_user_history_idx'),
+            models.Index(fields=['social_account'], name='archive_account_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.social_account.get_platform_display()} - {self.scheduled_at} (archived)"
+
+    @property
+    def thumbnail_url(self):
+        thumb = self.image_variants.get('thumb')
+        return default_storage.url(thumb) if thumb else None
+
+
+class PostAttempt(models.Model):
+    """
+    One try at sending a post, written once by the scheduler and never updated
+    No database constraint on post: attempts stay with a post once it's archived.
+    """
+    post = models.ForeignKey(ScheduledPost, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='attempts')
+    attempt = models.PositiveSmallIntegerField(help_text="1 for the first try")
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField()
+    latency_ms = models.PositiveIntegerField(help_text="Time the platform call took")
+    outcome = models.CharField(max_length=12, choices=ATTEMPT_OUTCOME_CHOICES)
+    response = models.TextField(blank=True, default='', help_text="The platform's answer (cleared by compaction)")
+
+    class Meta:
+        ordering = ['started_at']
+        indexes = [
+            # Per-post timelines, and pruning by age
+            models.Index(fields=['post', 'started_at'], name='attempt_post_timeline_idx'),
+            models.Index(fields=['started_at'], name='attempt_started_idx'),
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id} attempt {self.attempt} - {self.get_outcome_display()}"
+
+
+class PostStatusCounter(models.Model):
+    """Running post count per user, platform and status, kept in step with ScheduledPost"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='post_counters')
+    platform = models.CharField(max_length=20, choices=PLATFORM_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'platform', 'status')
+
+    def __str__(self):
+        return f"{self.user.username} - {self.platform} - {self.status}: {self.count}"
+
+
+class RateLimitBucket(models.Model):
+    """Token bucket for one account's API calls, shared by all scheduler processes"""
+    platform = models.CharField(max_length=20, choices=PLATFORM_CHOICES)
+    social_account = models.ForeignKey(SocialAccount, on_delete=models.CASCADE, related_name='rate_limit_buckets')
+    tokens = models.FloatField()
+    updated_at = models.DateTimeField(help_text="When tokens was last refilled")
+
+    class Meta:
+        unique_together = ('platform', 'social_account')
+
+    def __str__(self):
+        return f"{self.social_account} - {self.tokens:.1f} tokens"
@@ -0,0 +1,85 @@
+"""Keyset (cursor) pagination for post lists, newest first on (scheduled_at, id)
+
+Unlike OFFSET paging, fetching page N costs the same as page 1: each page
+starts from the last row of the previous one through the index.
+"""
+import base64
+from datetime import datetime
+from django.db.models import Q
+
+PAGE_SIZE = 20
+
+
+def encode_cursor(scheduled_at, post_id):
+    raw = f'{scheduled_at.isoformat()}|{post_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Returns: (scheduled_at, id), or None for a missing or malformed cursor"""
+    if not cursor:
+        return None
+    try:
+        scheduled_at, post_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(scheduled_at), int(post_id)
+    except ValueError:
+        return None
+
+
+def after_cursor(queryset, cursor=None):
+    """Posts newest first, starting after cursor"""
+    queryset = queryset.order_by('-scheduled_at', '-id')
+    position = decode_cursor(cursor)
+    if position:
+        scheduled_at, post_id = position
+        queryset = queryset.filter(
+            Q(scheduled_at__lt=scheduled_at) | Q(scheduled_at=scheduled_at, id__lt=post_id)
+        )
+    return queryset
+
+
+def keyset_page(queryset, cursor=None, page_size=PAGE_SIZE):
+    """
+    One page of posts starting after cursor
+    Returns: (posts, next_cursor) - next_cursor is None on the last page
+    """
+    # One extra row tells us whether there is another page
+    posts = list(after_cursor(queryset, cursor)[:page_size + 1])
+    return _split_page(posts, page_size)
+
+
+async def akeyset_page(queryset, cursor=None, page_size=PAGE_SIZE):
+    """keyset_page() for async views"""
+    posts = [post async for post in after_cursor(queryset, cursor)[:page_size + 1].aiterator()]
+    return _split_page(posts, page_size)
+
+
+async def akeyset_page_with_archive(queryset, archived, cursor=None, page_size=PAGE_SIZE):
+    """
+    akeyset_page() that carries on into archived posts
+    The archive is only read once the page reaches back to the newest archived
+    post, found with one index lookup. The boundary comes from the data rather
+    than ARCHIVE_AFTER_DAYS, since archive_posts --days can archive newer posts.
+    """
+    posts = [post async for post in after_cursor(queryset, cursor)[:page_size + 1].aiterator()]
+    if len(posts) > page_size:
+        newest_archived = await archived.order_by('-scheduled_at').values_list('scheduled_at', flat=True).afirst()
+        if newest_archived is None or posts[-1].scheduled_at > newest_archived:
+            return _split_page(posts, page_size)
+    posts += [post async for post in after_cursor(archived, cursor)[:page_size + 1].aiterator()]
+    posts.sort(key=lambda post: (post.scheduled_at, post.id), reverse=True)
+    return _split_page(posts, page_size)
+
+
+def _split_page(posts, page_size):
+    if len(posts) <= page_size:
+        return posts, None
+    last = posts[page_size - 1]
+    return posts[:page_size], encode_cursor(last.scheduled_at, last.id)
+
+
+def page_url(request, cursor):
+    """The current URL with its filters kept and the cursor replaced"""
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return f'{request.path}?{params.urlencode()}'
@@ -0,0 +1,19 @@
+"""Platform adapters - one per entry in PLATFORM_CHOICES"""
+from .base import PlatformAdapter
+from .facebook import FacebookAdapter
+from .instagram import InstagramAdapter
+from .linkedin import LinkedInAdapter
+from .twitter import TwitterAdapter
+
+ADAPTERS = {
+    adapter.platform: adapter
+    for adapter in (InstagramAdapter(), FacebookAdapter(), TwitterAdapter(), LinkedInAdapter())
+}
+
+
+def get_adapter(platform):
+    """The adapter for a SocialAccount.platform value"""
+    try:
+        return ADAPTERS[platform]
+    except KeyError:
+        raise ValueError(f"No adapter for platform '{platform}'")
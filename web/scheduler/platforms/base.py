@@ -0,0 +1,72 @@
+"""Base class for platform adapters"""
+import random
+import httpx
+from django.conf import settings
+from . import client
+
+
+class PlatformAdapter:
+    """
+    Publishes posts to one social platform
+    Subclasses set `platform` and `api_url` and implement send().
+    With PLATFORM_API_MODE = 'simulate' no request is made and the result
+    is random (80% success), as in local development.
+    """
+    platform = None
+    api_url = None
+
+    async def publish(self, post):
+        """
+        Attempt to post to the platform
+        Returns: (success: bool, message: str)
+        """
+        account = post.social_account
+        if not account.is_connected:
+            return False, "Social account is not connected"
+        if not account.access_token:
+            return False, "Missing access token"
+
+        if settings.PLATFORM_API_MODE == 'simulate':
+            return self.simulate(post)
+
+        try:
+            return await self.send(post)
+        except httpx.HTTPError as e:
+            return False, f"Error: {e.__class__.__name__} calling {account.get_platform_display()}"
+
+    def simulate(self, post):
+        # Simulate API call - 80% success rate
+        if random.random() < 0.8:
+            return True, f"✅ Posted to {post.social_account.get_platform_display()}"
+        return False, "API rate limit exceeded. Retry in 1 hour."
+
+    async def send(self, post):
+        """Make the API call(s); returns (success, message)"""
+        raise NotImplementedError
+
+    def url(self, path):
+        """API URL for path, pointed at PLATFORM_API_BASE_URL when set (e.g. the mock server)"""
+        return (settings.PLATFORM_API_BASE_URL or self.api_url).rstrip('/') + path
+
+    def media_url(self, post):
+        """Public URL of the post's image, for APIs that fetch it themselves"""
+        return settings.PUBLIC_BASE_URL.rstrip('/') + post.image_url_for(self.platform)
+
+    async def call(self, post, method, path, **kwargs):
+        """Authenticated request to this platform's API"""
+        headers = {'Authorization': f'Bearer {post.social_account.access_token}', **kwargs.pop('headers', {})}
+        return await client.request(method, self.url(path), headers=headers, **kwargs)
+
+    def result(self, post, response):
+        """Map an API response to (success, message) in the scheduler's error vocabulary"""
+        name = post.social_account.get_platform_display()
+        if response.is_success:
+            return True, f"✅ Posted to {name}"
+        if response.status_code == 429:
+            retry_after = response.headers.get('Retry-After', 'a while')
+            return False, f"API rate limit exceeded. Retry in {retry_after}s."
+        if response.status_code in (401, 403):
+            return False, f"Access token rejected by {name}"
+        if response.status_code >= 500:
+            return False, f"Error: {name} returned HTTP {response.status_code}"
+        return False, f"Rejected by {name} (HTTP {response.status_code}): {response.text[:200]}"
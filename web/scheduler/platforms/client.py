@@ -0,0 +1,74 @@
+"""Shared async HTTP client for platform API calls
+
+One httpx.AsyncClient lives on a background event loop for the whole process,
+so connections (and TLS sessions) are kept alive and reused across posts and
+scheduler ticks. HTTP/2 is used where the server offers it and the h2
+package is installed. Calls to each host are capped at
+PLATFORM_HTTP_MAX_CONNECTIONS_PER_HOST.
+"""
+import asyncio
+import importlib.util
+import threading
+import httpx
+from django.conf import settings
+
+HTTP2 = importlib.util.find_spec('h2') is not None
+
+_loop = None
+_loop_lock = threading.Lock()
+_client = None
+_host_slots = {}
+
+
+def event_loop():
+    """The background loop adapters run on, started on first use"""
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='platform-http', daemon=True).start()
+    return _loop
+
+
+def submit(coroutine):
+    """Run a coroutine on the background loop; returns a concurrent.futures.Future"""
+    return asyncio.run_coroutine_threadsafe(coroutine, event_loop())
+
+
+def get_client():
+    """The process-wide pooled client (call from the background loop only)"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=HTTP2,
+            timeout=settings.PLATFORM_HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=None,
+                max_keepalive_connections=settings.PLATFORM_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=settings.PLATFORM_HTTP_KEEPALIVE_EXPIRY,
+            ),
+            headers={'User-Agent': 'post-scheduler'},
+        )
+    return _client
+
+
+async def request(method, url, **kwargs):
+    """Send one request through the shared pool, within the per-host limit"""
+    host = httpx.URL(url).host
+    if host not in _host_slots:
+        _host_slots[host] = asyncio.Semaphore(settings.PLATFORM_HTTP_MAX_CONNECTIONS_PER_HOST)
+    async with _host_slots[host]:
+        return await get_client().request(method, url, **kwargs)
+
+
+def close():
+    """Close pooled connections and stop the background loop"""
+    global _client, _loop
+    with _loop_lock:
+        if _loop is None:
+            return
+        if _client is not None:
+            asyncio.run_coroutine_threadsafe(_client.aclose(), _loop).result()
+        _loop.call_soon_threadsafe(_loop.stop)
+        _client = _loop = None
+        _host_slots.clear()
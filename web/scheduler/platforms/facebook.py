@@ -0,0 +1,17 @@
+"""Facebook Graph API - posts to the page the token belongs to"""
+from .base import PlatformAdapter
+
+
+class FacebookAdapter(PlatformAdapter):
+    platform = 'facebook'
+    api_url = 'https://graph.facebook.com/v19.0'
+
+    async def send(self, post):
+        if post.image:
+            response = await self.call(post, 'POST', '/me/photos', data={
+                'url': self.media_url(post),
+                'caption': post.content,
+            })
+        else:
+            response = await self.call(post, 'POST', '/me/feed', data={'message': post.content})
+        return self.result(post, response)
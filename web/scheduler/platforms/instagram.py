@@ -0,0 +1,23 @@
+"""Instagram Graph API - create a media container, then publish it"""
+from .base import PlatformAdapter
+
+
+class InstagramAdapter(PlatformAdapter):
+    platform = 'instagram'
+    api_url = 'https://graph.facebook.com/v19.0'
+
+    async def send(self, post):
+        if not post.image:
+            return False, "Instagram posts need an image"
+
+        container = await self.call(post, 'POST', '/me/media', data={
+            'image_url': self.media_url(post),
+            'caption': post.content,
+        })
+        if not container.is_success:
+            return self.result(post, container)
+
+        response = await self.call(post, 'POST', '/me/media_publish', data={
+            'creation_id': container.json()['id'],
+        })
+        return self.result(post, response)
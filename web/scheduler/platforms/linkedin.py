@@ -0,0 +1,21 @@
+"""LinkedIn UGC Posts API - shares as the member; SocialAccount.username holds the member id"""
+from .base import PlatformAdapter
+
+
+class LinkedInAdapter(PlatformAdapter):
+    platform = 'linkedin'
+    api_url = 'https://api.linkedin.com'
+
+    async def send(self, post):
+        response = await self.call(post, 'POST', '/v2/ugcPosts', headers={'X-Restli-Protocol-Version': '2.0.0'}, json={
+            'author': f'urn:li:person:{post.social_account.username}',
+            'lifecycleState': 'PUBLISHED',
+            'specificContent': {
+                'com.linkedin.ugc.ShareContent': {
+                    'shareCommentary': {'text': post.content},
+                    'shareMediaCategory': 'NONE',
+                },
+            },
+            'visibility': {'com.linkedin.ugc.MemberNetworkVisibility': 'PUBLIC'},
+        })
+        return self.result(post, response)
@@ -0,0 +1,81 @@
+"""Local stand-in for the platform APIs
+
+Accepts any POST and answers like a platform would: 200 with a post id, or,
+at the configured rates, 429 (rate limited) or 503. HTTP/1.1 keep-alive is
+on, and it counts connections as well as requests so pooling can be checked.
+Point the scheduler at it with PLATFORM_API_MODE=http and
+PLATFORM_API_BASE_URL=http://127.0.0.1:<port>.
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockPlatformHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.count('connections')
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.server.count('requests')
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        roll = random.random()
+        if roll < self.server.rate_limit_rate:
+            self._reply(429, {'error': 'rate limited'}, {'Retry-After': '60'})
+        elif roll < self.server.rate_limit_rate + self.server.error_rate:
+            self._reply(503, {'error': 'unavailable'})
+        else:
+            self._reply(200, {'id': uuid.uuid4().hex})
+
+    def _reply(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockPlatformServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, rate_limit_rate=0.0, error_rate=0.0):
+        super().__init__((host, port), MockPlatformHandler)
+        self.latency = latency
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.stats = {'connections': 0, 'requests': 0}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def start(self):
+        """Serve from a background thread (for scripts and benchmarks)"""
+        self._thread = threading.Thread(target=self.serve_forever, name='mock-platforms', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
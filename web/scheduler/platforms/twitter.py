@@ -0,0 +1,11 @@
+"""Twitter/X API v2"""
+from .base import PlatformAdapter
+
+
+class TwitterAdapter(PlatformAdapter):
+    platform = 'twitter'
+    api_url = 'https://api.twitter.com'
+
+    async def send(self, post):
+        response = await self.call(post, 'POST', '/2/tweets', json={'text': post.content})
+        return self.result(post, response)
@@ -0,0 +1,95 @@
+"""Per-account token buckets for platform API calls
+
+Each (platform, SocialAccount) has a bucket of `burst` tokens refilled at
+`per_hour` tokens an hour. Buckets live in the database, so every scheduler
+process draws from the same budget. Posts that don't get a token are deferred
+until one will be available instead of being sent to fail.
+"""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils import timezone
+from .models import RateLimitBucket
+
+logger = logging.getLogger(__name__)
+
+# Give up on a bucket after this many lost compare-and-swap races
+MAX_TAKE_ATTEMPTS = 5
+
+
+def bucket_limits(platform):
+    """Returns: (burst, tokens per second) for a platform"""
+    burst, per_hour = settings.SCHEDULER_RATE_LIMITS.get(platform, settings.SCHEDULER_RATE_LIMITS['default'])
+    return burst, per_hour / 3600
+
+
+def refill_interval(platform):
+    """Time for one token to come back"""
+    _, rate = bucket_limits(platform)
+    return timedelta(seconds=1 / rate if rate else settings.SCHEDULER_MAX_SLEEP)
+
+
+def _refilled(bucket, burst, rate, now):
+    elapsed = max((now - bucket.updated_at).total_seconds(), 0)
+    return min(burst, bucket.tokens + elapsed * rate)
+
+
+def _get_bucket(social_account_id, platform, now):
+    burst, _ = bucket_limits(platform)
+    try:
+        bucket, _ = RateLimitBucket.objects.get_or_create(
+            platform=platform,
+            social_account_id=social_account_id,
+            defaults={'tokens': burst, 'updated_at': now},
+        )
+    except IntegrityError:
+        # Another process created it first
+        bucket = RateLimitBucket.objects.get(platform=platform, social_account_id=social_account_id)
+    return bucket
+
+
+def take_tokens(social_account_id, platform, wanted, now=None):
+    """
+    Take up to `wanted` tokens from an account's bucket
+    Returns: (granted, ready_times) - ready_times[i] is when the i-th post
+    that didn't get a token can go, spaced one refill apart so deferred
+    posts don't all wake up at once.
+    """
+    now = now or timezone.now()
+    burst, rate = bucket_limits(platform)
+
+    for _ in range(MAX_TAKE_ATTEMPTS):
+        bucket = _get_bucket(social_account_id, platform, now)
+        tokens = _refilled(bucket, burst, rate, now)
+        granted = min(wanted, int(tokens))
+        # Compare-and-swap on updated_at: a concurrent take makes this a no-op
+        swapped = RateLimitBucket.objects.filter(id=bucket.id, updated_at=bucket.updated_at).update(
+            tokens=tokens - granted, updated_at=now,
+        )
+        if swapped:
+            break
+    else:
+        logger.warning("Rate limit bucket for account %s is contended; deferring its posts", social_account_id)
+        tokens = granted = 0
+
+    left = tokens - granted
+    interval = refill_interval(platform)
+    ready_times = [now + interval * (i - left) for i in range(1, wanted - granted + 1)]
+    return granted, ready_times
+
+
+def drain_bucket(social_account_id, platform, now=None):
+    """
+    Empty an account's bucket after the platform itself rejected a call
+    Returns: when the next token will be available
+    """
+    now = now or timezone.now()
+    bucket = _get_bucket(social_account_id, platform, now)
+    RateLimitBucket.objects.filter(id=bucket.id).update(tokens=0, updated_at=now)
+    return now + refill_interval(platform)
+
+
+def is_rate_limited(message):
+    """Whether a platform error message means we hit its rate limit"""
+    return 'rate limit' in (message or '').lower()
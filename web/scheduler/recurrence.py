@@ -0,0 +1,262 @@
+"""Recurring posts: occurrence rules and rolling-window materialization
+
+A RecurringPost is a template. Its concrete ScheduledPosts are created only
+for occurrences in the next RECURRING_WINDOW_HOURS, a batch of templates at
+a time, by a background thread in run_scheduler. Each template's
+materialized_until cursor records how far posts exist, so the table and the
+scheduler's due-post scans only ever hold about one window of future
+occurrences, however far ahead a recurrence runs. Editing a template changes
+every occurrence that hasn't been materialized yet.
+
+Times of day are wall-clock times in the template's timezone, so a 09:00
+daily post stays at 09:00 across daylight saving changes.
+"""
+import logging
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from .constants import WEEKDAY_CHOICES
+from .live import publish_post_changes
+from .models import RecurringPost, ScheduledPost
+from .stats import apply_counter_deltas, status_change
+from .wakeup import notify_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Cron fields: (name, lowest, highest)
+CRON_FIELDS = (('minute', 0, 59), ('hour', 0, 23), ('day of month', 1, 31), ('month', 1, 12), ('day of week', 0, 6))
+# Occurrences materialized per template per batch; a template with more in one
+# window (a cron every minute) catches up over the following batches
+MAX_OCCURRENCES = 500
+
+
+class CronSchedule:
+    """
+    Standard 5-field cron expression: numbers, *, lists, ranges and /steps
+    Day of week 0-6 is Sunday-Saturday (7 is also Sunday). As in cron, a day
+    matches if either day field matches when both are restricted.
+    """
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError("Cron needs 5 fields: minute hour day-of-month month day-of-week")
+        parsed = []
+        for text, (name, low, high) in zip(fields, CRON_FIELDS):
+            if name == 'day of week':
+                high = 7
+            parsed.append(self._parse(text, name, low, high))
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    @staticmethod
+    def _parse(text, name, low, high):
+        values = set()
+        for part in text.split(','):
+            span, _, step = part.partition('/')
+            try:
+                step = int(step) if step else 1
+                if span == '*':
+                    start, end = low, high
+                elif '-' in span:
+                    start, end = (int(bound) for bound in span.split('-', 1))
+                else:
+                    start = int(span)
+                    end = high if step > 1 else start
+            except ValueError:
+                raise ValueError(f"Invalid {name} field '{text}'")
+            if not low <= start <= end <= high or step < 1:
+                raise ValueError(f"{name.capitalize()} must be within {low}-{high}, got '{part}'")
+            values.update(range(start, end + 1, step))
+        return sorted(values)
+
+    def matches_day(self, day):
+        if day.month not in self.months:
+            return False
+        # date.weekday() is Monday=0; cron counts from Sunday
+        in_days = day.day in self.days
+        in_weekdays = (day.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def times(self, day):
+        """Local times of day it fires on `day`, in order"""
+        if not self.matches_day(day):
+            return []
+        return [(hour, minute) for hour in self.hours for minute in self.minutes]
+
+
+def occurrences(template, start, end):
+    """
+    Occurrence times of a template in [start, end), from its starts_at to its ends_at
+    Returns: sorted list of aware datetimes
+    """
+    start = max(start, template.starts_at)
+    if template.ends_at:
+        end = min(end, template.ends_at + timedelta(microseconds=1))
+    if start >= end:
+        return []
+
+    tz = ZoneInfo(template.timezone)
+    first = template.starts_at.astimezone(tz)
+    cron = CronSchedule(template.cron) if template.frequency == 'cron' else None
+    weekdays = set(template.weekdays or [first.weekday()])
+    interval = max(template.interval, 1)
+
+    found = []
+    day = start.astimezone(tz).date()
+    while day <= end.astimezone(tz).date():
+        if cron:
+            times = cron.times(day)
+        elif template.frequency == 'daily':
+            times = [(first.hour, first.minute)] if (day - first.date()).days % interval == 0 else []
+        else:
+            # Weeks counted from the Monday of the start week
+            week = ((day - first.date()).days + first.weekday()) // 7
+            on = day.weekday() in weekdays and week % interval == 0
+            times = [(first.hour, first.minute)] if on else []
+        for hour, minute in times:
+            at = timezone.make_aware(datetime(day.year, day.month, day.day, hour, minute), tz)
+            if start <= at < end:
+                found.append(at)
+        day += timedelta(days=1)
+    return found
+
+
+def describe(template):
+    if template.frequency == 'cron':
+        return f"Cron {template.cron}"
+    local = template.starts_at.astimezone(ZoneInfo(template.timezone))
+    unit = 'day' if template.frequency == 'daily' else 'week'
+    every = f"Every {template.interval} {unit}s" if template.interval > 1 else f"Every {unit}"
+    if template.frequency == 'weekly':
+        names = dict(WEEKDAY_CHOICES)
+        every += ' on ' + ', '.join(names[day] for day in sorted(template.weekdays or [local.weekday()]))
+    return f"{every} at {local:%H:%M} {template.timezone}"
+
+
+def materialize(templates, now=None, window=None):
+    """
+    Create the ScheduledPosts for each template's occurrences up to now + window
+    Past occurrences (a paused template, a stopped scheduler) are skipped, not sent late.
+    Returns: number of posts created
+    """
+    now = now or timezone.now()
+    horizon = now + (window or timedelta(hours=settings.RECURRING_WINDOW_HOURS))
+    posts = []
+    with transaction.atomic():
+        for template in templates:
+            times = occurrences(template, max(template.materialized_until, now), horizon)
+            cursor = horizon
+            if len(times) > MAX_OCCURRENCES:
+                times = times[:MAX_OCCURRENCES]
+                cursor = times[-1] + timedelta(microseconds=1)
+            finished = bool(template.ends_at) and cursor > template.ends_at
+            # Compare-and-swap on the cursor: if another scheduler got here first, leave it
+            claimed = RecurringPost.objects.filter(
+                id=template.id, is_active=True, materialized_until=template.materialized_until,
+            ).update(materialized_until=cursor, is_active=not finished)
+            if not claimed or not template.social_account.is_connected:
+                continue
+            posts.extend(
+                ScheduledPost(
+                    user_id=template.user_id,
+                    social_account=template.social_account,
+                    content=template.content,
+                    image=template.image.name if template.image else None,
+                    image_state='pending' if template.image else '',
+                    scheduled_at=at,
+                    recurrence=template,
+                )
+                for at in times
+            )
+            template.materialized_until = cursor
+
+        if posts:
+            ScheduledPost.objects.bulk_create(posts)
+            apply_counter_deltas(*(
+                status_change(user_id, platform, None, 'scheduled', n)
+                for (user_id, platform), n in Counter(
+                    (post.user_id, post.social_account.platform) for post in posts
+                ).items()
+            ))
+            by_user = defaultdict(list)
+            for post in posts:
+                by_user[post.user_id].append(post.id)
+            for user_id, post_ids in by_user.items():
+                publish_post_changes(user_id, post_ids)
+            notify_scheduler(min(post.scheduled_at for post in posts))
+    return len(posts)
+
+
+def unsent_posts(template, now=None):
+    """
+    A template's created posts still ahead and unsent (scheduled or cancelled)
+    Pausing or deleting the template removes these, so resuming can create them again.
+    """
+    return template.posts.filter(status__in=('scheduled', 'cancelled'), scheduled_at__gte=now or timezone.now())
+
+
+def materialize_recurring_posts(now=None, window=None, batch_size=None, slack=None):
+    """
+    One batch of the background stage: templates whose window needs extending, oldest cursor first
+    Only templates more than `slack` (default: RECURRING_POLL_SECONDS) behind the
+    horizon are due; otherwise every template would be due again a moment after
+    being extended, and the background loop would never get to sleep.
+    Returns: {'templates': n, 'posts': n}
+    """
+    now = now or timezone.now()
+    horizon = now + (window or timedelta(hours=settings.RECURRING_WINDOW_HOURS))
+    slack = timedelta(seconds=settings.RECURRING_POLL_SECONDS) if slack is None else slack
+    templates = list(
+        RecurringPost.objects.filter(is_active=True, materialized_until__lt=horizon - slack)
+        .select_related('social_account')
+        .order_by('materialized_until')[:batch_size or settings.RECURRING_BATCH_SIZE]
+    )
+    created = materialize(templates, now, window) if templates else 0
+    return {'templates': len(templates), 'posts': created}
+
+
+class RecurrenceMaterializer:
+    """Background thread that keeps recurring posts materialized a window ahead (started by run_scheduler)"""
+
+    def __init__(self, poll_seconds=None, batch_size=None):
+        self.poll_seconds = poll_seconds or settings.RECURRING_POLL_SECONDS
+        self.batch_size = batch_size or settings.RECURRING_BATCH_SIZE
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name='recurrence-materializer', daemon=True)
+        self._thread.start()
+        return self
+
+    def run(self):
+        while not self._stop.is_set():
+            close_old_connections()
+            full = False
+            try:
+                results = materialize_recurring_posts(
+                    batch_size=self.batch_size, slack=timedelta(seconds=self.poll_seconds),
+                )
+                # A full batch means more templates may be behind; they're extended
+                # past the slack now, so the next batch picks up different ones
+                full = results['templates'] >= self.batch_size
+                if results['posts']:
+                    logger.info("Materialized %d recurring posts from %d templates", results['posts'], results['templates'])
+            except Exception:
+                logger.exception("Materializing recurring posts failed")
+            if not full:
+                self._stop.wait(self.poll_seconds)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
@@ -0,0 +1,58 @@
+"""Automatic retries: classify a failed attempt and decide when to try again
+
+Each error class has its own backoff policy (SCHEDULER_RETRY_POLICIES).
+Delays grow exponentially with the attempt number and are jittered, so posts
+that failed together don't all come back in the same tick. Posts still
+failing after SCHEDULER_MAX_ATTEMPTS go to the 'dead' (gave up) state.
+"""
+import random
+from datetime import timedelta
+from django.conf import settings
+from .ratelimit import is_rate_limited
+
+# Errors that will fail the same way however often we retry
+PERMANENT_ERRORS = (
+    'not connected',
+    'missing access token',
+    'token rejected',
+    'rejected by',
+    'need an image',
+)
+
+
+def classify_error(message):
+    """Returns: 'rate_limit', 'permanent' or 'transient'"""
+    message = (message or '').lower()
+    if is_rate_limited(message):
+        return 'rate_limit'
+    if any(error in message for error in PERMANENT_ERRORS):
+        return 'permanent'
+    return 'transient'
+
+
+def retry_delay(error_class, attempt):
+    """
+    How long to wait before retrying after the given attempt (1-based)
+    Returns: timedelta, or None if this error class is never retried
+    """
+    policy = settings.SCHEDULER_RETRY_POLICIES.get(error_class)
+    if not policy:
+        return None
+    base, cap = policy
+    delay = min(cap, base * 2 ** (attempt - 1))
+    # "Equal jitter": at least half the backoff, the rest random
+    return timedelta(seconds=delay / 2 + random.uniform(0, delay / 2))
+
+
+def next_step(post, message, attempted_at):
+    """
+    What to do with a post whose attempt just failed
+    Returns: (status, message, next_attempt_at)
+    """
+    attempt = post.attempt_count + 1
+    delay = retry_delay(classify_error(message), attempt)
+    if delay is None:
+        return 'failed', message, None
+    if attempt >= settings.SCHEDULER_MAX_ATTEMPTS:
+        return 'dead', f"Gave up after {attempt} attempts: {message}", None
+    return 'scheduled', message, attempted_at + delay
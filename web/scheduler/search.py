@@ -0,0 +1,193 @@
+"""Full-text search over a user's posts
+
+PostgreSQL: a trigger-maintained tsvector column with a GIN index.
+SQLite: a contentless FTS5 table kept in sync by triggers.
+Migration 0006 creates them; on SQLite, install_search_index() restores the
+triggers after later migrations.
+Both index the post content plus its platform name, match each word as a
+prefix (search-as-you-type) and rank content hits above platform hits.
+Other databases, or SQLite builds without FTS5, fall back to icontains.
+Archived posts (see scheduler.archive) aren't searched; the results say so.
+"""
+import logging
+import re
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError, connection, connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Q
+from .models import ScheduledPost
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 20
+FTS_TABLE = 'scheduler_post_fts'
+
+# Per-database: does the full-text index exist?
+_available = {}
+
+_SQLITE_PLATFORM = "(SELECT platform FROM scheduler_socialaccount WHERE id = {row}.social_account_id)"
+_SQLITE_INSERT = (
+    f"INSERT INTO {FTS_TABLE}(rowid, owner, platform, content) "
+    f"VALUES (new.id, 'u' || new.user_id, {_SQLITE_PLATFORM.format(row='new')}, new.content);"
+)
+_SQLITE_DELETE = (
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, owner, platform, content) "
+    f"VALUES ('delete', old.id, 'u' || old.user_id, {_SQLITE_PLATFORM.format(row='old')}, old.content);"
+)
+_SQLITE_TRIGGERS = {
+    'scheduler_post_fts_insert': f"AFTER INSERT ON scheduler_scheduledpost BEGIN {_SQLITE_INSERT} END",
+    'scheduler_post_fts_delete': f"AFTER DELETE ON scheduler_scheduledpost BEGIN {_SQLITE_DELETE} END",
+    'scheduler_post_fts_update': (
+        "AFTER UPDATE OF content, social_account_id, user_id ON scheduler_scheduledpost "
+        f"BEGIN {_SQLITE_DELETE} {_SQLITE_INSERT} END"
+    ),
+}
+
+
+def install_search_index(conn=connection):
+    """
+    SQLite: re-create the FTS table and its sync triggers if any are missing
+    Migration 0006 creates the index. Django rebuilds a table to alter it,
+    which drops its triggers, so this runs after every migrate and refills the
+    index whenever a trigger was missing.
+    """
+    if conn.vendor != 'sqlite':
+        return
+    with conn.cursor() as cursor:
+        try:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                "owner, platform, content, content='', tokenize='unicode61 remove_diacritics 2')"
+            )
+        except DatabaseError as e:
+            logger.warning("SQLite FTS5 unavailable, search falls back to LIKE: %s", e)
+            return
+        _available.pop(conn.alias, None)
+
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN (%s)"
+            % ', '.join(['%s'] * len(_SQLITE_TRIGGERS)),
+            list(_SQLITE_TRIGGERS),
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if existing == set(_SQLITE_TRIGGERS):
+            return
+
+        for name, body in _SQLITE_TRIGGERS.items():
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"CREATE TRIGGER {name} {body}")
+        # Rows written while triggers were missing: rebuild from scratch
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, owner, platform, content) "
+            "SELECT p.id, 'u' || p.user_id, a.platform, p.content "
+            "FROM scheduler_scheduledpost p JOIN scheduler_socialaccount a ON a.id = p.social_account_id"
+        )
+
+
+def ensure_search_index(sender, using='default', **kwargs):
+    """post_migrate handler: restore SQLite triggers dropped by a table rebuild"""
+    conn = connections[using]
+    if conn.vendor != 'sqlite':
+        return
+    applied = MigrationRecorder(conn).applied_migrations()
+    if ('scheduler', '0006_post_search_index') in applied:
+        install_search_index(conn)
+
+
+def search_available(conn=connection):
+    """Whether the full-text index exists on this database"""
+    if conn.alias not in _available:
+        with conn.cursor() as cursor:
+            if conn.vendor == 'postgresql':
+                columns = conn.introspection.get_table_description(cursor, 'scheduler_scheduledpost')
+                _available[conn.alias] = any(column.name == 'search_vector' for column in columns)
+            elif conn.vendor == 'sqlite':
+                _available[conn.alias] = FTS_TABLE in conn.introspection.table_names(cursor)
+            else:
+                _available[conn.alias] = False
+    return _available[conn.alias]
+
+
+def _terms(query):
+    """Words in the query, lower-cased, punctuation dropped"""
+    return re.findall(r'\w+', query.lower())
+
+
+def _ranked_ids(user_id, terms, limit, offset):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            tsquery = ' & '.join(f'{term}:*' for term in terms)
+            cursor.execute(
+                "SELECT id FROM scheduler_scheduledpost "
+                "WHERE user_id = %s AND search_vector @@ to_tsquery('simple', %s) "
+                "ORDER BY ts_rank(search_vector, to_tsquery('simple', %s)) DESC, scheduled_at DESC, id DESC "
+                "LIMIT %s OFFSET %s",
+                [user_id, tsquery, tsquery, limit, offset],
+            )
+        else:
+            words = ' AND '.join(f'"{term}"*' for term in terms)
+            match = f'owner:u{int(user_id)} AND {{platform content}}: ({words})'
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f"ORDER BY bm25({FTS_TABLE}, 0.0, 0.3, 1.0), rowid DESC LIMIT %s OFFSET %s",
+                [match, limit, offset],
+            )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_posts(user, query, offset=0, page_size=PAGE_SIZE):
+    """
+    One page of a user's posts matching query, best match first
+    Returns: (posts, next_offset) - next_offset is None on the last page
+    """
+    terms = _terms(query)
+    if not terms:
+        return [], None
+
+    posts = ScheduledPost.objects.filter(user=user).select_related('social_account')
+
+    if search_available():
+        # One extra id tells us whether there is another page
+        ids = _ranked_ids(user.id, terms, page_size + 1, offset)
+        page = _in_order(ids[:page_size], posts.in_bulk(ids[:page_size]))
+        has_next = len(ids) > page_size
+    else:
+        page = list(_fallback_matches(posts, query)[offset:offset + page_size + 1])
+        has_next = len(page) > page_size
+        page = page[:page_size]
+
+    return page, (offset + page_size if has_next else None)
+
+
+async def asearch_posts(user, query, offset=0, page_size=PAGE_SIZE):
+    """search_posts() for async views"""
+    terms = _terms(query)
+    if not terms:
+        return [], None
+
+    posts = ScheduledPost.objects.filter(user=user).select_related('social_account')
+
+    if await sync_to_async(search_available)():
+        # The ranking query is raw SQL, which has no async cursor
+        ids = await sync_to_async(_ranked_ids)(user.id, terms, page_size + 1, offset)
+        page = _in_order(ids[:page_size], await posts.ain_bulk(ids[:page_size]))
+        has_next = len(ids) > page_size
+    else:
+        matches = _fallback_matches(posts, query)[offset:offset + page_size + 1]
+        page = [post async for post in matches.aiterator()]
+        has_next = len(page) > page_size
+        page = page[:page_size]
+
+    return page, (offset + page_size if has_next else None)
+
+
+def _in_order(ids, by_id):
+    return [by_id[post_id] for post_id in ids if post_id in by_id]
+
+
+def _fallback_matches(posts, query):
+    query = query.strip()
+    return posts.filter(
+        Q(content__icontains=query) | Q(social_account__platform__icontains=query)
+    ).order_by('-scheduled_at', '-id')
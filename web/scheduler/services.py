@@ -1,68 +1,341 @@
-"""Mock Posting Service - Simulates social media posting"""
-import random
+"""Posting Service - sends due posts through the platform adapters"""
+import asyncio
+import logging
+import os
+import queue
+import socket
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, DateTimeField, F, IntegerField, Q, Value, When
 from django.utils import timezone
 from datetime import timedelta
-from .models import ScheduledPost
+from .attempts import number_attempts, record_attempt
+from .live import publish_posts
+from .instrumentation import DISPATCH_IN_FLIGHT, DISPATCH_SLOTS, record_call, record_lateness
+from .models import PostAttempt, ScheduledPost
+from .platforms import get_adapter
+from .platforms.client import submit
+from .ratelimit import drain_bucket, is_rate_limited, refill_interval, take_tokens
+from .retries import next_step
+from .stats import apply_counter_deltas, status_change
 
+logger = logging.getLogger(__name__)
 
-class PostingService:
-    """Service to handle mock posting to social platforms"""
+
+class StatusWriteBuffer:
+    """
+    Buffer dispatch results and write them back in batches
+    Each flush is one transaction: lock the rows we still lease, then one UPDATE
+    per (status, message) group instead of one UPDATE round-trip per post, and
+    one INSERT for the batch's PostAttempts. It also renews the lease on the
+    claimed posts that have no result yet, so a batch that takes longer than
+    SCHEDULER_LEASE_SECONDS to send isn't claimed and sent again elsewhere.
+    """
     
-    @staticmethod
-    def post_to_platform(scheduled_post: ScheduledPost) -> tuple[bool, str]:
+    def __init__(self, worker_id, flush_size=None, flush_interval=None, claimed=(), lease_seconds=None):
+        self.worker_id = worker_id
+        self.flush_size = flush_size or settings.SCHEDULER_FLUSH_SIZE
+        self.flush_interval = settings.SCHEDULER_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.lease_seconds = lease_seconds or settings.SCHEDULER_LEASE_SECONDS
+        self._in_flight = {post.id for post in claimed}
+        self._pending = []
+        self._attempts = []
+        self._last_flush = time.monotonic()
+    
+    def add(self, post, status, message, attempted_at, next_attempt_at=None, attempt=None):
         """
-        Attempt to post to social platform
-        Returns: (success: bool, message: str)
+        Queue one result; flushes once the buffer is full or old enough
+        attempted_at is None for posts deferred without being sent, which
+        doesn't count as an attempt. attempt: the PostAttempt to log for a send.
         """
-        try:
-            # Check if account is connected
-            if not scheduled_post.social_account.is_connected:
-                return False, "Social account is not connected"
+        self._pending.append((post, status, message, attempted_at, next_attempt_at))
+        self._in_flight.discard(post.id)
+        if attempt:
+            self._attempts.append(attempt)
+        if (len(self._pending) >= self.flush_size or
+                time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+    
+    def flush(self):
+        """
+        Write all buffered results
+        Returns: number of posts updated
+        """
+        pending, self._pending = self._pending, []
+        attempts, self._attempts = self._attempts, []
+        self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+        
+        with transaction.atomic():
+            # Logged even when the lease was lost: the platform call still happened
+            PostAttempt.objects.bulk_create(number_attempts(attempts))
+            # Only rows this worker still holds the lease on
+            held_ids = set(
+                ScheduledPost.objects.select_for_update().filter(
+                    id__in=[result[0].id for result in pending],
+                    status='processing',
+                    lease_owner=self.worker_id,
+                ).values_list('id', flat=True)
+            )
+            held = [result for result in pending if result[0].id in held_ids]
             
-            # Check if token exists
-            if not scheduled_post.social_account.access_token:
-                return False, "Missing access token"
+            groups = defaultdict(list)
+            for post, status, message, attempted_at, next_attempt_at in held:
+                groups[(status, message)].append((post.id, attempted_at, next_attempt_at))
             
-            # Simulate API call - 80% success rate
-            if random.random() < 0.8:
-                return True, f"✅ Posted to {scheduled_post.social_account.get_platform_display()}"
-            else:
-                return False, "API rate limit exceeded. Retry in 1 hour."
+            for (status, message), rows in groups.items():
+                ScheduledPost.objects.filter(id__in=[post_id for post_id, _, _ in rows]).update(
+                    status=status,
+                    result_message=message,
+                    last_attempt_at=Case(
+                        *[When(id=post_id, then=Value(attempted_at))
+                          for post_id, attempted_at, _ in rows if attempted_at],
+                        default=F('last_attempt_at'),
+                        output_field=DateTimeField(),
+                    ),
+                    next_attempt_at=Case(
+                        *[When(id=post_id, then=Value(next_attempt_at))
+                          for post_id, _, next_attempt_at in rows if next_attempt_at],
+                        default=None,
+                        output_field=DateTimeField(),
+                    ),
+                    attempt_count=Case(
+                        When(id__in=[post_id for post_id, attempted_at, _ in rows if attempted_at],
+                             then=F('attempt_count') + 1),
+                        default=F('attempt_count'),
+                        output_field=IntegerField(),
+                    ),
+                    lease_owner='',
+                    lease_expires_at=None,
+                )
+            
+            apply_counter_deltas(*(
+                status_change(post.user_id, post.social_account.platform, 'processing', status)
+                for post, status, _, _, _ in held
+            ))
+            publish_posts(post for post, _, _, _, _ in held)
+            
+            if self._in_flight:
+                ScheduledPost.objects.filter(
+                    id__in=self._in_flight,
+                    status='processing',
+                    lease_owner=self.worker_id,
+                ).update(lease_expires_at=timezone.now() + timedelta(seconds=self.lease_seconds))
         
+        updated = len(held)
+        if updated < len(pending):
+            logger.warning("%d results dropped: lease lost before they were saved", len(pending) - updated)
+        return updated
+
+
+class PostingService:
+    """Service to handle posting to social platforms"""
+    
+    @staticmethod
+    async def publish(scheduled_post: ScheduledPost) -> tuple[bool, str]:
+        """Post through the platform's adapter; never raises"""
+        try:
+            return await get_adapter(scheduled_post.social_account.platform).publish(scheduled_post)
         except Exception as e:
             return False, f"Error: {str(e)}"
     
     @staticmethod
-    def execute_scheduled_posts():
+    def dispatch_posts(posts, max_workers=None, platform_limits=None):
         """
-        Main scheduler task - runs every 30 seconds
-        Check for pending posts and attempt to post them
+        Send posts concurrently on the shared platform HTTP loop
+        At most max_workers calls run at once, and never more than
+        platform_limits[platform] per platform, so a slow platform can't take
+        every slot.
+        Yields: (post, success, message, started_at, seconds) as each call finishes
         """
-        # Get all scheduled posts that are due
-        pending_posts = ScheduledPost.objects.filter(
-            status='scheduled',
-            scheduled_at__lte=timezone.now()
-        ).select_related('user', 'social_account')
+        posts = list(posts)
+        max_workers = max_workers or settings.SCHEDULER_DISPATCH_WORKERS
+        platform_limits = platform_limits or settings.SCHEDULER_PLATFORM_CONCURRENCY
+        results = queue.Queue()
+        DISPATCH_SLOTS.set(max_workers)
+
+        async def send_all():
+            slots = asyncio.Semaphore(max_workers)
+            platform_slots = {
+                platform: asyncio.Semaphore(platform_limits.get(platform, max_workers))
+                for platform in {post.social_account.platform for post in posts}
+            }
+
+            async def send(post):
+                success, message = False, "Error: dispatch interrupted"
+                started_at, started = timezone.now(), time.perf_counter()
+                try:
+                    # Wait for the platform's slot first so a busy platform doesn't hold shared ones
+                    async with platform_slots[post.social_account.platform], slots:
+                        DISPATCH_IN_FLIGHT.inc()
+                        try:
+                            started_at, started = timezone.now(), time.perf_counter()
+                            success, message = await PostingService.publish(post)
+                        finally:
+                            DISPATCH_IN_FLIGHT.dec()
+                except Exception as e:
+                    message = f"Error: {e}"
+                finally:
+                    # The scheduler thread waits for exactly one result per post
+                    seconds = time.perf_counter() - started
+                    results.put((post, success, message, started_at, seconds))
+                record_call(post.social_account.platform, success, seconds)
+
+            for error in await asyncio.gather(*(send(post) for post in posts), return_exceptions=True):
+                if error is not None:
+                    logger.error("Dispatch bookkeeping failed: %r", error)
+
+        # Results are handed back to this thread, which keeps all the DB writes
+        coroutine = send_all()
+        try:
+            done = submit(coroutine)
+        except Exception as e:
+            # No loop to send on: each post still gets its one (failed) result
+            coroutine.close()
+            logger.error("Dispatch could not start: %r", e)
+            for post in posts:
+                yield post, False, f"Error: {e}", timezone.now(), 0.0
+            return
+        for _ in posts:
+            yield results.get()
+        done.result()
+
+    @staticmethod
+    def default_worker_id():
+        """Lease owner name for this scheduler process"""
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    @staticmethod
+    def due_posts(now):
+        """
+        Posts ready to be claimed at `now`
+        Scheduled, past scheduled_at and not deferred past now, or in flight
+        with an expired lease (the worker holding it died).
+        """
+        return ScheduledPost.objects.filter(
+            Q(status='scheduled', scheduled_at__lte=now) &
+            (Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now)) |
+            Q(status='processing', lease_expires_at__lte=now)
+        ).order_by('scheduled_at')
+
+    @staticmethod
+    def apply_rate_limits(posts):
+        """
+        Take a rate-limit token for each post, per social account
+        Returns: (ready posts, [(deferred post, when it can go)])
+        """
+        by_account = defaultdict(list)
+        for post in posts:
+            by_account[post.social_account_id].append(post)
+
+        ready, deferred = [], []
+        for account_posts in by_account.values():
+            platform = account_posts[0].social_account.platform
+            granted, ready_times = take_tokens(account_posts[0].social_account_id, platform, len(account_posts))
+            ready.extend(account_posts[:granted])
+            deferred.extend(zip(account_posts[granted:], ready_times))
+        return ready, deferred
+
+    @staticmethod
+    def claim_due_posts(worker_id, limit=None, lease_seconds=None):
+        """
+        Lease a batch of due posts to one scheduler worker
+        Returns: list of claimed ScheduledPost
+        """
+        now = timezone.now()
+        limit = limit or settings.SCHEDULER_CLAIM_BATCH_SIZE
+        lease_expires_at = now + timedelta(seconds=lease_seconds or settings.SCHEDULER_LEASE_SECONDS)
+
+        due_posts = PostingService.due_posts(now)
+        lease = {
+            'status': 'processing',
+            'lease_owner': worker_id,
+            'lease_expires_at': lease_expires_at,
+        }
+
+        if connection.features.has_select_for_update_skip_locked:
+            # PostgreSQL: rows locked by another worker's claim are skipped, not waited on
+            with transaction.atomic():
+                ids = list(
+                    due_posts.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit]
+                )
+                ScheduledPost.objects.filter(id__in=ids).update(**lease)
+        else:
+            # SQLite: compare-and-swap - the UPDATE re-checks the due condition,
+            # so rows another worker claimed in between are left alone
+            ids = list(due_posts.values_list('id', flat=True)[:limit])
+            due_posts.filter(id__in=ids).update(**lease)
+
+        return list(
+            ScheduledPost.objects.filter(
+                id__in=ids,
+                lease_owner=worker_id,
+                lease_expires_at=lease_expires_at,
+            ).select_related('user', 'social_account')
+        )
+
+    @staticmethod
+    def execute_scheduled_posts(worker_id=None, max_workers=None):
+        """
+        Main scheduler task - run whenever a post comes due
+        Claim due posts in batches and dispatch them concurrently.
+        Safe to run from several scheduler processes at once.
+        """
+        worker_id = worker_id or PostingService.default_worker_id()
         
         results = {
             'processed': 0,
             'success': 0,
             'failed': 0,
+            'retrying': 0,
+            'dead': 0,
+            'deferred': 0,
         }
         
-        for post in pending_posts:
-            success, message = PostingService.post_to_platform(post)
+        while True:
+            claimed_posts = PostingService.claim_due_posts(worker_id)
+            if not claimed_posts:
+                break
+            
+            writer = StatusWriteBuffer(worker_id, claimed=claimed_posts)
             
-            # Update post status
-            post.status = 'success' if success else 'failed'
-            post.result_message = message
-            post.last_attempt_at = timezone.now()
-            post.save(update_fields=['status', 'result_message', 'last_attempt_at'])
+            # Over-budget posts go back in the queue instead of being sent to fail
+            ready_posts, deferred_posts = PostingService.apply_rate_limits(claimed_posts)
+            for post, next_attempt_at in deferred_posts:
+                platform = post.social_account.get_platform_display()
+                writer.add(post, 'scheduled', f"Waiting for {platform} rate limit", None, next_attempt_at)
+                results['deferred'] += 1
             
-            results['processed'] += 1
-            if success:
-                results['success'] += 1
-            else:
-                results['failed'] += 1
+            # Platform calls run on the shared event loop; DB writes stay on this thread
+            throttled = {}
+            for post, success, message, started_at, seconds in PostingService.dispatch_posts(ready_posts, max_workers):
+                attempted_at = timezone.now()
+                record_lateness(post, attempted_at)
+                attempt = record_attempt(post, success, message, started_at, seconds)
+                results['processed'] += 1
+                if success:
+                    writer.add(post, 'success', message, attempted_at, attempt=attempt)
+                    results['success'] += 1
+                    continue
+                
+                status, message, next_attempt_at = next_step(post, message, attempted_at)
+                if is_rate_limited(message):
+                    # The platform says we're over its limit: empty the bucket so
+                    # this account's next posts wait for a refill too
+                    account_id = post.social_account_id
+                    if account_id not in throttled:
+                        throttled[account_id] = drain_bucket(account_id, post.social_account.platform, attempted_at)
+                    else:
+                        # One refill apart, like posts deferred before sending
+                        throttled[account_id] += refill_interval(post.social_account.platform)
+                    if next_attempt_at:
+                        next_attempt_at = max(next_attempt_at, throttled[account_id])
+                
+                writer.add(post, status, message, attempted_at, next_attempt_at, attempt)
+                results['retrying' if status == 'scheduled' else status] += 1
+            writer.flush()
         
         return results
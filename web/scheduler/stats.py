@@ -0,0 +1,157 @@
+"""Dashboard statistics - materialized status counters behind a per-user cache"""
+import math
+from collections import Counter
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, CharField, Count, F, Min, Sum, Value, When
+from django.utils import timezone
+from .models import PostStatusCounter, ScheduledPost
+
+
+def _cache_key(user_id):
+    return f'scheduler:stats:{user_id}'
+
+
+def counter_status(status):
+    """In-flight posts are counted as scheduled"""
+    return 'scheduled' if status == 'processing' else status
+
+
+def status_change(user_id, platform, old_status, new_status, n=1):
+    """
+    Counter deltas for n posts moving from old_status to new_status
+    Use None for old_status on create and for new_status on delete.
+    """
+    deltas = Counter()
+    if old_status:
+        deltas[(user_id, platform, counter_status(old_status))] -= n
+    if new_status:
+        deltas[(user_id, platform, counter_status(new_status))] += n
+    return deltas
+
+
+def apply_counter_deltas(*changes):
+    """
+    Add status_change() deltas to PostStatusCounter
+    Call inside the transaction that changes the posts themselves.
+    """
+    deltas = Counter()
+    for change in changes:
+        deltas.update(change)
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        # Make sure every row exists, then increment in place
+        PostStatusCounter.objects.bulk_create(
+            [PostStatusCounter(user_id=u, platform=p, status=s) for u, p, s in deltas],
+            ignore_conflicts=True,
+        )
+        for (user_id, platform, status), delta in deltas.items():
+            PostStatusCounter.objects.filter(
+                user_id=user_id, platform=platform, status=status
+            ).update(count=F('count') + delta)
+
+    invalidate_user_stats(*(user_id for user_id, _, _ in deltas))
+
+
+def count_posts_by_status(posts=None):
+    """
+    Recount posts straight from ScheduledPost (or a queryset of ScheduledPost or ArchivedPost)
+    Returns: {(user_id, platform, status): count}
+    """
+    posts = ScheduledPost.objects.all() if posts is None else posts
+    rows = posts.annotate(
+        counter_status=Case(
+            When(status='processing', then=Value('scheduled')),
+            default=F('status'),
+            output_field=CharField(),
+        )
+    ).values('user_id', 'social_account__platform', 'counter_status').annotate(
+        total=Count('id')
+    ).order_by()
+    return {
+        (row['user_id'], row['social_account__platform'], row['counter_status']): row['total']
+        for row in rows
+    }
+
+
+def compute_user_stats(user_id, now=None):
+    """
+    Dashboard counters for one user
+    Totals come from the counters table, so the cost doesn't grow with history;
+    'upcoming' is a range scan over the user's future scheduled posts only.
+    """
+    now = now or timezone.now()
+    totals = dict(_totals_query(user_id))
+    upcoming = _upcoming_query(user_id, now).aggregate(upcoming=Count('id'), next_due=Min('scheduled_at'))
+    return _stats(totals, upcoming)
+
+
+async def acompute_user_stats(user_id, now=None):
+    """compute_user_stats() for async views"""
+    now = now or timezone.now()
+    # Not aiterator(): it runs values_list() queries on the event loop, which Django refuses
+    totals = {status: total async for status, total in _totals_query(user_id)}
+    upcoming = await _upcoming_query(user_id, now).aaggregate(upcoming=Count('id'), next_due=Min('scheduled_at'))
+    return _stats(totals, upcoming)
+
+
+def _totals_query(user_id):
+    return (PostStatusCounter.objects.filter(user_id=user_id)
+            .values('status').annotate(total=Sum('count')).values_list('status', 'total'))
+
+
+def _upcoming_query(user_id, now):
+    return ScheduledPost.objects.filter(user_id=user_id, status='scheduled', scheduled_at__gt=now)
+
+
+def _stats(totals, upcoming):
+    return {
+        'total_scheduled': totals.get('scheduled', 0),
+        'total_success': totals.get('success', 0),
+        # Posts the scheduler gave up on count as failed
+        'total_failed': totals.get('failed', 0) + totals.get('dead', 0),
+        'upcoming': upcoming['upcoming'],
+        'next_due': upcoming['next_due'],
+    }
+
+
+def get_user_stats(user_id):
+    """
+    Cached dashboard stats for a user
+    Entries expire when the next upcoming post comes due, since that changes
+    'upcoming' without any status change.
+    """
+    stats = cache.get(_cache_key(user_id))
+    if stats is None:
+        now = timezone.now()
+        stats = compute_user_stats(user_id, now)
+        cache.set(_cache_key(user_id), stats, _cache_timeout(stats, now))
+    return stats
+
+
+async def aget_user_stats(user_id):
+    """get_user_stats() for async views"""
+    stats = await cache.aget(_cache_key(user_id))
+    if stats is None:
+        now = timezone.now()
+        stats = await acompute_user_stats(user_id, now)
+        await cache.aset(_cache_key(user_id), stats, _cache_timeout(stats, now))
+    return stats
+
+
+def _cache_timeout(stats, now):
+    timeout = settings.STATS_CACHE_TTL
+    if stats['next_due']:
+        timeout = min(timeout, math.ceil((stats['next_due'] - now).total_seconds()))
+    return max(timeout, 1)
+
+
+def invalidate_user_stats(*user_ids):
+    """Drop cached stats once the current transaction commits"""
+    keys = [_cache_key(user_id) for user_id in set(user_ids)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -1,3 +1,867 @@
-from django.test import TestCase
+import asyncio
+import httpx
+import io
+import json
+import random
+import re
+import socket
+import tempfile
+import time
+from asgiref.sync import sync_to_async
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
+from zoneinfo import ZoneInfo
+from PIL import Image
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from .archive import archive_old_posts
+from .attempts import post_timeline
+from .bulk import apply_bulk_action, guess_format, import_posts
+from .dispatcher import DueTimeScheduler
+from .images import VARIANTS, process_pending_images, render_variants
+from .instrumentation import ameasure
+from .live import LiveBroker, LiveHub, publish_post_changes
+from .models import ArchivedPost, PostAttempt, PostStatusCounter, RecurringPost, ScheduledPost, SocialAccount
+from .platforms import client, get_adapter
+from .ratelimit import _get_bucket, take_tokens
+from .recurrence import materialize_recurring_posts
+from .retries import classify_error, next_step, retry_delay
+from .search import asearch_posts, ensure_search_index, search_available, search_posts
+from .services import PostingService, StatusWriteBuffer
+from .stats import apply_counter_deltas, get_user_stats, status_change
+from .wakeup import WakeupListener
 
-# Create your tests here.
+
+# No rate limit gets in the way of a test
+NO_LIMITS = {'twitter': (10 ** 6, 10 ** 9), 'default': (10 ** 6, 10 ** 9)}
+
+
+def published(outcomes=None):
+    """Patch the platform call: outcomes maps content to (success, message), default success"""
+    async def publish(post):
+        return (outcomes or {}).get(post.content, (True, 'Posted'))
+    return mock.patch.object(PostingService, 'publish', side_effect=publish)
+
+
+class SchedulerTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='correct-horse-battery')
+        self.account = SocialAccount.objects.create(
+            user=self.user, platform='twitter', username='alice', access_token='token',
+        )
+        self.now = timezone.now()
+        # Cached stats are only dropped on commit, which TestCase never makes
+        cache.clear()
+
+    def make_posts(self, count, status='scheduled', scheduled_at=None, **fields):
+        """Create posts and count them, as the views do"""
+        posts = ScheduledPost.objects.bulk_create([
+            ScheduledPost(
+                user=self.user, social_account=self.account, content=f'post {i}', status=status,
+                scheduled_at=scheduled_at or self.now - timedelta(seconds=1), **fields,
+            )
+            for i in range(count)
+        ])
+        apply_counter_deltas(status_change(self.user.id, 'twitter', None, status, count))
+        return posts
+
+    def assertCountersMatch(self):
+        # Raises CommandError on any drift
+        call_command('rebuild_counters', '--check', stdout=StringIO())
+
+
+@override_settings(SCHEDULER_RATE_LIMITS=NO_LIMITS)
+class LeaseTests(SchedulerTestCase):
+    def test_claim_leases_due_posts_to_one_worker(self):
+        self.make_posts(3)
+        self.make_posts(1, scheduled_at=self.now + timedelta(hours=1))
+        self.assertEqual(len(PostingService.claim_due_posts('w1')), 3)
+        self.assertEqual(PostingService.claim_due_posts('w2'), [])
+
+    def test_expired_lease_is_claimed_again(self):
+        self.make_posts(1)
+        PostingService.claim_due_posts('w1')
+        ScheduledPost.objects.update(lease_expires_at=self.now - timedelta(seconds=1))
+        self.assertEqual(len(PostingService.claim_due_posts('w2')), 1)
+        self.assertEqual(ScheduledPost.objects.get().lease_owner, 'w2')
+
+    def test_lost_lease_drops_results(self):
+        self.make_posts(1)
+        [post] = PostingService.claim_due_posts('w1')
+        # w1 stalls past its lease and w2 takes the post over
+        ScheduledPost.objects.update(lease_expires_at=self.now - timedelta(seconds=1))
+        PostingService.claim_due_posts('w2')
+
+        writer = StatusWriteBuffer('w1', claimed=[post])
+        writer.add(post, 'success', 'Posted', self.now)
+        with self.assertLogs('scheduler.services', 'WARNING'):
+            self.assertEqual(writer.flush(), 0)
+        post.refresh_from_db()
+        self.assertEqual((post.status, post.lease_owner), ('processing', 'w2'))
+
+    def test_flush_renews_leases_of_posts_still_in_flight(self):
+        self.make_posts(3)
+        claimed = PostingService.claim_due_posts('w1', lease_seconds=5)
+        writer = StatusWriteBuffer('w1', flush_size=10, flush_interval=60, claimed=claimed, lease_seconds=600)
+        writer.add(claimed[0], 'success', 'Posted', self.now)
+        writer.flush()
+        leases = ScheduledPost.objects.filter(status='processing').values_list('lease_expires_at', flat=True)
+        self.assertEqual(len(leases), 2)
+        for expires_at in leases:
+            self.assertGreater(expires_at, self.now + timedelta(seconds=500))
+
+
+@override_settings(SCHEDULER_RATE_LIMITS=NO_LIMITS)
+class WriteBackTests(SchedulerTestCase):
+    def test_flush_writes_results_and_releases_leases(self):
+        self.make_posts(2)
+        claimed = PostingService.claim_due_posts('w1')
+        writer = StatusWriteBuffer('w1', flush_size=10, flush_interval=60, claimed=claimed)
+        for post in claimed:
+            writer.add(post, 'success', 'Posted', self.now)
+        self.assertEqual(writer.flush(), 2)
+        self.assertEqual(
+            list(ScheduledPost.objects.values_list('status', 'lease_owner', 'attempt_count').distinct()),
+            [('success', '', 1)],
+        )
+        self.assertCountersMatch()
+
+    def test_one_update_per_outcome_not_per_post(self):
+        self.make_posts(6)
+        claimed = PostingService.claim_due_posts('w1')
+        writer = StatusWriteBuffer('w1', flush_size=100, flush_interval=60, claimed=claimed)
+        for post in claimed:
+            writer.add(post, 'success', 'Posted', self.now)
+        with CaptureQueriesContext(connection) as queries:
+            writer.flush()
+        updates = [query for query in queries if query['sql'].startswith('UPDATE "scheduler_scheduledpost"')]
+        self.assertEqual(len(updates), 1)
+
+    def test_execute_scheduled_posts(self):
+        self.make_posts(3)
+        with published({'post 1': (False, 'Error: Token rejected')}):
+            results = PostingService.execute_scheduled_posts('w1')
+        self.assertEqual((results['success'], results['failed']), (2, 1))
+        self.assertEqual(PostAttempt.objects.count(), 3)
+        self.assertCountersMatch()
+
+
+@override_settings(SCHEDULER_RATE_LIMITS=NO_LIMITS)
+class DispatcherTests(SchedulerTestCase):
+    def test_failed_tick_is_retried(self):
+        self.make_posts(1)
+        scheduler = DueTimeScheduler('w1', max_sleep=1)
+        execute = PostingService.execute_scheduled_posts
+        calls = []
+
+        def tick(worker_id):
+            calls.append(worker_id)
+            if len(calls) == 1:
+                raise DatabaseError('connection lost')
+            scheduler.stop()
+            return execute(worker_id)
+
+        with published(), mock.patch.object(PostingService, 'execute_scheduled_posts', side_effect=tick), \
+                self.assertLogs('scheduler.dispatcher', 'ERROR'):
+            scheduler.run()
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(ScheduledPost.objects.get().status, 'success')
+
+    def test_second_listener_on_a_host_sleeps_on_a_timer(self):
+        taken = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        taken.bind(('127.0.0.1', 0))
+        port = taken.getsockname()[1]
+        try:
+            with override_settings(SCHEDULER_WAKEUP_PORT=port), self.assertLogs('scheduler.wakeup', 'WARNING'):
+                listener = WakeupListener()
+            listener.interrupt()
+            self.assertEqual(listener.wait(60), [])
+            listener.close()
+        finally:
+            taken.close()
+
+
+@override_settings(SCHEDULER_RATE_LIMITS=NO_LIMITS)
+class CounterTests(SchedulerTestCase):
+    def test_counters_follow_dispatch_bulk_actions_and_archiving(self):
+        self.make_posts(6)
+        self.make_posts(3, scheduled_at=self.now + timedelta(days=1))
+        with published({'post 0': (False, 'Error: Token rejected')}):
+            PostingService.execute_scheduled_posts('w1')
+        self.assertCountersMatch()
+
+        upcoming = ScheduledPost.objects.filter(status='scheduled')
+        self.assertEqual(apply_bulk_action(upcoming, 'cancel'), 3)
+        self.assertEqual(apply_bulk_action(ScheduledPost.objects.all(), 'retry'), 1)
+        self.assertCountersMatch()
+
+        ScheduledPost.objects.filter(status='success').update(scheduled_at=self.now - timedelta(days=400))
+        self.assertEqual(archive_old_posts(), 5)
+        self.assertEqual(apply_bulk_action(ScheduledPost.objects.filter(status='cancelled'), 'delete'), 3)
+        self.assertCountersMatch()
+
+    def test_rebuild_counters_fixes_drift(self):
+        self.make_posts(4)
+        PostStatusCounter.objects.update(count=1)
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertCountersMatch()
+        self.assertEqual(get_user_stats(self.user.id)['total_scheduled'], 4)
+
+
+class SearchTests(SchedulerTestCase):
+    def setUp(self):
+        super().setUp()
+        if not search_available():
+            self.skipTest('SQLite build without FTS5')
+
+    def post(self, content, user=None, account=None):
+        return ScheduledPost.objects.create(
+            user=user or self.user, social_account=account or self.account,
+            content=content, scheduled_at=self.now,
+        )
+
+    def found(self, query, user=None):
+        posts, _ = search_posts(user or self.user, query)
+        return [post.content for post in posts]
+
+    def test_words_match_as_prefixes(self):
+        self.post('Python tips for beginners')
+        self.post('Pythonic code review')
+        self.post('Gardening in spring')
+        self.assertEqual(sorted(self.found('pyth')), ['Python tips for beginners', 'Pythonic code review'])
+        self.assertEqual(self.found('pyth begin'), ['Python tips for beginners'])
+
+    def test_content_hits_rank_above_platform_hits(self):
+        self.post('Morning update')
+        self.post('Our twitter thread, part two')
+        # Every post is on twitter; the one that says so comes first
+        self.assertEqual(self.found('twitter'), ['Our twitter thread, part two', 'Morning update'])
+
+    def test_other_users_posts_are_not_found(self):
+        bob = User.objects.create_user('bob', password='correct-horse-battery')
+        bobs_account = SocialAccount.objects.create(user=bob, platform='twitter', username='bob', access_token='token')
+        self.post('launch day', user=bob, account=bobs_account)
+        self.assertEqual(self.found('launch'), [])
+        self.assertEqual(self.found('launch', user=bob), ['launch day'])
+
+    def test_index_follows_updates_and_deletes(self):
+        post = self.post('first draft')
+        ScheduledPost.objects.filter(id=post.id).update(content='final copy')
+        self.assertEqual(self.found('draft'), [])
+        self.assertEqual(self.found('final'), ['final copy'])
+        post.delete()
+        self.assertEqual(self.found('final'), [])
+
+    def test_triggers_come_back_after_a_table_rebuild(self):
+        with connection.cursor() as cursor:
+            # What a migration that rebuilds the table leaves behind
+            cursor.execute("DROP TRIGGER scheduler_post_fts_insert")
+        self.post('written while the trigger was gone')
+        self.assertEqual(self.found('written'), [])
+        ensure_search_index(sender=None)
+        self.assertEqual(self.found('written'), ['written while the trigger was gone'])
+
+    def test_punctuation_and_operators_are_searched_as_words(self):
+        self.post('Tips AND tricks (part 2)')
+        self.assertEqual(self.found('"and" ('), ['Tips AND tricks (part 2)'])
+        self.assertEqual(self.found('*) "'), [])
+
+    def test_like_fallback_without_the_index(self):
+        self.post('Learning C++ today')
+        with mock.patch('scheduler.search.search_available', return_value=False):
+            self.assertEqual(self.found('c++'), ['Learning C++ today'])
+
+    async def test_async_search_pages(self):
+        for i in range(3):
+            await ScheduledPost.objects.acreate(
+                user=self.user, social_account=self.account, content=f'note {i}', scheduled_at=self.now,
+            )
+        page, next_offset = await asearch_posts(self.user, 'note', page_size=2)
+        self.assertEqual((len(page), next_offset), (2, 2))
+        page, next_offset = await asearch_posts(self.user, 'note', offset=2, page_size=2)
+        self.assertEqual((len(page), next_offset), (1, None))
+
+
+# One token every 100s, five at most: refills don't matter within a test
+SLOW_LIMITS = {'twitter': (5, 36), 'default': (5, 36)}
+
+
+@override_settings(SCHEDULER_RATE_LIMITS=SLOW_LIMITS)
+class RateLimitTests(SchedulerTestCase):
+    def test_tokens_run_out_and_deferrals_are_spaced(self):
+        self.assertEqual(take_tokens(self.account.id, 'twitter', 3, now=self.now), (3, []))
+        granted, ready_times = take_tokens(self.account.id, 'twitter', 4, now=self.now)
+        self.assertEqual(granted, 2)
+        self.assertEqual(ready_times, [self.now + timedelta(seconds=100), self.now + timedelta(seconds=200)])
+
+    def test_tokens_refill_over_time(self):
+        take_tokens(self.account.id, 'twitter', 5, now=self.now)
+        granted, _ = take_tokens(self.account.id, 'twitter', 5, now=self.now + timedelta(seconds=250))
+        self.assertEqual(granted, 2)
+
+    def test_stale_bucket_read_loses_the_compare_and_swap(self):
+        stale = _get_bucket(self.account.id, 'twitter', self.now)
+        # Another scheduler empties the bucket after we read it
+        take_tokens(self.account.id, 'twitter', 5, now=self.now + timedelta(seconds=1))
+        reads = [stale]
+        with mock.patch('scheduler.ratelimit._get_bucket',
+                        side_effect=lambda *args: reads.pop() if reads else _get_bucket(*args)):
+            granted, _ = take_tokens(self.account.id, 'twitter', 5, now=self.now + timedelta(seconds=1))
+        self.assertEqual(granted, 0)
+
+    def test_dispatch_defers_posts_over_the_limit(self):
+        self.make_posts(7)
+        with published():
+            results = PostingService.execute_scheduled_posts('w1')
+        self.assertEqual((results['success'], results['deferred']), (5, 2))
+        self.assertEqual(ScheduledPost.objects.filter(status='scheduled', next_attempt_at__isnull=False).count(), 2)
+        self.assertCountersMatch()
+
+    def test_platform_rate_limit_error_empties_the_bucket(self):
+        self.make_posts(2)
+        with published({'post 0': (False, 'Error: Rate limit exceeded')}):
+            PostingService.execute_scheduled_posts('w1')
+        granted, _ = take_tokens(self.account.id, 'twitter', 1)
+        self.assertEqual(granted, 0)
+
+
+class RetryDueTimeTests(SchedulerTestCase):
+    def test_retry_time_before_scheduled_at_waits_for_scheduled_at(self):
+        later = self.now + timedelta(hours=1)
+        self.make_posts(1, scheduled_at=later, next_attempt_at=self.now - timedelta(minutes=5))
+        scheduler = DueTimeScheduler('w1')
+        scheduler.refresh()
+        self.assertEqual(scheduler._heap, [later])
+        self.assertGreater(scheduler.seconds_until_next(), 0)
+
+    def test_admin_reschedule_clears_the_retry_time(self):
+        [post] = self.make_posts(1, status='dead', attempt_count=5, next_attempt_at=self.now)
+        post.status, post.scheduled_at = 'scheduled', self.now + timedelta(hours=1)
+        model_admin = admin.site._registry[ScheduledPost]
+        request = RequestFactory().post('/')
+        model_admin.save_model(request, post, mock.Mock(changed_data=['status', 'scheduled_at']), change=True)
+        post.refresh_from_db()
+        self.assertEqual((post.next_attempt_at, post.attempt_count), (None, 0))
+        self.assertCountersMatch()
+
+
+@override_settings(
+    SCHEDULER_MAX_ATTEMPTS=5,
+    SCHEDULER_RETRY_POLICIES={'rate_limit': (300, 3600), 'transient': (30, 1800), 'permanent': None},
+)
+class RetryPolicyTests(SimpleTestCase):
+    def setUp(self):
+        random.seed(1234)
+        self.now = timezone.now()
+
+    def test_errors_are_classified(self):
+        self.assertEqual(classify_error('Error: Rate limit exceeded'), 'rate_limit')
+        self.assertEqual(classify_error('Error: Token rejected by Twitter/X'), 'permanent')
+        self.assertEqual(classify_error('Error: 503 Service Unavailable'), 'transient')
+        self.assertEqual(classify_error(None), 'transient')
+
+    def test_backoff_doubles_up_to_the_cap_with_equal_jitter(self):
+        for attempt, full in [(1, 30), (2, 60), (3, 120), (6, 960), (7, 1800), (12, 1800)]:
+            for _ in range(50):
+                seconds = retry_delay('transient', attempt).total_seconds()
+                self.assertGreaterEqual(seconds, full / 2)
+                self.assertLessEqual(seconds, full)
+        self.assertLessEqual(retry_delay('rate_limit', 1).total_seconds(), 300)
+        self.assertIsNone(retry_delay('permanent', 1))
+
+    def test_jitter_spreads_posts_that_failed_together(self):
+        delays = {retry_delay('transient', 3) for _ in range(20)}
+        self.assertGreater(len(delays), 15)
+
+    def test_transient_error_is_retried(self):
+        post = ScheduledPost(attempt_count=0)
+        status, message, next_attempt_at = next_step(post, 'Error: timed out', self.now)
+        self.assertEqual((status, message), ('scheduled', 'Error: timed out'))
+        self.assertTrue(self.now + timedelta(seconds=15) <= next_attempt_at <= self.now + timedelta(seconds=30))
+
+    def test_permanent_error_fails_straight_away(self):
+        post = ScheduledPost(attempt_count=0)
+        self.assertEqual(next_step(post, 'Error: Token rejected', self.now), ('failed', 'Error: Token rejected', None))
+
+    def test_last_attempt_gives_up(self):
+        post = ScheduledPost(attempt_count=4)
+        status, message, next_attempt_at = next_step(post, 'Error: timed out', self.now)
+        self.assertEqual((status, next_attempt_at), ('dead', None))
+        self.assertEqual(message, 'Gave up after 5 attempts: Error: timed out')
+
+
+@override_settings(PLATFORM_API_MODE='http', PLATFORM_API_BASE_URL='')
+class AdapterTests(SimpleTestCase):
+    def publish(self, handler, platform='twitter', **fields):
+        """Publish one unsaved post with every request answered by handler"""
+        account = SocialAccount(platform=platform, username='alice', access_token='token')
+        post = ScheduledPost(social_account=account, content='hello', **fields)
+        http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with mock.patch.object(client, 'get_client', return_value=http), \
+                mock.patch.dict(client._host_slots, clear=True):
+            return asyncio.run(get_adapter(platform).publish(post))
+
+    def test_success(self):
+        self.assertEqual(self.publish(lambda request: httpx.Response(201)), (True, '✅ Posted to Twitter/X'))
+
+    def test_request_is_authenticated(self):
+        def handler(request):
+            self.assertEqual(request.headers['Authorization'], 'Bearer token')
+            self.assertEqual(request.url, 'https://api.twitter.com/2/tweets')
+            return httpx.Response(201)
+        self.publish(handler)
+
+    def test_429_is_a_rate_limit(self):
+        success, message = self.publish(lambda request: httpx.Response(429, headers={'Retry-After': '60'}))
+        self.assertFalse(success)
+        self.assertEqual(classify_error(message), 'rate_limit')
+        self.assertIn('60s', message)
+
+    def test_rejected_token_is_permanent(self):
+        success, message = self.publish(lambda request: httpx.Response(401))
+        self.assertFalse(success)
+        self.assertEqual(classify_error(message), 'permanent')
+
+    def test_bad_request_is_permanent(self):
+        success, message = self.publish(lambda request: httpx.Response(400, text='Duplicate content'))
+        self.assertEqual(classify_error(message), 'permanent')
+        self.assertIn('Duplicate content', message)
+
+    def test_server_error_is_transient(self):
+        success, message = self.publish(lambda request: httpx.Response(503))
+        self.assertFalse(success)
+        self.assertEqual(classify_error(message), 'transient')
+
+    def test_connection_error_is_transient(self):
+        def handler(request):
+            raise httpx.ConnectError('connection refused', request=request)
+        success, message = self.publish(handler)
+        self.assertFalse(success)
+        self.assertEqual(message, 'Error: ConnectError calling Twitter/X')
+        self.assertEqual(classify_error(message), 'transient')
+
+    def test_instagram_publishes_the_container(self):
+        def handler(request):
+            if request.url.path.endswith('/me/media'):
+                return httpx.Response(200, json={'id': 'container-1'})
+            self.assertEqual(request.content, b'creation_id=container-1')
+            return httpx.Response(200, json={'id': 'media-1'})
+        with mock.patch.object(ScheduledPost, 'image_url_for', return_value='/media/post.jpg'):
+            result = self.publish(handler, 'instagram', image='posts/post.jpg')
+        self.assertEqual(result, (True, '✅ Posted to Instagram'))
+
+    def test_dispatch_yields_one_result_per_post_when_submit_fails(self):
+        account = SocialAccount(platform='twitter', username='alice', access_token='token')
+        posts = [ScheduledPost(social_account=account, content=f'post {i}') for i in range(3)]
+        with mock.patch('scheduler.services.submit', side_effect=RuntimeError('Event loop is closed')), \
+                self.assertLogs('scheduler.services', 'ERROR'):
+            results = list(PostingService.dispatch_posts(posts))
+        self.assertEqual([result[0] for result in results], posts)
+        self.assertEqual({result[1:3] for result in results}, {(False, 'Error: Event loop is closed')})
+
+
+class InstrumentationTests(TestCase):
+    async def test_concurrent_measurements_count_only_their_own_queries(self):
+        async def request(queries):
+            async with ameasure() as measurement:
+                for _ in range(queries):
+                    await User.objects.acount()
+                    await asyncio.sleep(0)
+            return measurement.queries
+
+        self.assertEqual(await asyncio.gather(request(1), request(4), request(7)), [1, 4, 7])
+
+
+class AsyncViewTests(SchedulerTestCase):
+    async def test_stats_update(self):
+        await sync_to_async(self.make_posts)(3)
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/stats-update/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '>3</p>')
+
+    async def test_dashboard_rows_for_htmx(self):
+        posts = await sync_to_async(self.make_posts)(2)
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/dashboard/', headers={'HX-Request': 'true'})
+        self.assertEqual(response.status_code, 200)
+        for post in posts:
+            self.assertContains(response, f'id="post-{post.id}"')
+
+    async def test_login_required(self):
+        response = await self.async_client.get('/stats-update/')
+        self.assertEqual(response.status_code, 302)
+
+
+def listen_once(hub):
+    """LiveHub._run() for tests: the hub thread ends when the broker goes away"""
+    try:
+        hub._listen()
+    except OSError:
+        pass
+
+
+@override_settings(LIVE_UPDATES=True)
+class LiveUpdateTests(SchedulerTestCase):
+    async def test_published_changes_reach_a_subscribed_stream(self):
+        broker = LiveBroker('127.0.0.1', 0).start()
+        try:
+            with override_settings(LIVE_BROKER_PORT=broker.address[1]), \
+                    mock.patch.object(LiveHub, '_run', listen_once):
+                hub = LiveHub()
+                subscription = hub.subscribe(self.user.id)
+                other = hub.subscribe(self.user.id + 1)
+                deadline = time.monotonic() + 5
+                while not broker._subscribers and time.monotonic() < deadline:
+                    await asyncio.sleep(0.01)
+
+                def publish():
+                    with self.captureOnCommitCallbacks(execute=True):
+                        publish_post_changes(self.user.id, [3, 1, 3])
+                await sync_to_async(publish)()
+                self.assertEqual(await subscription.get(5), {1, 3})
+                with self.assertRaises(TimeoutError):
+                    await other.get(0.1)
+        finally:
+            broker.stop()
+
+    async def test_queued_changes_are_merged(self):
+        with mock.patch.object(LiveHub, '_run'):
+            hub = LiveHub()
+            subscription = hub.subscribe(self.user.id)
+        hub.dispatch(json.dumps({'user': self.user.id, 'posts': [1]}))
+        hub.dispatch(json.dumps({'user': self.user.id, 'posts': [2]}))
+        hub.dispatch('not json')
+        await asyncio.sleep(0)
+        self.assertEqual(await subscription.get(1), {1, 2})
+        hub.dispatch(json.dumps({'user': self.user.id, 'posts': None}))
+        hub.dispatch(json.dumps({'user': self.user.id, 'posts': [3]}))
+        await asyncio.sleep(0)
+        self.assertIsNone(await subscription.get(1))
+
+    def test_wsgi_gets_no_stream(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/live/').status_code, 204)
+
+
+@override_settings(LIVE_UPDATES=True)
+class LiveStreamTests(TransactionTestCase):
+    # The view closes its DB connection, which can't happen inside TestCase's transaction
+    async def test_stream_preamble_and_catch_up(self):
+        user = await User.objects.acreate_user('alice', password='correct-horse-battery')
+        await self.async_client.aforce_login(user)
+        with mock.patch.object(LiveHub, '_run'):
+            response = await self.async_client.get('/live/')
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            events = aiter(response.streaming_content)
+            self.assertEqual(await anext(events), b'retry: 5000\nid: 0\n\n')
+
+            response = await self.async_client.get('/live/', headers={'Last-Event-ID': '0'})
+            events = aiter(response.streaming_content)
+            await anext(events)
+            catch_up = (await anext(events)).decode()
+        self.assertIn('event: stats\n', catch_up)
+        self.assertIn('event: posts\ndata: {"reload": true}\n', catch_up)
+
+    async def test_disabled_live_updates_get_no_stream(self):
+        user = await User.objects.acreate_user('alice', password='correct-horse-battery')
+        await self.async_client.aforce_login(user)
+        with override_settings(LIVE_UPDATES=False):
+            response = await self.async_client.get('/live/')
+        self.assertEqual(response.status_code, 204)
+
+
+def upload(size=(640, 480), format='JPEG', exif=None):
+    """Store an image as an upload would be; returns its storage name"""
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'teal').save(buffer, format, exif=exif or Image.Exif())
+    return default_storage.save(f'posts/upload.{format.lower()}', ContentFile(buffer.getvalue()))
+
+
+class ImageTests(SchedulerTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def test_variants_are_named_by_content_and_fit_their_box(self):
+        variants = render_variants(upload())
+        self.assertEqual(variants.keys(), VARIANTS.keys())
+        self.assertRegex(variants['thumb'], r'^variants/[0-9a-f]{2}/[0-9a-f]{64}\.webp$')
+        self.assertTrue(variants['instagram'].endswith('.jpg'))
+        with default_storage.open(variants['thumb']) as f:
+            self.assertEqual(Image.open(f).size, (320, 240))
+        # The same picture uploaded again shares the files
+        self.assertEqual(render_variants(upload()), variants)
+
+    def test_orientation_is_applied_and_exif_dropped(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotated 90 degrees
+        exif[0x010F] = 'Camera maker'  # Make
+        variants = render_variants(upload(exif=exif))
+        with default_storage.open(variants['linkedin']) as f:
+            image = Image.open(f)
+            self.assertEqual(image.size, (480, 640))
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_pending_images_are_processed(self):
+        ok, broken = self.make_posts(2, image_state='pending')
+        ok.image = upload()
+        broken.image = default_storage.save('posts/broken.jpg', ContentFile(b'not an image'))
+        ScheduledPost.objects.bulk_update([ok, broken], ['image'])
+
+        with ThreadPoolExecutor(2) as executor, self.assertLogs('scheduler.images', 'WARNING'):
+            self.assertEqual(process_pending_images(executor), {'ready': 1, 'failed': 1})
+        ok.refresh_from_db()
+        broken.refresh_from_db()
+        self.assertEqual((ok.image_state, broken.image_state), ('ready', 'failed'))
+        self.assertEqual(ok.image_variants.keys(), VARIANTS.keys())
+        self.assertEqual(broken.image_variants, {})
+        self.assertEqual(ok.image_url_for('twitter'), default_storage.url(ok.image_variants['twitter']))
+
+        # Nothing left to do until failed images are retried
+        with ThreadPoolExecutor(1) as executor, self.assertLogs('scheduler.images', 'WARNING'):
+            self.assertEqual(process_pending_images(executor), {'ready': 0, 'failed': 0})
+            self.assertEqual(process_pending_images(executor, retry_failed=True), {'ready': 0, 'failed': 1})
+
+
+def lines(*rows):
+    """An uploaded file's bytes as a stream"""
+    return io.BytesIO('\n'.join(rows).encode())
+
+
+class ImportTests(SchedulerTestCase):
+    def test_naive_times_use_the_row_then_the_import_timezone(self):
+        report = import_posts(self.user, lines(
+            'platform,content,scheduled_at,timezone',
+            'twitter,row zone,2030-01-31T09:30,Asia/Kolkata',
+            'twitter,import zone,2030-01-31T09:30,',
+            'twitter,offset,2030-01-31T09:30+02:00,Asia/Kolkata',
+        ), 'csv', timezone_name='America/New_York')
+        self.assertEqual((report.created, report.error_count), (3, 0))
+        times = dict(ScheduledPost.objects.values_list('content', 'scheduled_at'))
+        self.assertEqual(times['row zone'], datetime(2030, 1, 31, 9, 30, tzinfo=ZoneInfo('Asia/Kolkata')))
+        self.assertEqual(times['import zone'], datetime(2030, 1, 31, 9, 30, tzinfo=ZoneInfo('America/New_York')))
+        self.assertEqual(times['offset'], datetime(2030, 1, 31, 7, 30, tzinfo=ZoneInfo('UTC')))
+        self.assertCountersMatch()
+
+    def test_naive_times_default_to_the_current_timezone(self):
+        row = '{"platform": "twitter", "content": "hi", "scheduled_at": "2030-01-31T09:30"}'
+        with timezone.override('Europe/Paris'):
+            import_posts(self.user, lines(row), 'ndjson')
+        self.assertEqual(
+            ScheduledPost.objects.get().scheduled_at, datetime(2030, 1, 31, 9, 30, tzinfo=ZoneInfo('Europe/Paris')),
+        )
+
+    def test_unreadable_imports_are_refused(self):
+        with self.assertRaisesMessage(ValidationError, 'CSV header needs'):
+            import_posts(self.user, lines('platform,content', 'twitter,hi'), 'csv')
+        with self.assertRaisesMessage(ValidationError, "Unknown timezone 'Mars/Olympus'"):
+            import_posts(self.user, lines(), 'csv', timezone_name='Mars/Olympus')
+        with self.assertRaisesMessage(ValidationError, 'Could not tell the file format'):
+            import_posts(self.user, lines(), None)
+
+    def test_format_is_told_from_the_file_name(self):
+        names = ['a.CSV', 'a.txt', 'a.jsonl', 'a.ndjson', 'a.json', 'a.xlsx', 'a']
+        self.assertEqual([guess_format(name) for name in names], ['csv', 'csv', 'ndjson', 'ndjson', 'ndjson', None, None])
+        self.client.force_login(self.user)
+        row = b'{"platform": "twitter", "content": "hi", "scheduled_at": "2030-01-31T09:30Z"}\n'
+        upload = SimpleUploadedFile('posts.ndjson', row)
+        response = self.client.post('/posts/import/', {'file': upload})
+        self.assertEqual(response.json()['created'], 1)
+        upload = SimpleUploadedFile('posts.xlsx', b'')
+        self.assertEqual(self.client.post('/posts/import/', {'file': upload}).status_code, 400)
+
+    def test_bad_rows_are_reported_and_the_rest_imported(self):
+        past = (self.now - timedelta(days=1)).isoformat()
+        report = import_posts(self.user, lines(
+            '{"platform": "twitter", "content": "good", "scheduled_at": "2030-01-31T09:30Z"}',
+            'not json',
+            '',
+            '{"platform": "mastodon", "content": "hi", "scheduled_at": "2030-01-31T09:30Z"}',
+            '{"platform": "twitter", "content": "hi", "scheduled_at": "next tuesday"}',
+            '{"platform": "twitter", "content": "hi", "scheduled_at": "2030-01-31T09:30", "timezone": "Mars/Olympus"}',
+            f'{{"platform": "twitter", "content": "", "scheduled_at": "{past}"}}',
+            '{"platform": "twitter", "content": "also good", "scheduled_at": "2030-01-31T09:30Z"}',
+        ), 'ndjson')
+        self.assertEqual((report.rows, report.created, report.error_count), (7, 2, 5))
+        self.assertEqual([error['line'] for error in report.errors], [2, 4, 5, 6, 7])
+        self.assertEqual(report.errors[0]['errors'], ['Not a JSON object'])
+        self.assertEqual(report.errors[1]['errors'], ["No connected account for 'mastodon'"])
+        self.assertIn("Unknown timezone 'Mars/Olympus'", report.errors[3]['errors'])
+        self.assertEqual(ScheduledPost.objects.count(), 2)
+
+    @override_settings(BULK_IMPORT_MAX_ROWS=2)
+    def test_imports_stop_at_the_row_limit(self):
+        row = 'twitter,hi,2030-01-31T09:30Z'
+        report = import_posts(self.user, lines('platform,content,scheduled_at', row, row, row), 'csv')
+        self.assertEqual((report.created, report.error_count), (2, 1))
+        self.assertEqual(report.errors, [{'line': 4, 'errors': ['Stopped: imports are limited to 2 rows']}])
+
+    def test_dry_run_creates_nothing(self):
+        row = 'twitter,hi,2030-01-31T09:30Z'
+        rows = lines('platform,content,scheduled_at', row, row, 'twitter,,')
+        report = import_posts(self.user, rows, 'csv', dry_run=True)
+        self.assertEqual((report.created, report.error_count), (2, 1))
+        self.assertFalse(ScheduledPost.objects.exists())
+        self.assertFalse(PostStatusCounter.objects.filter(count__gt=0).exists())
+
+
+@override_settings(SCHEDULER_RATE_LIMITS=NO_LIMITS)
+class BulkActionTests(SchedulerTestCase):
+    def test_bulk_actions_skip_posts_in_flight(self):
+        self.make_posts(2)
+        PostingService.claim_due_posts('w1')
+        for action in ('cancel', 'retry', 'delete'):
+            self.assertEqual(apply_bulk_action(ScheduledPost.objects.all(), action), 0)
+        self.assertCountersMatch()
+
+    def test_actions_count_only_rows_they_changed(self):
+        posts = self.make_posts(3)
+        read = list(ScheduledPost.objects.values_list('id', 'user_id', 'social_account__platform', 'status'))
+        # Claimed by the scheduler between the read and the UPDATE
+        ScheduledPost.objects.filter(id=posts[0].id).update(status='processing')
+        queryset = mock.Mock()
+        queryset.filter.return_value.select_for_update.return_value.values_list.return_value = read
+
+        self.assertEqual(apply_bulk_action(queryset, 'cancel'), 2)
+        self.assertEqual(ScheduledPost.objects.get(id=posts[0].id).status, 'processing')
+        self.assertCountersMatch()
+
+    def test_retry_and_delete(self):
+        self.make_posts(2, status='failed', attempt_count=3)
+        self.make_posts(1, status='success')
+        self.assertEqual(apply_bulk_action(ScheduledPost.objects.all(), 'retry'), 2)
+        retried = ScheduledPost.objects.filter(status='scheduled')
+        self.assertEqual(set(retried.values_list('attempt_count', flat=True)), {0})
+        self.assertEqual(apply_bulk_action(ScheduledPost.objects.all(), 'delete'), 3)
+        self.assertFalse(ScheduledPost.objects.exists())
+        self.assertCountersMatch()
+
+    def test_admin_delete_reports_skipped_posts(self):
+        self.make_posts(3)
+        PostingService.claim_due_posts('w1', limit=1)
+        model_admin = admin.site._registry[ScheduledPost]
+        with mock.patch.object(model_admin, 'message_user') as message_user:
+            model_admin.delete_queryset(RequestFactory().post('/'), ScheduledPost.objects.all())
+        self.assertEqual(
+            message_user.call_args.args[1], "Deleted 2 of 3 selected posts; the rest are being sent right now",
+        )
+        self.assertEqual(ScheduledPost.objects.get().status, 'processing')
+        self.assertCountersMatch()
+
+
+class MaterializerTests(SchedulerTestCase):
+    def make_templates(self, count):
+        return RecurringPost.objects.bulk_create([
+            RecurringPost(
+                user=self.user, social_account=self.account, content=f'daily {i}', frequency='daily',
+                # The form takes whole minutes
+                starts_at=self.now.replace(second=0, microsecond=0) + timedelta(hours=1),
+                materialized_until=self.now,
+            )
+            for i in range(count)
+        ])
+
+    def test_window_is_materialized_once(self):
+        self.make_templates(1)
+        window = timedelta(hours=48)
+        self.assertEqual(materialize_recurring_posts(self.now, window), {'templates': 1, 'posts': 2})
+        self.assertEqual(materialize_recurring_posts(self.now, window)['posts'], 0)
+        # A day later, one more day of occurrences
+        self.assertEqual(materialize_recurring_posts(self.now + timedelta(days=1), window)['posts'], 1)
+        self.assertEqual(ScheduledPost.objects.count(), 3)
+        self.assertCountersMatch()
+
+    def test_extended_templates_are_not_picked_again(self):
+        self.make_templates(3)
+        batches = [materialize_recurring_posts(batch_size=2)['templates'] for _ in range(3)]
+        self.assertEqual(batches, [2, 1, 0])
+        # Nor a few seconds later, when the horizon has moved on a little
+        later = timezone.now() + timedelta(seconds=5)
+        self.assertEqual(materialize_recurring_posts(later)['templates'], 0)
+
+    def test_paused_templates_are_skipped(self):
+        [template] = self.make_templates(1)
+        RecurringPost.objects.filter(id=template.id).update(is_active=False)
+        self.assertEqual(materialize_recurring_posts(self.now, timedelta(hours=48)), {'templates': 0, 'posts': 0})
+        self.assertFalse(ScheduledPost.objects.exists())
+
+
+@override_settings(SCHEDULER_RATE_LIMITS=NO_LIMITS)
+class DashboardArchiveTests(SchedulerTestCase):
+    def test_posts_archived_early_stay_listed(self):
+        self.make_posts(30, status='success', scheduled_at=self.now - timedelta(days=2))
+        self.make_posts(25, scheduled_at=self.now + timedelta(days=1))
+        # Archived well inside ARCHIVE_AFTER_DAYS, as archive_posts --days 1 does
+        self.assertEqual(archive_old_posts(before=self.now - timedelta(days=1)), 30)
+
+        self.client.force_login(self.user)
+        listed, url = [], '/dashboard/'
+        while url:
+            html = self.client.get(url).content.decode()
+            listed += [int(post_id) for post_id in re.findall(r'<tr id="post-(\d+)"', html)]
+            next_page = re.search(r'hx-get="([^"]+)" hx-trigger="revealed"', html)
+            url = next_page and next_page.group(1).replace('&amp;', '&')
+        self.assertEqual(len(listed), 55)
+        self.assertEqual(set(listed) - set(ScheduledPost.objects.values_list('id', flat=True)),
+                         set(ArchivedPost.objects.values_list('id', flat=True)))
+
+
+    def test_archiving_keeps_counters_and_moves_rows_once(self):
+        old = self.make_posts(3, status='success', scheduled_at=self.now - timedelta(days=2))
+        self.make_posts(1, status='failed', scheduled_at=self.now)
+        self.assertEqual(archive_old_posts(before=self.now - timedelta(days=1)), 3)
+        self.assertEqual(archive_old_posts(before=self.now - timedelta(days=1)), 0)
+        self.assertEqual(set(ArchivedPost.objects.values_list('id', flat=True)), {post.id for post in old})
+        self.assertEqual(ScheduledPost.objects.count(), 1)
+        self.assertEqual(get_user_stats(self.user.id)['total_success'], 3)
+        self.assertCountersMatch()
+
+
+@override_settings(SCHEDULER_RATE_LIMITS=NO_LIMITS)
+class AttemptLogTests(SchedulerTestCase):
+    def test_attempts_keep_counting_after_a_retry(self):
+        [post] = self.make_posts(1)
+        with published({'post 0': (False, 'Error: Token rejected')}):
+            for _ in range(3):
+                PostingService.execute_scheduled_posts('w1')
+                apply_bulk_action(ScheduledPost.objects.all(), 'retry')
+                ScheduledPost.objects.update(scheduled_at=self.now)
+        _, attempts = post_timeline(self.user, post.id)
+        self.assertEqual([attempt.attempt for attempt in attempts], [1, 2, 3])
+
+
+    def test_each_call_is_logged_with_its_outcome(self):
+        [post] = self.make_posts(1)
+        with published({'post 0': (False, 'Error: timed out')}):
+            PostingService.execute_scheduled_posts('w1')
+        [attempt] = PostAttempt.objects.filter(post_id=post.id)
+        self.assertEqual((attempt.attempt, attempt.outcome, attempt.response), (1, 'transient', 'Error: timed out'))
+        self.assertGreaterEqual(attempt.finished_at, attempt.started_at)
+
+    def test_archived_posts_keep_their_timeline(self):
+        [post] = self.make_posts(1, scheduled_at=self.now - timedelta(days=2))
+        with published():
+            PostingService.execute_scheduled_posts('w1')
+        archive_old_posts(before=self.now - timedelta(days=1))
+        archived, attempts = post_timeline(self.user, post.id)
+        self.assertIsInstance(archived, ArchivedPost)
+        self.assertEqual([attempt.outcome for attempt in attempts], ['success'])
+        other = User.objects.create_user('bob')
+        self.assertEqual(post_timeline(other, post.id), (None, []))
@@ -12,14 +12,25 @@ urlpatterns = [
     path('dashboard/', views.dashboard_view, name='dashboard'),
     path('stats-update/', views.stats_update_view, name='stats_update'),
     path('search/', views.search_posts_view, name='search_posts'),
+    path('live/', views.live_updates_view, name='live_updates'),
     
     # Posts
     path('posts/new/', views.schedule_post_view, name='schedule_post'),
+    path('posts/import/', views.import_posts_view, name='import_posts'),
+    path('posts/bulk/', views.bulk_posts_view, name='bulk_posts'),
+    path('recurring/', views.recurring_posts_view, name='recurring_posts'),
+    path('recurring/<int:recurring_id>/edit/', views.recurring_posts_view, name='edit_recurring_post'),
+    path('recurring/<int:recurring_id>/toggle/', views.toggle_recurring_post_view, name='toggle_recurring_post'),
+    path('recurring/<int:recurring_id>/delete/', views.delete_recurring_post_view, name='delete_recurring_post'),
     path('posts/<int:post_id>/cancel/', views.cancel_post_view, name='cancel_post'),
     path('posts/<int:post_id>/retry/', views.retry_post_view, name='retry_post'),
     path('posts/<int:post_id>/delete/', views.delete_post_view, name='delete_post'),
+    path('posts/<int:post_id>/attempts/', views.post_attempts_view, name='post_attempts'),
     
     # Accounts
     path('accounts/', views.accounts_view, name='accounts'),
     path('accounts/<int:account_id>/disconnect/', views.disconnect_account_view, name='disconnect_account'),
+
+    # Monitoring
+    path('metrics/', views.metrics_view, name='metrics'),
 ]
@@ -1,18 +1,36 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, Http404, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.template.loader import render_to_string
+from django.conf import settings
+from django.db import connection, transaction
 from django.db.models import Q, Count
 from django.utils import timezone
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 from datetime import timedelta
-from .models import ScheduledPost, SocialAccount
-from .forms import SignUpForm, LoginForm, SchedulePostForm, ConnectAccountForm
+from .models import ArchivedPost, RecurringPost, ScheduledPost, SocialAccount
+from .instrumentation import LIVE_STREAMS
+from .metrics import REGISTRY
+from .bulk import apply_bulk_action, guess_format, import_posts
+from .forms import SignUpForm, LoginForm, SchedulePostForm, ConnectAccountForm, BulkActionForm, RecurringPostForm
 from .constants import STATUS_CHOICES, STATUS_COLORS
+from .attempts import post_timeline
+from .pagination import akeyset_page_with_archive, page_url
+from .recurrence import materialize, occurrences, unsent_posts
+from .search import asearch_posts
 from .services import PostingService
+from .stats import aget_user_stats, apply_counter_deltas, get_user_stats, status_change
+from .wakeup import notify_scheduler
+from .live import hub, publish_post_changes, sse_event
+import hmac
 import json
+import time
 
 
 # ============ AUTHENTICATION VIEWS ============
@@ -75,70 +93,143 @@ def landing_view(request):
 # ============ DASHBOARD VIEWS ============
 
 @login_required(login_url='login')
-def dashboard_view(request):
+async def dashboard_view(request):
     """Main dashboard"""
-    user_posts = ScheduledPost.objects.filter(user=request.user).select_related('social_account')
+    user = await request.auser()
+    user_posts = ScheduledPost.objects.filter(user=user).select_related('social_account')
     
-    # Get statistics
-    stats = {
-        'total_scheduled': user_posts.filter(status='scheduled').count(),
-        'total_success': user_posts.filter(status='success').count(),
-        'total_failed': user_posts.filter(status='failed').count(),
-        'upcoming': user_posts.filter(status='scheduled', scheduled_at__gt=timezone.now()).count(),
+    # For HTMX filtering
+    status_filter = request.GET.get('status', 'all')
+    platform_filter = request.GET.get('platform', 'all')
+    
+    history = user_posts
+    archived = ArchivedPost.objects.filter(user=user).select_related('social_account')
+    if status_filter != 'all':
+        history = history.filter(status=status_filter)
+        archived = archived.filter(status=status_filter)
+    if platform_filter != 'all':
+        history = history.filter(social_account__platform=platform_filter)
+        archived = archived.filter(social_account__platform=platform_filter)
+    
+    # Get recent posts (one page, newest first; older pages continue into the archive)
+    cursor = request.GET.get('cursor')
+    recent_posts, next_cursor = await akeyset_page_with_archive(history, archived, cursor)
+    
+    context = {
+        'recent_posts': recent_posts,
+        'next_page_url': page_url(request, next_cursor) if next_cursor else None,
+        'status_colors': STATUS_COLORS,
     }
     
+    # Return partial if HTMX request (just the rows when scrolling further)
+    if request.headers.get('HX-Request'):
+        template = 'dashboard/posts_rows.html' if cursor else 'dashboard/posts_table.html'
+        return render(request, template, context)
+    
+    # The full page reads the session (messages) and lazy querysets while
+    # rendering, which the ORM only allows from sync code
+    return await sync_to_async(dashboard_page)(request, user_posts, context)
+
+
+def dashboard_page(request, user_posts, context):
+    """Render the full dashboard around the first page of posts"""
+    # Get statistics
+    stats = get_user_stats(request.user.id)
+    
     # Get upcoming posts (next 10)
     upcoming_posts = user_posts.filter(
         status='scheduled',
         scheduled_at__gt=timezone.now()
     ).order_by('scheduled_at')[:10]
     
-    # Get recent posts (latest 20)
-    recent_posts = user_posts.order_by('-scheduled_at')[:20]
-    
-    # For HTMX filtering
-    status_filter = request.GET.get('status', 'all')
-    platform_filter = request.GET.get('platform', 'all')
-    
-    if status_filter != 'all':
-        recent_posts = recent_posts.filter(status=status_filter)
-    if platform_filter != 'all':
-        recent_posts = recent_posts.filter(social_account__platform=platform_filter)
-    
     # Get connected accounts
     connected_accounts = SocialAccount.objects.filter(user=request.user, is_connected=True)
     
-    context = {
+    context.update({
         'stats': stats,
         'upcoming_posts': upcoming_posts,
-        'recent_posts': recent_posts,
         'status_choices': STATUS_CHOICES,
-        'status_colors': STATUS_COLORS,
         'connected_accounts': connected_accounts,
-    }
-    
-    # Return partial if HTMX request
-    if request.headers.get('HX-Request'):
-        return render(request, 'dashboard/posts_table.html', context)
+    })
     
     return render(request, 'dashboard/dashboard.html', context)
 
 
 @login_required(login_url='login')
-def stats_update_view(request):
+async def stats_update_view(request):
     """HTMX endpoint to refresh stats"""
-    user_posts = ScheduledPost.objects.filter(user=request.user)
-    
-    stats = {
-        'total_scheduled': user_posts.filter(status='scheduled').count(),
-        'total_success': user_posts.filter(status='success').count(),
-        'total_failed': user_posts.filter(status='failed').count(),
-        'upcoming': user_posts.filter(status='scheduled', scheduled_at__gt=timezone.now()).count(),
-    }
+    user = await request.auser()
+    stats = await aget_user_stats(user.id)
     
     return render(request, 'dashboard/stats.html', {'stats': stats})
 
 
+@login_required(login_url='login')
+async def live_updates_view(request):
+    """Server-sent events: fresh stats and post rows whenever the user's posts change"""
+    if not settings.LIVE_UPDATES or not isinstance(request, ASGIRequest):
+        # An endless response would hold a WSGI worker for good.
+        # 204 tells EventSource not to reconnect, and the page polls instead.
+        return HttpResponse(status=204)
+    
+    user = await request.auser()
+    # Don't hold this request's DB connection for the life of the stream
+    await sync_to_async(lambda: connection.close())()
+    subscription = hub.subscribe(user.id)
+    # A reconnecting browser may have missed changes while it was away
+    missed = bool(request.headers.get('Last-Event-ID'))
+    
+    async def events():
+        LIVE_STREAMS.inc()
+        try:
+            # With an id set, a reconnecting browser sends Last-Event-ID
+            yield 'retry: 5000\nid: 0\n\n'
+            if missed:
+                yield await live_event(request, user.id, None)
+            while True:
+                try:
+                    changed = await subscription.get(settings.LIVE_KEEPALIVE_SECONDS)
+                except TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                yield await live_event(request, user.id, changed)
+        finally:
+            LIVE_STREAMS.dec()
+            subscription.close()
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: pass events through unbuffered
+    return response
+
+
+async def live_event(request, user_id, changed):
+    """Stats and changed rows as SSE text; the rendering runs on a pool thread"""
+    return await sync_to_async(render_live_event, thread_sensitive=False)(request, user_id, changed)
+
+
+def render_live_event(request, user_id, changed):
+    """changed: post ids to re-render, or None to have the page reload its list"""
+    try:
+        stats = render_to_string('dashboard/stats.html', {'stats': get_user_stats(user_id)}, request)
+        if changed is None:
+            posts = {'reload': True}
+        else:
+            found = ScheduledPost.objects.filter(user_id=user_id, id__in=changed).select_related('social_account')
+            rows = {
+                post.id: render_to_string('dashboard/posts_rows.html', {
+                    'recent_posts': [post], 'status_colors': STATUS_COLORS,
+                }, request)
+                for post in found
+            }
+            posts = {'rows': rows, 'removed': sorted(set(changed) - set(rows))}
+    finally:
+        # Pool threads are shared by all streams; don't leave a connection on one
+        connection.close()
+    event_id = int(time.time() * 1000)
+    return sse_event('stats', stats, event_id) + sse_event('posts', json.dumps(posts), event_id)
+
+
 # ============ POST MANAGEMENT VIEWS ============
 
 @login_required(login_url='login')
@@ -150,7 +241,13 @@ def schedule_post_view(request):
         if form.is_valid():
             post = form.save(commit=False)
             post.user = request.user
-            post.save()
+            with transaction.atomic():
+                post.save()
+                apply_counter_deltas(
+                    status_change(request.user.id, post.social_account.platform, None, 'scheduled')
+                )
+                publish_post_changes(request.user.id, [post.id])
+            notify_scheduler(post.scheduled_at)
             messages.success(request, "✅ Post scheduled successfully!")
             return redirect('dashboard')
         else:
@@ -162,17 +259,67 @@ def schedule_post_view(request):
     return render(request, 'posts/schedule_form_modal.html', {'form': form})
 
 
+@login_required(login_url='login')
+@require_http_methods(["POST"])
+def import_posts_view(request):
+    """
+    Schedule posts in bulk from an uploaded CSV or NDJSON file
+    POST: file, optional format ('csv'/'ndjson'), timezone and dry_run=1
+    Returns: JSON report with per-row errors
+    """
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'error': "Upload a CSV or NDJSON file as 'file'"}, status=400)
+    try:
+        report = import_posts(
+            request.user,
+            upload,
+            request.POST.get('format') or guess_format(upload.name),
+            timezone_name=request.POST.get('timezone'),
+            dry_run=request.POST.get('dry_run') in ('1', 'true', 'on'),
+        )
+    except ValidationError as e:
+        return JsonResponse({'error': ' '.join(e.messages)}, status=400)
+    return JsonResponse(report.as_dict(), status=200 if report.created or not report.error_count else 400)
+
+
+@login_required(login_url='login')
+@require_http_methods(["POST"])
+def bulk_posts_view(request):
+    """
+    Cancel, retry or delete many posts at once
+    POST: action, and ids (comma-separated) and/or platform, status, scheduled_from, scheduled_to
+    Returns: JSON with how many posts changed (posts the action doesn't apply to are skipped)
+    """
+    form = BulkActionForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    
+    posts = form.filter(ScheduledPost.objects.filter(user=request.user))
+    action = form.cleaned_data['action']
+    changed = apply_bulk_action(posts, action)
+    return JsonResponse({'action': action, 'changed': changed})
+
+
 @login_required(login_url='login')
 @require_http_methods(["POST"])
 def cancel_post_view(request, post_id):
     """Cancel a scheduled post"""
-    post = get_object_or_404(ScheduledPost, id=post_id, user=request.user)
+    post = get_object_or_404(ScheduledPost.objects.select_related('social_account'), id=post_id, user=request.user)
     
-    if post.status != 'scheduled':
+    with transaction.atomic():
+        # Guarded so a post the scheduler has just claimed isn't cancelled mid-send
+        cancelled = ScheduledPost.objects.filter(id=post.id, status='scheduled').update(status='cancelled')
+        if cancelled:
+            apply_counter_deltas(
+                status_change(request.user.id, post.social_account.platform, 'scheduled', 'cancelled')
+            )
+            publish_post_changes(request.user.id, [post.id])
+    
+    if not cancelled:
         messages.warning(request, "Can only cancel scheduled posts.")
     else:
-        post.status = 'cancelled'
-        post.save(update_fields=['status'])
+        notify_scheduler()
         messages.success(request, "✅ Post cancelled successfully!")
     
     if request.headers.get('HX-Request'):
@@ -183,16 +330,27 @@ def cancel_post_view(request, post_id):
 @login_required(login_url='login')
 @require_http_methods(["POST"])
 def retry_post_view(request, post_id):
-    """Retry a failed post"""
-    post = get_object_or_404(ScheduledPost, id=post_id, user=request.user)
+    """Retry a failed post, or one the scheduler gave up on"""
+    post = get_object_or_404(ScheduledPost.objects.select_related('social_account'), id=post_id, user=request.user)
+    
+    # Reschedule to 1 minute from now, with a fresh set of automatic retries
+    scheduled_at = timezone.now() + timedelta(minutes=1)
+    retried = 0
+    if post.status in ('failed', 'dead'):
+        with transaction.atomic():
+            retried = ScheduledPost.objects.filter(id=post.id, status=post.status).update(
+                status='scheduled', scheduled_at=scheduled_at, next_attempt_at=None, attempt_count=0
+            )
+            if retried:
+                apply_counter_deltas(
+                    status_change(request.user.id, post.social_account.platform, post.status, 'scheduled')
+                )
+                publish_post_changes(request.user.id, [post.id])
     
-    if post.status != 'failed':
+    if not retried:
         messages.warning(request, "Can only retry failed posts.")
     else:
-        # Reschedule to 1 minute from now
-        post.status = 'scheduled'
-        post.scheduled_at = timezone.now() + timedelta(minutes=1)
-        post.save(update_fields=['status', 'scheduled_at'])
+        notify_scheduler(scheduled_at)
         messages.success(request, "✅ Post rescheduled for retry!")
     
     if request.headers.get('HX-Request'):
@@ -204,8 +362,17 @@ def retry_post_view(request, post_id):
 @require_http_methods(["POST"])
 def delete_post_view(request, post_id):
     """Delete a post"""
-    post = get_object_or_404(ScheduledPost, id=post_id, user=request.user)
-    post.delete()
+    with transaction.atomic():
+        post = get_object_or_404(
+            ScheduledPost.objects.select_for_update(of=('self',)).select_related('social_account'),
+            id=post_id,
+            user=request.user,
+        )
+        post.delete()
+        apply_counter_deltas(
+            status_change(request.user.id, post.social_account.platform, post.status, None)
+        )
+        publish_post_changes(request.user.id, [post_id])
     messages.success(request, "✅ Post deleted successfully!")
     
     if request.headers.get('HX-Request'):
@@ -213,6 +380,91 @@ def delete_post_view(request, post_id):
     return redirect('dashboard')
 
 
+@login_required(login_url='login')
+def post_attempts_view(request, post_id):
+    """A post's delivery attempts, oldest first - HTMX modal"""
+    post, attempts = post_timeline(request.user, post_id)
+    if post is None:
+        raise Http404("No such post")
+    return render(request, 'posts/attempts_modal.html', {'post': post, 'attempts': attempts})
+
+
+# ============ RECURRING POST VIEWS ============
+
+@login_required(login_url='login')
+@require_http_methods(["GET", "POST"])
+def recurring_posts_view(request, recurring_id=None):
+    """List recurring posts, and create one (or edit recurring_id)"""
+    templates = RecurringPost.objects.filter(user=request.user).select_related('social_account')
+    instance = get_object_or_404(templates, id=recurring_id) if recurring_id else None
+    
+    if request.method == 'POST':
+        form = RecurringPostForm(request.POST, request.FILES, instance=instance, user=request.user)
+        if form.is_valid():
+            with transaction.atomic():
+                template = form.save(commit=False)
+                template.user = request.user
+                template.save()
+                if instance is None:
+                    # Occurrences in the coming window go on the dashboard straight away
+                    materialize([template])
+            if instance is None:
+                messages.success(request, "✅ Recurring post created!")
+            else:
+                messages.success(request, "✅ Recurring post updated! Changes apply from the next occurrences created.")
+            return redirect('recurring_posts')
+    else:
+        form = RecurringPostForm(instance=instance, user=request.user)
+    
+    # Next few occurrences, looking up to a month ahead
+    now = timezone.now()
+    for template in templates:
+        upcoming = occurrences(template, now, now + timedelta(days=31)) if template.is_active else []
+        template.upcoming = upcoming[:3]
+    
+    context = {
+        'templates': templates,
+        'form': form,
+        'editing': instance,
+        'window_hours': settings.RECURRING_WINDOW_HOURS,
+    }
+    return render(request, 'posts/recurring.html', context)
+
+
+@login_required(login_url='login')
+@require_http_methods(["POST"])
+def toggle_recurring_post_view(request, recurring_id):
+    """Pause a recurring post (removing its created posts not yet sent), or resume it"""
+    template = get_object_or_404(
+        RecurringPost.objects.select_related('social_account'), id=recurring_id, user=request.user
+    )
+    with transaction.atomic():
+        if template.is_active:
+            RecurringPost.objects.filter(id=template.id).update(is_active=False)
+            removed = apply_bulk_action(unsent_posts(template), 'delete')
+            messages.success(request, f"⏸️ Recurring post paused ({removed} upcoming posts removed)")
+        else:
+            # Picks up from now: occurrences missed while paused aren't sent
+            template.is_active = True
+            template.materialized_until = timezone.now()
+            template.save(update_fields=['is_active', 'materialized_until', 'updated_at'])
+            materialize([template])
+            messages.success(request, "▶️ Recurring post resumed!")
+    return redirect('recurring_posts')
+
+
+@login_required(login_url='login')
+@require_http_methods(["POST"])
+def delete_recurring_post_view(request, recurring_id):
+    """Delete a recurring post; its posts already sent stay in the history"""
+    template = get_object_or_404(RecurringPost, id=recurring_id, user=request.user)
+    with transaction.atomic():
+        apply_bulk_action(unsent_posts(template), 'delete')
+        template.delete()
+    messages.success(request, "✅ Recurring post deleted!")
+    return redirect('recurring_posts')
+
+
 # ============ SOCIAL ACCOUNT VIEWS ============
 
 @login_required(login_url='login')
@@ -270,19 +522,41 @@ def disconnect_account_view(request, account_id):
 # ============ SEARCH & FILTER (HTMX) ============
 
 @login_required(login_url='login')
-def search_posts_view(request):
-    """Search posts - HTMX endpoint"""
+async def search_posts_view(request):
+    """Search posts - HTMX endpoint, ranked full-text matches"""
+    user = await request.auser()
     query = request.GET.get('q', '')
-    user_posts = ScheduledPost.objects.filter(user=request.user).select_related('social_account')
+    cursor = request.GET.get('cursor')
     
-    if query:
-        user_posts = user_posts.filter(
-            Q(content__icontains=query) | Q(social_account__platform__icontains=query)
-        )
+    if query.strip():
+        # Search results page by rank, so the cursor here is an offset
+        offset = int(cursor) if cursor and cursor.isdigit() else 0
+        recent_posts, next_offset = await asearch_posts(user, query, offset)
+        next_cursor = str(next_offset) if next_offset is not None else None
+    else:
+        user_posts = ScheduledPost.objects.filter(user=user).select_related('social_account')
+        archived = ArchivedPost.objects.filter(user=user).select_related('social_account')
+        recent_posts, next_cursor = await akeyset_page_with_archive(user_posts, archived, cursor)
     
-    recent_posts = user_posts.order_by('-scheduled_at')[:20]
     context = {
         'recent_posts': recent_posts,
+        'next_page_url': page_url(request, next_cursor) if next_cursor else None,
         'status_colors': STATUS_COLORS,
+        # Archived posts aren't in the search index; say so above the results
+        'archive_days': settings.ARCHIVE_AFTER_DAYS if query.strip() else None,
     }
-    return render(request, 'dashboard/posts_table.html', context)
+    template = 'dashboard/posts_rows.html' if cursor else 'dashboard/posts_table.html'
+    return render(request, template, context)
+
+
+# ============ METRICS ============
+
+def metrics_view(request):
+    """Prometheus scrape endpoint for this process's metrics"""
+    auth = request.headers.get('Authorization', '')
+    token_ok = bool(settings.METRICS_TOKEN) and hmac.compare_digest(auth, f'Bearer {settings.METRICS_TOKEN}')
+    # Behind a local reverse proxy every request comes from 127.0.0.1, so forwarded ones don't count as local
+    local = request.META.get('REMOTE_ADDR') in ('127.0.0.1', '::1') and 'X-Forwarded-For' not in request.headers
+    if not (settings.DEBUG or local or token_ok):
+        raise Http404
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
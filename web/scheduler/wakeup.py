@@ -0,0 +1,116 @@
+"""Scheduler wake-up notifications
+
+Views call notify_scheduler() after creating, retrying or cancelling a post so a
+sleeping scheduler re-checks its next due time straight away.
+PostgreSQL uses LISTEN/NOTIFY; SQLite setups (single host) use a UDP datagram
+to the scheduler's local port. Only one scheduler per host can bind that port;
+the others sleep on a timer and pick up new posts within SCHEDULER_MAX_SLEEP.
+"""
+import logging
+import select
+import socket
+import threading
+from datetime import datetime
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'scheduler_wakeup'
+
+
+def notify_scheduler(due_at=None):
+    """
+    Wake sleeping schedulers once the current transaction commits
+    due_at: when the affected post becomes due (None = just re-read the queue)
+    """
+    payload = due_at.isoformat() if due_at else ''
+    transaction.on_commit(lambda: _send(payload))
+
+
+def _send(payload):
+    try:
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, payload])
+        else:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                sock.sendto(
+                    payload.encode(),
+                    (settings.SCHEDULER_WAKEUP_HOST, settings.SCHEDULER_WAKEUP_PORT),
+                )
+    except Exception as e:
+        # The scheduler still wakes on its own after SCHEDULER_MAX_SLEEP
+        logger.warning("Could not notify scheduler: %s", e)
+
+
+def parse_payload(payload):
+    """Returns: due datetime from a notification payload, or None"""
+    try:
+        return datetime.fromisoformat(payload) if payload else None
+    except ValueError:
+        return None
+
+
+class WakeupListener:
+    """Receive notify_scheduler() messages inside the scheduler process"""
+
+    def __init__(self):
+        self._interrupted = threading.Event()
+        self._sock = None
+        if connection.vendor == 'postgresql':
+            # Dedicated connection: notifications are only delivered outside transactions
+            self._conn = connection.get_new_connection(connection.get_connection_params())
+            self._conn.autocommit = True
+            with self._conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+        else:
+            self._conn = None
+            address = (settings.SCHEDULER_WAKEUP_HOST, settings.SCHEDULER_WAKEUP_PORT)
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                sock.bind(address)
+            except OSError as e:
+                sock.close()
+                logger.warning("Wake-up port %s:%s unavailable (%s); sleeping on a timer instead", *address, e)
+            else:
+                sock.setblocking(False)
+                self._sock = sock
+
+    def wait(self, timeout):
+        """
+        Block until a notification arrives or timeout seconds pass
+        Returns: list of payload strings (empty on timeout)
+        """
+        if self._conn is None and self._sock is None:
+            self._interrupted.wait(max(timeout, 0))
+            self._interrupted.clear()
+            return []
+        source = self._conn if self._conn is not None else self._sock
+        ready, _, _ = select.select([source], [], [], max(timeout, 0))
+        if not ready:
+            return []
+
+        if self._conn is not None:
+            self._conn.poll()
+            payloads = [notify.payload for notify in self._conn.notifies]
+            self._conn.notifies.clear()
+            return payloads
+
+        payloads = []
+        while True:
+            try:
+                data, _ = self._sock.recvfrom(1024)
+            except BlockingIOError:
+                return payloads
+            payloads.append(data.decode(errors='ignore'))
+
+    def interrupt(self):
+        """Cut the current wait() short (used on stop; notifications do it otherwise)"""
+        self._interrupted.set()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+        if self._sock is not None:
+            self._sock.close()